@@ -1,5 +1,9 @@
 import bpy
 import math
+from ledGeometry import LED_INDEX_PROPERTY, GENERATED_PROPERTY, LED_KIND
+
+#Kind of the data blocks made by createPlane
+PLANE_KIND = "Plane"
 
 ############################################
 # Name        : createPlane
@@ -11,7 +15,10 @@ import math
 def createPlane():
     bpy.ops.mesh.primitive_plane_add(size=1000,location=(0,0,0),rotation=(0,0,math.pi/2))
     plane = bpy.context.active_object
+    plane[GENERATED_PROPERTY] = PLANE_KIND
+    plane.data[GENERATED_PROPERTY] = PLANE_KIND
     planeMaterial = bpy.data.materials.new(name='planeBlack')
+    planeMaterial[GENERATED_PROPERTY] = PLANE_KIND
     planeMaterial.use_nodes = True
     plane.active_material = planeMaterial
     nodes = planeMaterial.node_tree.nodes
@@ -38,47 +45,101 @@ class CreatePlaneOperator(bpy.types.Operator):
         return {'FINISHED'}
 
 ############################################
-# Name        : remove_cubes
-# Called by   : RemoveCubesOperator & RemovePlaneOperator execute - line 86, 100
-# Parameters  : N/A
+# Name        : materialData
+# Called by   : generatedData, removeMaterials, removeTable
+# Parameters  : list of materials
+# Returns     : list of the actions and images used by the materials
+# Description : The keyframes and baked image of a LED live in data blocks of their own,
+#               they go when their material goes unless the user protected them. The actions
+#               of a multi sheet import sit in NLA strips
+############################################
+def materialData(materials):
+    owned = {}
+    for material in materials:
+        node_tree = material.node_tree
+        if node_tree is None:
+            continue
+        animation_data = node_tree.animation_data
+        if animation_data is not None:
+            actions = [animation_data.action] + [strip.action for track in animation_data.nla_tracks for strip in track.strips]
+            for action in actions:
+                if action is not None:
+                    owned[('ACTION', action.name)] = action
+        for node in node_tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image is not None:
+                owned[('IMAGE', node.image.name)] = node.image
+    return [datablock for datablock in owned.values() if not datablock.use_fake_user]
+
+############################################
+# Name        : generatedData
+# Called by   : remove_object
+# Parameters  : kind of data blocks ("Cube" or "Plane")
+# Returns     : list of every data block a build made of that kind
+# Description : Objects, meshes and materials are tagged when they are made, cubes built
+#               before the tag existed are found by their LED index
+############################################
+def generatedData(kind):
+    objects = [ob for ob in bpy.data.objects if ob.get(GENERATED_PROPERTY) == kind
+               or (kind == LED_KIND and LED_INDEX_PROPERTY in ob)]
+    meshes = [mesh for mesh in bpy.data.meshes if mesh.get(GENERATED_PROPERTY) == kind]
+    materials = [material for material in bpy.data.materials if material.get(GENERATED_PROPERTY) == kind]
+    return objects + meshes + materials + materialData(materials)
+
+############################################
+# Name        : removeMaterials
+# Called by   : ledUpdate updatePooledMaterials, ledUpdate updateTextureMaterial
+# Parameters  : list of materials
 # Returns     : N/A
-# Description : Remove all cubes or planes in workspace
+# Description : Remove materials with their keyframes and baked images in one batch
 ############################################
-def remove_object(type):
-    bpy.ops.object.select_all(action='DESELECT')
-   # Iterate over all objects in the scene collection
-    for obj in bpy.context.scene.collection.objects:
-        # Check if the object is a mesh object with the name starting with "Cube"
-        if obj.type == 'MESH' and (obj.name.startswith(type)):
-            # Select the object
-            obj.select_set(True)
-    
-    # Delete the selected objects
-    bpy.ops.object.delete()
-    
-    # Remove unlinked materials
-    for material in bpy.data.materials:
-        if not material.users:
-            bpy.data.materials.remove(material)
+def removeMaterials(materials):
+    if materials:
+        bpy.data.batch_remove(list(materials) + materialData(materials))
+
+############################################
+# Name        : removeTable
+# Called by   : buildOperator LedBuildOperator rollBack
+# Parameters  : ledLayout LedTable of a build
+# Returns     : number of removed data blocks
+# Description : Remove the cubes, mesh and materials the table holds in one batch. Only the data
+#               of that build goes, LEDs of earlier builds stay
+############################################
+def removeTable(table):
+    datablocks = list(table.objects or [])
+    if table.mesh is not None:
+        datablocks.append(table.mesh)
+    datablocks += table.materials + materialData(table.materials)
+    if datablocks:
+        bpy.data.batch_remove(datablocks)
+    return len(datablocks)
 
-    # Remove unlinked shader node trees
-    for node_tree in bpy.data.node_groups:
-        if not node_tree.users:
-            bpy.data.node_groups.remove(node_tree)
-            
-    # Remove unused materials and shader node trees
-    bpy.context.view_layer.objects.active = None
+############################################
+# Name        : remove_object
+# Called by   : RemoveCubesOperator & RemovePlaneOperator execute, ledUpdate updateAnimation
+# Parameters  : kind of data blocks ("Cube" or "Plane")
+# Returns     : N/A
+# Description : Remove everything a build made of that kind in one batch, without operators
+#               or selection. User objects are never touched, whatever their name
+############################################
+def remove_object(type):
+    datablocks = generatedData(type)
+    if datablocks:
+        bpy.data.batch_remove(datablocks)
 
 ############################################
 # Name        : purgeData
 # Called by   : PurgeOperator execute - line 121
 # Parameters  : N/A
 # Returns     : N/A
-# Description : Purge all orphaned data
+# Description : Purge all orphaned data, data only used by other orphans included
 ############################################
 def purgeData():
-    for i in range(3):
-        bpy.ops.outliner.orphans_purge()
+    try:
+        bpy.ops.outliner.orphans_purge(do_recursive=True)
+    except TypeError:
+        #BLENDER BEFORE 3.2 PURGES ONE LEVEL OF ORPHANS PER CALL
+        for i in range(3):
+            bpy.ops.outliner.orphans_purge()
 
 
 class RemoveCubesOperator(bpy.types.Operator):
@@ -92,7 +153,7 @@ class RemoveCubesOperator(bpy.types.Operator):
     # Description : Run remove_cubes function when button is pressed
     ############################################
     def execute(self, context):
-        remove_object("Cube")
+        remove_object(LED_KIND)
         return {'FINISHED'}
     
 class RemovePlaneOperator(bpy.types.Operator):
@@ -106,7 +167,7 @@ class RemovePlaneOperator(bpy.types.Operator):
     # Description : Run remove_panel function when button is pressed
     ############################################
     def execute(self, context):
-        remove_object("Plane")
+        remove_object(PLANE_KIND)
         return {'FINISHED'}
 
 class PurgeOperator(bpy.types.Operator):
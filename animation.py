@@ -1,30 +1,22 @@
 import bpy
-import math
-import pandas as pds
-import sys
-from dataclasses import dataclass
-from enum import Enum 
-
-class Color(Enum):
-    White = 1
-    Yellow = 2
-    Red = 3
-    Black = 4
-
-class ExitError(Exception):
-    pass
-
-@dataclass
-class LedSection():
-    row: int
-    col: int
-    start: int
-    end: int
-    vert: bool
-    reverse: bool
-    color: Color
-    difSize: bool
-    optionalSize: int
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from ledData import ExitError, LedSection, Color, readTimes, readIntensityBlock, glowCurve, materialPoolKeys, emissionColor
+from ledData import layoutHash, ledTimelineKeys, TimelineHash, LAYOUT_PROPERTY, TIMELINE_PROPERTY, SHEETS_PROPERTY
+from keyframeWriter import writeKeyFrames, insertKeyFrames, writeKeyBuffer
+from keyPrepare import prepareKeyBuffers
+from ledGeometry import GENERATED_PROPERTY, LED_KIND
+from geometryCache import cachedLedCubeSteps
+from sheetActions import stashSheetActions
+from ledLayout import ledTable, LED_SIZE
+from textureAnimation import createTextureAnimation
+from ledSidecar import loadSheetArrays
+from ledWindow import windowSections, loadWindow, cachedSheet
+from ledStream import iterSheetChunks, glowChunks
+from ledTime import TimeBase, applyTimeBase
+from ledProfile import BuildProfile, log
 
 ############################################
 # Name        : test_main
@@ -45,15 +37,166 @@ def test_main(filePathName, sheetNumber, ledRowStart, ledColStart, ledSections):
         print("Row: " + str(led.start), end=' ')
         print("Col: " + str(led.start))
 
+#LEDs given materials between two pauses of a time-sliced build
+BUILD_BATCH = 500
+
+@dataclass
+class PreparedSheet():
+    frames_list: object = None      #array of frame numbers, None when streaming
+    glow_matrix: object = None      #emission strengths (frames x led columns), None when streaming
+    intensity: object = None        #brightness percentages (frames x led columns) the keys are prepared from, dropped once they are
+    pool_keys: list = None          #material pool key of every cube, None for one material per cube
+    chunks: object = None           #iterator of SheetArrays row chunks when streaming
+    table: object = None            #ledLayout LedTable of every LED the build makes
+    key_buffers: dict = None        #prepared keys of every animated led column, None to prepare them while writing
+    timeBase: object = None         #TimeBase the streamed chunks are converted with
+    sheetName: str = ""             #sheet the rows were read from
+    ledSections: list = None        #LED sections the build makes, the sections of the import window
+
 ############################################
 # Name        : main
-# Called by   : Panel Creation PopupMenu execute - line 300
-# Parameters  : file path, sheet number, led start row, led column start, list of LED sections
+# Called by   : ledBatch buildJob (batch workers), ledUpdate updateAnimation
+# Parameters  : file path, sheet number, led start row, led column start, list of LED sections,
+#               write keyframes in bulk (False falls back to keyframe_insert per frame),
+#               animation mode: 'KEYFRAMES' one material per LED, 'POOLED' LEDs with the same color and
+#               brightness timeline share a material, 'TEXTURE' one material sampling a baked image,
+#               rows per chunk to stream the sheet in (0 reads the whole sheet at once),
+#               keyframe compression tolerance (None writes a key for every row, 0 drops only keys
+#               the curve does not need), BuildProfile recording every stage,
+#               TimeBase of the time column (None reads it in frames or seconds at the scene frame rate),
+#               processes preparing the keyframe arrays (0 for one per core),
+#               folder caching the LED cubes of a layout (empty always builds them),
+#               ledWindow ImportWindow of the rows and sections to build (None builds the whole sheet)
 # Returns     : none
 # Description : main function for backend -> create LED's and create animation sequence
 ############################################
-def main(filePathName, sheetName, ledRowStart, ledColStart, ledSections):
-    print("\nSTART OF NEW TEST IN main.py\n")
+def main(filePathName, sheetName, ledRowStart, ledColStart, ledSections, bulkKeyframes=True, animationMode='KEYFRAMES', chunkRows=0, keyTolerance=None, profile=None, timeBase=None, keyWorkers=0,
+         geometryCache="", window=None):
+    log.debug("START OF NEW TEST IN main.py")
+    if profile is None:
+        profile = BuildProfile(sceneCounts)
+    prepared = prepareSheet(filePathName, sheetName, ledRowStart, ledColStart, ledSections, animationMode, chunkRows, profile,
+                            sceneTimeBase(timeBase), keyTolerance, keyWorkers if bulkKeyframes else None, window)
+    runSteps(buildSteps(ledSections, prepared, ledColStart, animationMode, bulkKeyframes, keyTolerance, profile, geometryCache=geometryCache))
+
+############################################
+# Name        : runSteps
+# Called by   : main, createBars, createKeyFrames, streamKeyFrames
+# Parameters  : generator of build steps
+# Returns     : what the generator returns
+# Description : Run every step of a build at once, the modal build runs them a few at a time instead
+############################################
+def runSteps(steps):
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+############################################
+# Name        : sceneTimeBase
+# Called by   : main, ledUpdate updateAnimation, buildOperator LedBuildOperator invoke
+# Parameters  : TimeBase (None for the default one)
+# Returns     : TimeBase with the frame rate of the scene
+# Description : Read the frame rate on the main thread, the sheet may be prepared in a worker thread
+############################################
+def sceneTimeBase(timeBase=None):
+    if timeBase is None:
+        timeBase = TimeBase()
+    if timeBase.fps:
+        return timeBase
+    render = bpy.context.scene.render
+    return replace(timeBase, fps=render.fps / render.fps_base)
+
+############################################
+# Name        : prepareSheet
+# Called by   : main, buildOperator LedBuildOperator (in a worker thread)
+# Parameters  : file path, sheet name, led start row, led column start, list of LED sections,
+#               animation mode, rows per chunk to stream the sheet in, BuildProfile,
+#               TimeBase converting the time column to frames of the scene, keyframe compression tolerance,
+#               processes preparing the keyframe arrays (0 for one per core, None leaves them to the keyframe writer),
+#               ledWindow ImportWindow of the rows and sections to build (None builds the whole sheet)
+# Returns     : PreparedSheet
+# Description : Everything a build needs from the sheet. Does not touch blender data so it can run
+#               off the main thread. A window only reads its rows and lays out its sections where
+#               the whole layout puts them, its frames are the frames they have in the whole sheet
+############################################
+def prepareSheet(filePathName, sheetName, ledRowStart, ledColStart, ledSections, animationMode='KEYFRAMES', chunkRows=0, profile=None, timeBase=None,
+                 keyTolerance=None, keyWorkers=None, window=None):
+    if profile is None:
+        profile = BuildProfile()
+    if timeBase is None:
+        timeBase = TimeBase()
+    sections = windowSections(ledSections, window)
+    prepared = PreparedSheet(timeBase=timeBase, sheetName=sheetName, ledSections=[ledSections[index] for index in sections])
+    with profile.stage("layout"):
+        prepared.table = ledTable(ledSections, LED_SIZE, None if window is None else sections)
+    #FROM HERE ON ONLY THE SECTIONS OF THE WINDOW ARE READ AND ANIMATED
+    ledSections = prepared.ledSections
+    if window is not None:
+        if chunkRows:
+            raise ExitError("An import window cannot be streamed in chunks, it only reads its own rows")
+        with profile.stage("readSheet"):
+            prepared.frames_list, prepared.intensity = loadWindow(filePathName, sheetName, ledRowStart, ledColStart, ledSections, window, timeBase)
+            prepared.glow_matrix = glowCurve(prepared.intensity)
+    elif chunkRows:
+        if animationMode != 'KEYFRAMES':
+            raise ExitError("Streaming the sheet in chunks only works with keyframe animation")
+        #Read the first chunk before building anything so a bad sheet fails early
+        #The first chunk needs 3 rows to tell seconds from frames
+        with profile.stage("readSheet"):
+            chunks = iterSheetChunks(filePathName, sheetName, ledRowStart, ledColStart, max(chunkRows, 3))
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
+                raise ExitError("There are no rows after the start row in the EXCEL sheet")
+            readIntensityBlock(first_chunk, first_chunk.startRow, ledColStart, ledSections)
+            prepared.chunks = itertools.chain([first_chunk], chunks)
+    else:
+        with profile.stage("readSheet"):
+            # Read the excel file (or its sidecar) and store the time column and LED block in arrays,
+            # rows an import window already read are reused
+            sheet = cachedSheet(filePathName, sheetName, ledRowStart, ledColStart, ledSections)
+            if sheet is None:
+                sheet = loadSheetArrays(filePathName, sheetName, ledRowStart, ledColStart)
+
+            #Check for invalid cells, key the rows on frames of the scene and compute the glow of every LED column at once
+            prepared.frames_list, prepared.intensity = applyTimeBase(readTimes(sheet, ledRowStart),
+                                                                     readIntensityBlock(sheet, ledRowStart, ledColStart, ledSections), timeBase)
+            prepared.glow_matrix = glowCurve(prepared.intensity)
+
+    #LEDs with the same pool key share a material
+    if animationMode == 'POOLED':
+        with profile.stage("poolKeys"):
+            prepared.pool_keys = materialPoolKeys(prepared.glow_matrix, ledSections)
+    elif animationMode == 'TEXTURE':
+        prepared.pool_keys = [animationMode] * len(prepared.table)
+
+    #Sort, compress and interleave the keys of every animated column so the build only applies them
+    if keyWorkers is not None and prepared.chunks is None and animationMode != 'TEXTURE':
+        with profile.stage("prepareKeys"):
+            prepared.key_buffers = prepareKeyBuffers(prepared.frames_list, prepared.intensity,
+                                                     prepared.table.animatedColumns(prepared.pool_keys), keyTolerance, keyWorkers)
+        prepared.intensity = None
+    return prepared
+
+############################################
+# Name        : buildSteps
+# Called by   : main, buildOperator LedBuildOperator modal
+# Parameters  : list of LED sections, PreparedSheet, led column start, animation mode,
+#               write keyframes in bulk or one at a time, keyframe compression tolerance,
+#               BuildProfile recording every stage, LEDs given materials per step,
+#               folder caching the LED cubes of a layout (empty always builds them)
+# Returns     : generator yielding (stage name, steps done, steps in the stage, 0 when unknown)
+# Description : Create the cubes, materials and keyframes from the prepared sheet, pausing after
+#               every small batch so the build can be spread over several blender events.
+#               A window keys its layout on its own sections so a whole import builds every LED again
+############################################
+def buildSteps(ledSections, prepared, ledColStart, animationMode='KEYFRAMES', bulkKeyframes=True, keyTolerance=None, profile=None, batchSize=BUILD_BATCH,
+               geometryCache=""):
+    if profile is None:
+        profile = BuildProfile(sceneCounts)
+    if prepared.ledSections is not None:
+        ledSections = prepared.ledSections
     context = bpy.context
     scene = context.scene
 
@@ -61,287 +204,321 @@ def main(filePathName, sheetName, ledRowStart, ledColStart, ledSections):
     scene.render.engine = 'BLENDER_EEVEE'
     scene.eevee.use_bloom = True
 
-    excel_file_path = filePathName  
-    
-    # Read excel file and store the data in an array
-    xls_data = pds.read_excel(excel_file_path, sheet_name=sheetName)
+    #Create each individual LED cube and add a material to each cube
+    table = yield from barSteps(LED_SIZE, prepared.table, prepared.pool_keys, profile, batchSize, geometryCache)
+    timeline = TimelineHash(ledSections) if prepared.chunks is not None else None
+    with profile.stage("keyframes"):
+        if prepared.chunks is not None:
+            #Apply emission node for glow and append the keyframes of every chunk as it is read
+            yield from streamKeyFrameSteps(table, ledSections, prepared.chunks, ledColStart, bulkKeyframes, keyTolerance, prepared.timeBase, timeline)
+        elif animationMode == 'TEXTURE':
+            #Bake the emission strengths into one image sampled by the shared material
+            createTextureAnimation(table, table.materials[0], prepared.frames_list, prepared.glow_matrix)
+            yield "keyframes", 1, 1
+        else:
+            #Apply emission node for glow and apply for each keyframe specified in excel
+            yield from keyFrameSteps(table, prepared.frames_list, prepared.glow_matrix, bulkKeyframes, keyTolerance, prepared.key_buffers)
 
-    frames_list = xls_data.iloc[ledRowStart:,0]
+    #Remember the layout and the timeline of every LED so an update only redoes what changed
+    with profile.stage("timelineKeys"):
+        scene[LAYOUT_PROPERTY] = layoutHash(ledSections, animationMode)
+        scene[SHEETS_PROPERTY] = []
+        if timeline is not None:
+            tagLedMaterials(table.objects, timeline.keys(animationMode))
+        else:
+            tagLedMaterials(table.objects, ledTimelineKeys(prepared.frames_list, prepared.glow_matrix, ledSections, animationMode))
 
-    #The 2 is since the first frame is always 0, no matter milliseconds or seconds
-    #If the value is in milliseconds (less than 1), multiply milliseconds to frames
-    if frames_list.iloc[2] < 1:
-        for index, frame in enumerate(frames_list):
-            frames_list.iloc[index] = frame * 1000
+    #FINISHED
+    if context.active_object is not None:
+        context.active_object.select_set(False)
 
-    size_of_led  = 2
+############################################
+# Name        : importSheets
+# Called by   : ledBatch buildJob
+# Parameters  : file path, list of sheet names, led start row, led column start, list of LED sections,
+#               then the same options as main
+# Returns     : none
+# Description : main for several sheets of one workbook. The cubes and materials are built once and
+#               every sheet becomes its own action on the same emission nodes
+############################################
+def importSheets(filePathName, sheetNames, ledRowStart, ledColStart, ledSections, bulkKeyframes=True, animationMode='KEYFRAMES', keyTolerance=None, profile=None, timeBase=None, keyWorkers=0,
+                 geometryCache="", window=None):
+    if profile is None:
+        profile = BuildProfile(sceneCounts)
+    sheets = prepareSheets(filePathName, sheetNames, ledRowStart, ledColStart, ledSections, animationMode, profile,
+                           sceneTimeBase(timeBase), keyTolerance, keyWorkers if bulkKeyframes else None, window)
+    runSteps(sheetSteps(sheets, bulkKeyframes, keyTolerance, profile, geometryCache=geometryCache))
 
-    materials_list = []
-    extra_materials_list = []
-    led_row_dict = {}
-    led_col_dict = {}
-    
-    #Find starting and ending positions for all LED Sections
-    findAllStart(ledSections, led_col_dict, led_row_dict)
-    
-    #Create each individual LED cube and add a material to each cube
-    materials_list, extra_materials_list = createBars(size_of_led, ledSections, led_row_dict, led_col_dict)
-    #Apply emission node for glow and apply for each keyframe specified in excel
-    createKeyFrames(ledSections, materials_list, frames_list, xls_data, ledRowStart, ledColStart, extra_materials_list)
+############################################
+# Name        : prepareSheets
+# Called by   : importSheets, buildOperator prepareJob (in a worker thread)
+# Parameters  : file path, list of sheet names, led start row, led column start, list of LED sections,
+#               animation mode, BuildProfile, TimeBase, keyframe compression tolerance,
+#               processes preparing the keyframe arrays (0 for one per core, None leaves them to the keyframe writer),
+#               ledWindow ImportWindow applied to every sheet (None builds the whole sheets)
+# Returns     : list of PreparedSheet, one for every sheet in order
+# Description : prepareSheet for every sheet at once in a thread pool. Pooled LEDs share a material
+#               only when they match on every sheet, so the pool keys of the sheets are joined
+#               before the keys of the animated columns are prepared
+############################################
+def prepareSheets(filePathName, sheetNames, ledRowStart, ledColStart, ledSections, animationMode='KEYFRAMES', profile=None, timeBase=None,
+                  keyTolerance=None, keyWorkers=None, window=None):
+    if profile is None:
+        profile = BuildProfile()
+    if animationMode == 'TEXTURE':
+        raise ExitError("Several sheets can only be built with keyframe or pooled animation")
+    if not sheetNames or len(set(sheetNames)) != len(sheetNames):
+        raise ExitError("List every sheet to build once")
+
+    with profile.stage("readSheets"):
+        with ThreadPoolExecutor(max_workers=min(len(sheetNames), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(prepareSheet, filePathName, sheetName, ledRowStart, ledColStart, ledSections,
+                                   animationMode, 0, None, timeBase, None, None, window) for sheetName in sheetNames]
+            sheets = [future.result() for future in futures]
+
+    if animationMode == 'POOLED':
+        pool_keys = ["|".join(keys) for keys in zip(*(sheet.pool_keys for sheet in sheets))]
+        for sheet in sheets:
+            sheet.pool_keys = pool_keys
+
+    if keyWorkers is not None:
+        with profile.stage("prepareKeys"):
+            columns = sheets[0].table.animatedColumns(sheets[0].pool_keys)
+            for sheet in sheets:
+                sheet.key_buffers = prepareKeyBuffers(sheet.frames_list, sheet.intensity, columns, keyTolerance, keyWorkers)
+    for sheet in sheets:
+        sheet.intensity = None
+    return sheets
+
+############################################
+# Name        : sheetSteps
+# Called by   : importSheets, buildOperator LedBuildOperator modal
+# Parameters  : list of PreparedSheet, write keyframes in bulk or one at a time, keyframe compression tolerance,
+#               BuildProfile recording every stage, LEDs given materials per step,
+#               folder caching the LED cubes of a layout (empty always builds them)
+# Returns     : generator yielding (stage name, steps done, steps in the stage, 0 when unknown)
+# Description : buildSteps for several sheets. The keys of each sheet are written on the same emission
+#               nodes and stashed as a strip of their own, the strips follow each other so the sheets
+#               play back to back and a sheet can be picked by swapping the active actions
+############################################
+def sheetSteps(sheets, bulkKeyframes=True, keyTolerance=None, profile=None, batchSize=BUILD_BATCH, geometryCache=""):
+    if profile is None:
+        profile = BuildProfile(sceneCounts)
+    context = bpy.context
+    scene = context.scene
+
+    # Turn on bloom effect
+    scene.render.engine = 'BLENDER_EEVEE'
+    scene.eevee.use_bloom = True
+
+    table = yield from barSteps(LED_SIZE, sheets[0].table, sheets[0].pool_keys, profile, batchSize, geometryCache)
+    frame_start = 0
+    with profile.stage("keyframes"):
+        emission_sockets = createEmissionNodes(table)
+        for sheet in sheets:
+            yield from keyFrameSteps(table, sheet.frames_list, sheet.glow_matrix, bulkKeyframes, keyTolerance,
+                                     sheet.key_buffers, emission_sockets)
+            frame_start = stashSheetActions(table, sheet.sheetName, frame_start, sheet.frames_list)
+
+    #AN UPDATE WRITES ONE SHEET, THE EMPTY LAYOUT MAKES IT BUILD THE LEDS AGAIN
+    scene[LAYOUT_PROPERTY] = ""
+    scene[SHEETS_PROPERTY] = [sheet.sheetName for sheet in sheets]
+    log.info("Built %i sheets as actions on %i materials", len(sheets), len(table.materials))
 
     #FINISHED
-    context.active_object.select_set(False)
+    if context.active_object is not None:
+        context.active_object.select_set(False)
 
 ############################################
-# Name        : addToDict
-# Called by   : findAllStartHelper - line 192, 198
-# Parameters  : led strip index, dictionary of LEDS, led section, size of led, axis
-# Returns     : none
-# Description : Add a LED section to the dictionary that maps row, column number to a start and end position
-############################################
-def addToDict(led_strip_num, led_dict, led, size_of_led, axis):
-    led_start = 0
-     # ADD TO ANY EXISTING ROW INDEXING
-    for prev_index in range(led_strip_num - 1, -1, -1):
-        if prev_index in led_dict:
-            led_start = led_dict[prev_index][1]
-            break
-    #ONLY FIRST INDEX SHOULD INPUT WITH LED_START_COL as 0
-    if axis == "Row":
-        if led.vert:
-            if led.difSize:
-                led_dict[led_strip_num] = (led_start, led_start - led.optionalSize * size_of_led)
-            else:
-                led_dict[led_strip_num] = (led_start, led_start - (abs(led.end - led.start) * size_of_led))
-        else:
-            led_dict[led_strip_num] = (led_start, led_start - size_of_led)
-    if axis == "Column":
-        if not led.vert:
-            if led.difSize:
-                led_dict[led_strip_num] = (led_start, led_start + led.optionalSize * size_of_led)
-            else:
-                led_dict[led_strip_num] = (led_start, led_start + (abs(led.end - led.start) * size_of_led))
-        else:
-            led_dict[led_strip_num] = (led_start, led_start + size_of_led)
-    
+# Name        : createBars
+# Called by   : bench benchRunner
+# Parameters  : size of led, ledLayout LedTable of the LEDs, optional list of material pool keys (one per cube),
+#               BuildProfile timing the cube and material stages
+# Returns     : the LedTable with its cubes and materials
+# Description : Create each individual LED cube in one batch and add a material to each cube.
+#               When pool keys are given cubes with the same key share one material
 ############################################
-# Name        : updateDict
-# Called by   : findAllStartHelper - line 193, 199
-# Parameters  : led strip index, number of dimensions in the user input matrix, dictionary of LEDS
-# Returns     : none
-# Description : Update current dictionary if an LED strip index is in between existing indices
-############################################
-def updateDict(led_strip_num, total_num_dimension, led_dict):
-    #PLACE NEW INDEX IN MIDDLE OF TWO INDICES
-    for next_index in range(led_strip_num + 1, total_num_dimension):
-        if next_index in led_dict:
-            cur_index = next_index
-            
-            for cur in range(next_index, -1, -1):
-                cur -= 1
-                if cur in led_dict:
-                    cur_index = cur
-                    break
-            #ERROR CHECK
-            if cur_index == next_index:
-                sys.exit('NO PREVIOUS INDEX')
-            
-            #FIND RANGE OF PREVIOUS INDEX
-            increment = abs(led_dict[cur_index][1] - led_dict[cur_index][0])
-            new_start = led_dict[next_index][0] + increment
-            new_end = led_dict[next_index][1] + increment
-            
-            led_dict[next_index] = (new_start, new_end)
-            
-############################################
-# Name        : findAllStartHelper
-# Called by   : findAllStart - line 226, 229
-# Parameters  : led strip index, dictionary of LEDS, led section, size of led, number of dimensions in matrix, axis
-# Returns     : none
-# Description : Helper function to add and update each led strip into dictionary
-############################################
-def findAllStartHelper(led_strip_num, led_dict, led, size_of_led, total_num_dimension, axis):
-    #IF FIRST TIME SEEING THIS COLUMN NUMBER ADD START, END TO DICT
-        if led_strip_num not in led_dict: 
-            
-            addToDict(led_strip_num, led_dict, led, size_of_led, axis)
-            updateDict(led_strip_num, total_num_dimension, led_dict)
-        
-        #IF THE PREVIOUS ADDITION WAS NOT THE MAX FOR THAT ROW
-        elif abs(led_dict[led_strip_num][1] - led_dict[led_strip_num][0]) == 2:
-            
-            addToDict(led_strip_num, led_dict, led, size_of_led, axis)
-            updateDict(led_strip_num, total_num_dimension, led_dict)
-            
-        #ALREADY UPDATED THE RANGE
-        else:
-            pass
+def createBars(size_of_led, table, pool_keys=None, profile=None):
+    return runSteps(barSteps(size_of_led, table, pool_keys, profile))
 
 ############################################
-# Name        : findAllStart
-# Called by   : main - line 107
-# Parameters  : led strip list, led column index dictionary, led row index dictionary
-# Returns     : none
-# Description : Function to create two dictionaries of row, col indices mapped to start 
-#               and end (x,y) coordinates for LED cube creation
+# Name        : barSteps
+# Called by   : createBars, buildSteps, sheetSteps
+# Parameters  : size of led, ledLayout LedTable of the LEDs, optional list of material pool keys (one per cube),
+#               BuildProfile timing the cube and material stages, LEDs given materials per step,
+#               folder caching the LED cubes of a layout (empty always builds them)
+# Returns     : generator of build steps returning what createBars returns
+# Description : createBars, pausing after every batch of cubes and of materials
 ############################################
-def findAllStart(ledSections, led_col_dict, led_row_dict):
-    led_start_col = 0
-    led_start_row = 0
-    
-    total_num_dimension = 5
+def barSteps(size_of_led, table, pool_keys=None, profile=None, batchSize=BUILD_BATCH, geometryCache=""):
+    material_pool = {}
+    if profile is None:
+        profile = BuildProfile()
+
+    with profile.stage("cubes"):
+        led_objects = yield from cachedLedCubeSteps(size_of_led, table, geometryCache, batchSize=batchSize)
+    yield "cubes", len(led_objects), len(led_objects)
     
-    size_of_led = 2
+    with profile.stage("materials"):
+        for led_index, ob in enumerate(led_objects):
+            pool_key = pool_keys[led_index] if pool_keys is not None else led_index
+            material_index = material_pool.get(pool_key)
+            if material_index is None:
+                material = bpy.data.materials.new(name='LedMaterial')
+                material.use_nodes = True
+                material[GENERATED_PROPERTY] = LED_KIND
+                material_index = material_pool[pool_key] = len(table.materials)
+                table.materials.append(material)
+            ob.active_material = table.materials[material_index]
+            table.material[led_index] = material_index
+            if (led_index + 1) % batchSize == 0:
+                yield "materials", led_index + 1, len(led_objects)
     
-    for led in ledSections: 
-        led_strip_col_num = led.col
-        led_strip_row_num = led.row
-        
-        #CONFIGURE COLUMN DICTIONARY
-        findAllStartHelper(led_strip_col_num, led_col_dict, led, size_of_led, total_num_dimension, "Column")
-        
-        #CONFIGURE ROW DICTIONARY
-        findAllStartHelper(led_strip_row_num, led_row_dict, led, size_of_led, total_num_dimension, "Row")
+    if pool_keys is not None:
+        log.info("Material pool: created %i materials for %i LEDs", len(table.materials), len(led_objects))
+
+    return table
 
 ############################################
-# Name        : createBars
-# Called by   : main - line 110
-# Parameters  : size of led, list of led strips, led row dictionary, led column dictionary
-# Returns     : list of materials attached to cubes, list of materials attached to cubes not orignally in excel
-# Description : Create each individual LED cube and add a material to each cube
-############################################
-def createBars(size_of_led, ledSections, led_row_dict, led_col_dict):
-    materials_list = []
-    extra_materials_list = []
-    led_count = 0
+# Name        : createEmissionNodes
+# Called by   : keyFrameSteps, streamKeyFrameSteps, sheetSteps
+# Parameters  : ledLayout LedTable with its materials
+# Returns     : list of (emission strength socket, led column index), one for every material
+# Description : Apply emission node for glow to each material. Materials shared by several cubes
+#               only get one emission node, colored and animated like their first cube
+############################################
+def createEmissionNodes(table):
+    emission_sockets = []
+    for led_index in table.animatedLeds().tolist():
+        material = table.materials[table.material[led_index]]
+        emission_sockets.append((addEmissionNode(material, table.colorName(led_index)), int(table.column[led_index])))
+    return emission_sockets
+
+############################################
+# Name        : addEmissionNode
+# Called by   : createEmissionNodes, ledUpdate updatePooledMaterials
+# Parameters  : material of a cube, name of the LED color
+# Returns     : emission strength socket
+# Description : Connect an emission node with the LED color to the material output
+############################################
+def addEmissionNode(material, color):
+    nodes = material.node_tree.nodes
+    output_node = nodes.get('Material Output')
+    emission_node = nodes.new(type='ShaderNodeEmission')
     
-    for led in ledSections:
-        led_strip_col_num = led.col
-        led_strip_row_num = led.row
-        
-        #SET THE START TO THE START STORED IN DICT
-        if not led.reverse: #IF NOT REVERSE 
-            led_start_x = led_col_dict[led_strip_col_num][0]
-            led_start_y = led_row_dict[led_strip_row_num][0]
-        
-        elif not led.vert:  #IF REVERSE AND NOT VERT
-            led_start_x = led_col_dict[led_strip_col_num][1]
-            led_start_y = led_row_dict[led_strip_row_num][0]
-        else:               #IF REVERSE AND VERT
-            led_start_x = led_col_dict[led_strip_col_num][0]
-            led_start_y = led_row_dict[led_strip_row_num][1]
-
-        size = (abs(led.end - led.start) + 1)
-        if led.difSize:
-            size = led.optionalSize + 1
-        
-        for i in range(size):
-            bpy.ops.mesh.primitive_cube_add()
-            ob = bpy.context.active_object
-            ob.dimensions = [size_of_led,size_of_led,size_of_led]
-            ob.location = [led_start_x, led_start_y, 0]
-            
-            material = bpy.data.materials.new(name='LedMaterial')
-            material.use_nodes = True
-            ob.active_material = material
-            
-            if led.difSize:
-                extra_materials_list.append(material)
-            else:
-                materials_list.append(material)
-            
-            if led.reverse:
-                if led.vert:
-                    led_start_y += size_of_led
-                else:
-                    led_start_x -= size_of_led
-            else:
-                if led.vert:
-                    led_start_y -= size_of_led
-                else:
-                    led_start_x += size_of_led
+    emission_node.inputs[0].default_value = emissionColor(color)
+    
+    links = material.node_tree.links
+    links.new(emission_node.outputs[0], output_node.inputs[0])
+    return emission_node.inputs[1]
 
-    return materials_list, extra_materials_list
+############################################
+# Name        : tagLedMaterials
+# Called by   : buildSteps, ledUpdate updateAnimation
+# Parameters  : list of every cube object, list of timeline keys (one for every cube)
+# Returns     : N/A
+# Description : Store the timeline key of each cube on its material
+############################################
+def tagLedMaterials(led_objects, timeline_keys):
+    for ob, key in zip(led_objects, timeline_keys):
+        ob.active_material[TIMELINE_PROPERTY] = key
 
 ############################################
-# Name        : createBars
-# Called by   : main - line 112
-# Parameters  : list of led strips, list of materials tied to cubes, time/frames column from excel, 
-#               data from excel, row to start reading from in excel, column to start reading from in excel, 
-#               extra list of materials for cubes not in excel
+# Name        : createKeyFrames
+# Called by   : bench benchRunner
+# Parameters  : ledLayout LedTable with its materials, array of frame numbers,
+#               matrix of emission strengths (frames x led columns) computed from excel,
+#               write keyframes in bulk or one at a time, keyframe compression tolerance (None writes every key),
+#               keyPrepare prepareKeyBuffers result (None prepares the keys while writing them),
+#               createEmissionNodes result to animate (None adds the emission nodes first)
 # Returns     : N/A
-# Description : Apply emission node for glow and apply for each keyframe specified in excel
+# Description : Apply emission node for glow and apply for each keyframe specified in excel.
+#               Materials shared by several cubes are only animated once
 ############################################
-def createKeyFrames(ledSections, materials_list, frames_list, xls_data, ledRowStart, ledColStart, extra_materials_list):
-    material_index = 0
-    extra_from_difSize = 0
-    material: bpy.data.materials
-    print(f"Length of extraList: {len(extra_materials_list)}")
-    for led in ledSections:
-        led_start = led.start
-        led_end = led.end
-        color = led.color.name
-        duplicateSize = 1
-        
-        if led.reverse:
-            led_start = led.end
-            led_end = led.start
-        print(f"Led Start: {led_start}, Led End: {led_end}")
-        for ledIndex in range(led_start, (led_end + 1)):
-            if led.difSize:
-                ledRange = abs(led.end - led.start) + 1
-                duplicateSize = (led.optionalSize + 1) // ledRange
-                if ledIndex == led_end:
-                    duplicateSize += (led.optionalSize + 1) - (duplicateSize * ledRange)
-#            print(f"DuplicateSize: {duplicateSize}")
-            for duplicateLED in range(duplicateSize):
-                if led.difSize:
-#                    print(f"extra_from_difSize: {extra_from_difSize}")
-                    material = extra_materials_list[extra_from_difSize]
-                else:
-                    material = materials_list[material_index]
-                nodes = material.node_tree.nodes
-                output_node = nodes.get('Material Output')
-                emission_node = nodes.new(type='ShaderNodeEmission')
-                
-                if color == "White":
-                    emission_node.inputs[0].default_value = (0.625, 0.818, 1, 1)  # White glow
-                elif color == "Yellow":
-                    emission_node.inputs[0].default_value = (0.98, 0.85, 0.22, 1) # Yellow glow
-                else:
-                    emission_node.inputs[0].default_value = (1, 0, 0, 1)          # Red glow
-                
-                for frame_index,(frame) in enumerate(frames_list):
-                    #Error Check
-                    checkUserInput(xls_data.iloc[frame_index+ledRowStart,ledIndex+ledColStart], (frame_index + ledRowStart), (ledIndex+ledColStart))
-                    if xls_data.iloc[frame_index+ledRowStart,ledIndex+ledColStart] == 0.0:
-                        emission_node.inputs[1].default_value = 0 # no emission glow
-                    else:
-                        emission_node.inputs[1].default_value = (0.371327) * math.exp(4.20955 * (xls_data.iloc[frame_index+ledRowStart,ledIndex+ledColStart] / 100.0))  # Exponential Glow function
-                    emission_node.inputs[1].keyframe_insert(data_path='default_value', frame=frame)
-                    
-                    if frame_index == 0:
-                        links = material.node_tree.links
-                        links.new(emission_node.outputs[0], output_node.inputs[0])
-                if led.difSize:
-                    extra_from_difSize += 1
-                else:
-                    material_index += 1
-                    
+def createKeyFrames(table, frames_list, glow_matrix, bulkKeyframes=True, keyTolerance=None, keyBuffers=None, emissionSockets=None):
+    runSteps(keyFrameSteps(table, frames_list, glow_matrix, bulkKeyframes, keyTolerance, keyBuffers, emissionSockets))
+
 ############################################
-# Name        : createBars
-# Called by   : createKeyFrames - line 300
-# Parameters  : input data from excel, rough estimate of row number in excel, rough estimate of column number in excel
+# Name        : keyFrameSteps
+# Called by   : createKeyFrames, buildSteps, sheetSteps
+# Parameters  : same as createKeyFrames
+# Returns     : generator of build steps
+# Description : createKeyFrames, pausing after every animated material
+############################################
+def keyFrameSteps(table, frames_list, glow_matrix, bulkKeyframes=True, keyTolerance=None, keyBuffers=None, emissionSockets=None):
+    fcurves = []
+    emission_sockets = createEmissionNodes(table) if emissionSockets is None else emissionSockets
+    for socket, ledIndex in emission_sockets:
+        if keyBuffers is not None:
+            fcurves.append(writeKeyBuffer(socket, *keyBuffers[ledIndex]))
+        elif bulkKeyframes:
+            fcurves.append(writeKeyFrames(socket, frames_list, glow_matrix[:, ledIndex], tolerance=keyTolerance))
+        else:
+            fcurves.append(insertKeyFrames(socket, frames_list, glow_matrix[:, ledIndex], keyTolerance))
+        yield "keyframes", len(fcurves), len(emission_sockets)
+    if keyTolerance is not None:
+        printKeyCount(len(frames_list) * len(fcurves), fcurves)
+
+############################################
+# Name        : streamKeyFrames
+# Called by   : bench benchRunner
+# Parameters  : ledLayout LedTable with its materials, list of led strips (the columns read from each chunk),
+#               iterator of SheetArrays row chunks, column to start reading from in excel,
+#               write keyframes in bulk or one at a time, keyframe compression tolerance (None writes every key),
+#               TimeBase converting the time column to frames of the scene
 # Returns     : N/A
-# Description : Check data to make sure the data is an integer and can be converted into a emission value
+# Description : Apply emission node for glow and append the keyframes of each row chunk as it is read,
+#               so only one chunk of the sheet is in memory at a time
 ############################################
-def checkUserInput(input, rowNum, colNum):
-    try:
-        # Convert it into integer
-        val = int(input)
-    except ValueError:
-        try:
-            # Convert it into float
-            val = float(input)
-        except ValueError:
-            raise ExitError("Something went wrong in the EXCEL sheet. Each value must be either an int or a float. Row: %i, Col: %i. Got: %s" %(rowNum, colNum, input))
+def streamKeyFrames(table, ledSections, chunks, ledColStart, bulkKeyframes=True, keyTolerance=None, timeBase=None):
+    runSteps(streamKeyFrameSteps(table, ledSections, chunks, ledColStart, bulkKeyframes, keyTolerance, timeBase))
+
+############################################
+# Name        : streamKeyFrameSteps
+# Called by   : streamKeyFrames, buildSteps
+# Parameters  : same as streamKeyFrames, then the ledData TimelineHash the chunks are added to (None to not hash them)
+# Returns     : generator of build steps, the number of rows in the sheet is not known in advance
+# Description : streamKeyFrames, pausing after every chunk
+############################################
+def streamKeyFrameSteps(table, ledSections, chunks, ledColStart, bulkKeyframes=True, keyTolerance=None, timeBase=None, timeline=None):
+    emission_sockets = createEmissionNodes(table)
+    fcurves = [None] * len(emission_sockets)
+    num_rows = 0
+    for frames_list, glow_matrix in glowChunks(chunks, ledSections, ledColStart, timeBase):
+        num_rows += len(frames_list)
+        if timeline is not None:
+            timeline.update(frames_list, glow_matrix)
+        for i, (socket, ledIndex) in enumerate(emission_sockets):
+            if bulkKeyframes:
+                fcurves[i] = writeKeyFrames(socket, frames_list, glow_matrix[:, ledIndex], append=True, tolerance=keyTolerance)
+            else:
+                fcurves[i] = insertKeyFrames(socket, frames_list, glow_matrix[:, ledIndex], keyTolerance) or fcurves[i]
+        yield "keyframes", num_rows, 0
+    if keyTolerance is not None:
+        printKeyCount(num_rows * len(fcurves), fcurves)
+
+############################################
+# Name        : printKeyCount
+# Called by   : keyFrameSteps, streamKeyFrameSteps
+# Parameters  : number of keys before compression, list of written F-curves
+# Returns     : N/A
+# Description : Report how many keyframes compression removed
+############################################
+def printKeyCount(num_source_keys, fcurves):
+    num_keys = sum(len(fcurve.keyframe_points) for fcurve in fcurves if fcurve is not None)
+    log.info("Keyframe compression: wrote %i of %i keys", num_keys, num_source_keys)
+
+############################################
+# Name        : sceneCounts
+# Called by   : main, ledBatch buildJob (through BuildProfile)
+# Parameters  : N/A
+# Returns     : dictionary of the number of objects, materials, images and keyframes in the file
+# Description : Counted before and after each stage of a build to see what the stage created
+############################################
+def sceneCounts():
+    num_keys = 0
+    for action in bpy.data.actions:
+        for fcurve in action.fcurves:
+            num_keys += len(fcurve.keyframe_points)
+    return {"objects": len(bpy.data.objects), "materials": len(bpy.data.materials),
+            "images": len(bpy.data.images), "keyframes": num_keys}
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+#Scaling of the key preparation from 1 to N processes. The speedup depends on the cores of the machine,
+#so results are not kept in the repository. To reproduce them run, on a machine with at least as many
+#cores as the largest process count:
+#   python bench/benchKeys.py --leds 4000 --frames 10000 --workers 1 2 4 8 --report keys.json
+#   python bench/benchKeys.py --leds 4000 --frames 10000 --key-tolerance 0.5 --workers 1 2 4 8
+#Each process count is checked to prepare exactly the keys of one process
+
+#Key preparation does not use blender, only the LED scripts are needed
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(bench_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(bench_dir))
+
+import keyPrepare
+from benchWorkbook import brightnessRows
+from ledProfile import setLogLevel
+
+############################################
+# Name        : benchMatrix
+# Called by   : benchMain
+# Parameters  : number of LEDs, number of frames, sparsity, random seed
+# Returns     : array of frame numbers, matrix of brightness percentages (frames x LEDs)
+# Description : The same kind of sheet benchWorkbook writes, kept in memory
+############################################
+def benchMatrix(numLeds, numFrames, sparsity, seed=0):
+    rng = np.random.default_rng(seed)
+    intensity = brightnessRows(rng, numFrames, numLeds, sparsity, np.zeros(numLeds, dtype=np.int16))
+    return np.arange(numFrames, dtype=np.float64), intensity.astype(np.float32)
+
+############################################
+# Name        : sameBuffers
+# Called by   : benchMain
+# Parameters  : two prepareKeyBuffers results
+# Returns     : True when both hold the same keys and interpolation for every column
+# Description : A parallel run must give exactly what a single process gives
+############################################
+def sameBuffers(first, second):
+    if first.keys() != second.keys():
+        return False
+    for column, (co, interpolation) in first.items():
+        other_co, other_interpolation = second[column]
+        if not np.array_equal(co, other_co):
+            return False
+        if (interpolation is None) != (other_interpolation is None):
+            return False
+        if interpolation is not None and not np.array_equal(interpolation, other_interpolation):
+            return False
+    return True
+
+############################################
+# Name        : benchMain
+# Called by   : python bench/benchKeys.py --leds 4000 --frames 10000 --workers 1 2 4 8
+# Parameters  : command line arguments
+# Returns     : exit code (1 when a parallel run differs from the single process run)
+# Description : Time prepareKeyBuffers on one synthetic sheet from 1 to N processes and print the
+#               speedup over one process. Process start up is part of the time, like in a build
+############################################
+def benchMain(argv):
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, cores} | {2 ** power for power in range(1, 8) if 2 ** power < cores})
+    parser = argparse.ArgumentParser(prog="benchKeys", description="Time the parallel keyframe preparation")
+    parser.add_argument("--leds", type=int, default=2000, help="number of LED columns")
+    parser.add_argument("--frames", type=int, default=10000, help="number of frame rows")
+    parser.add_argument("--sparsity", type=float, default=0.9, help="chance a LED keeps its brightness on a row")
+    parser.add_argument("--key-tolerance", type=float, default=0.0, help="keyframe compression tolerance, -1 keeps every key")
+    parser.add_argument("--workers", type=int, nargs='+', default=default_workers, help="process counts to run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per process count, the fastest is kept")
+    parser.add_argument("--report", default=None, help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    setLogLevel('WARNING')
+    #EVERY PROCESS COUNT ABOVE 1 GOES THROUGH THE POOL, HOWEVER SMALL THE SHEET
+    keyPrepare.PARALLEL_MIN_CELLS = keyPrepare.LOSSY_MIN_CELLS = 0
+    tolerance = None if args.key_tolerance < 0 else args.key_tolerance
+
+    frames, intensity = benchMatrix(args.leds, args.frames, args.sparsity)
+    columns = np.arange(args.leds)
+    print(f"{args.leds} LEDs x {args.frames} frames, tolerance {tolerance}, {cores} cores")
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8} {'per core':>9} {'MB back':>8}")
+    reference = None
+    base_seconds = None
+    results = []
+    exit_code = 0
+    for workers in sorted(set(args.workers)):
+        best = None
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            buffers = keyPrepare.prepareKeyBuffers(frames, intensity, columns, tolerance, workers)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        if reference is None:
+            reference, base_seconds = buffers, best
+        elif not sameBuffers(reference, buffers):
+            print(f"{workers} processes prepared different keys than 1 process")
+            exit_code = 1
+        num_bytes = sum(co.nbytes + (0 if interpolation is None else interpolation.nbytes) for co, interpolation in buffers.values())
+        speedup = base_seconds / best
+        print(f"{workers:>8} {best:>10.3f} {speedup:>8.2f} {speedup / workers:>9.2f} {num_bytes / 1e6:>8.1f}")
+        results.append({"workers": workers, "seconds": best, "speedup": speedup, "bytes": num_bytes})
+    if workers > cores:
+        print(f"Only {cores} cores on this machine, runs with more processes than cores cannot scale")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "cores": cores,
+                       "leds": args.leds, "frames": args.frames, "tolerance": tolerance, "runs": results}, file, indent=2)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(benchMain(sys.argv[1:]))
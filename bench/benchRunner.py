@@ -0,0 +1,306 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+#The stand-in bpy comes first so the pipeline imports it instead of blender's
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.dirname(bench_dir), os.path.join(bench_dir, "stub")):
+    if not path in sys.path:
+        sys.path.insert(0, path)
+
+import bpy
+from benchWorkbook import makeWorkbook, benchSections, LAYOUTS
+from ledProfile import setLogLevel
+
+#Allowed slowdown and memory growth before a stage counts as a regression
+DEFAULT_TOLERANCE = 0.25
+#Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_BYTES = 1 << 20
+#Counts a stage may not raise above the baseline
+CHECKED_COUNTS = ("operators", "objects", "materials", "images", "fcurves", "keyframes", "keyframeInserts")
+#Size of the sheet run once before the cases
+WARMUP_LEDS = 20
+WARMUP_FRAMES = 100
+DEFAULT_BASELINE = os.path.join(bench_dir, "baseline.json")
+DEFAULT_DATA_DIR = os.path.join(bench_dir, "data")
+
+############################################
+# Name        : measureStage
+# Called by   : runCase
+# Parameters  : dictionary of stage results, stage name, function, arguments
+# Returns     : result of the function
+# Description : Run one pipeline stage and record its wall time, peak traced memory and the
+#               data blocks, keyframes and operator calls it added. Pipeline output is dropped
+############################################
+def measureStage(stages, name, function, *args):
+    before = bpy.counts()
+    tracemalloc.reset_peak()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = function(*args)
+    seconds = time.perf_counter() - start
+    peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+    after = bpy.counts()
+    stages[name] = {"seconds": seconds, "peakBytes": peak_bytes,
+                    "counts": {key: after[key] - before[key] for key in after}}
+    return result
+
+############################################
+# Name        : readSheet
+# Called by   : runCase
+# Parameters  : workbook path, LED sections, drop the parsed workbook and its sidecar first
+# Returns     : array of frame numbers, matrix of emission strengths
+# Description : The reading part of animation main, cold parses the workbook, warm reads the sidecar
+############################################
+def readSheet(path, ledSections, cold):
+    from ledData import readTimes, readIntensityBlock, glowCurve
+    from ledSidecar import loadSheetArrays
+    from ledTime import TimeBase, applyTimeBase
+    if cold:
+        dropSheet(path)
+    sheet = loadSheetArrays(path, "Sheet1", 0, 1)
+    frames_list, intensity = applyTimeBase(readTimes(sheet, 0), readIntensityBlock(sheet, 0, 1, ledSections), TimeBase())
+    return frames_list, glowCurve(intensity)
+
+############################################
+# Name        : dropSheet
+# Called by   : readSheet, runCase
+# Parameters  : workbook path
+# Returns     : N/A
+# Description : Forget the parsed workbook and remove its sidecar so it is read from the file again
+############################################
+def dropSheet(path):
+    from workbookCache import invalidateWorkbook
+    from ledSidecar import sidecarPath
+    invalidateWorkbook(path)
+    sidecar = sidecarPath(path, "Sheet1")
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+
+############################################
+# Name        : runCase
+# Called by   : runBench
+# Parameters  : workbook path, LED sections as dictionaries, argparse arguments
+# Returns     : dictionary of stage results
+# Description : Run every stage of animation main on an empty stub scene, in the same order
+############################################
+def runCase(path, sections, args):
+    import animation
+    from ledBatch import sectionFromDict
+    from ledData import materialPoolKeys
+    from ledLayout import ledTable, LED_SIZE
+    from ledStream import iterSheetChunks
+    from textureAnimation import createTextureAnimation
+
+    bpy.reset()
+    ledSections = [sectionFromDict(section) for section in sections]
+    stages = {}
+    if not args.chunk_rows:
+        measureStage(stages, "readSheet", readSheet, path, ledSections, True)
+        frames_list, glow_matrix = measureStage(stages, "readSidecar", readSheet, path, ledSections, False)
+    table = measureStage(stages, "layout", ledTable, ledSections, LED_SIZE)
+
+    pool_keys = None
+    if args.mode == 'POOLED':
+        pool_keys = measureStage(stages, "poolKeys", materialPoolKeys, glow_matrix, ledSections)
+    elif args.mode == 'TEXTURE':
+        pool_keys = [args.mode] * len(table)
+    measureStage(stages, "createBars", animation.createBars, LED_SIZE, table, pool_keys)
+
+    if args.chunk_rows:
+        dropSheet(path)
+        chunks = iterSheetChunks(path, "Sheet1", 0, 1, args.chunk_rows)
+        measureStage(stages, "streamKeyFrames", animation.streamKeyFrames, table, ledSections,
+                     chunks, 1, not args.legacy_keyframes, args.key_tolerance)
+    elif args.mode == 'TEXTURE':
+        measureStage(stages, "createTextureAnimation", createTextureAnimation, table,
+                     table.materials[0], frames_list, glow_matrix)
+    else:
+        measureStage(stages, "createKeyFrames", animation.createKeyFrames, table, frames_list,
+                     glow_matrix, not args.legacy_keyframes, args.key_tolerance)
+    return stages
+
+############################################
+# Name        : caseName
+# Called by   : runBench
+# Parameters  : number of LEDs, number of frames, argparse arguments
+# Returns     : name the case is stored under in the baseline
+# Description : Every setting that changes the work done is part of the name
+############################################
+def caseName(numLeds, numFrames, args):
+    name = f"{numLeds}x{numFrames} {args.layout} sparsity={args.sparsity:g} {args.mode}"
+    if args.chunk_rows:
+        name += f" chunk={args.chunk_rows}"
+    if args.key_tolerance is not None:
+        name += f" tolerance={args.key_tolerance:g}"
+    if args.legacy_keyframes:
+        name += " legacy"
+    return name
+
+############################################
+# Name        : runBench
+# Called by   : benchMain
+# Parameters  : argparse arguments
+# Returns     : dictionary of every case and its stage results
+# Description : Generate a workbook for every LED and frame count (kept between runs) and time
+#               the pipeline on it. Cases run from small to large
+############################################
+def runBench(args):
+    os.makedirs(args.data, exist_ok=True)
+    #WARM UP ON A SMALL SHEET SO IMPORTS DONE ON FIRST USE ARE NOT TIMED IN THE FIRST CASE
+    warm_path = os.path.join(args.data, f"bench_warmup.{args.format}")
+    warm_sections = makeWorkbook(warm_path, WARMUP_LEDS, WARMUP_FRAMES, args.sparsity, args.section_leds, args.layout)
+    runCase(warm_path, warm_sections, args)
+    cases = {}
+    tracemalloc.start()
+    try:
+        for numLeds in sorted(args.leds):
+            for numFrames in sorted(args.frames):
+                name = caseName(numLeds, numFrames, args)
+                path = os.path.join(args.data, f"bench_{numLeds}x{numFrames}_{args.layout}_{args.sparsity:g}.{args.format}")
+                sections = benchSections(numLeds, args.section_leds, args.layout)
+                if not os.path.exists(path):
+                    #WRITTEN UNDER ANOTHER NAME FIRST SO AN INTERRUPTED RUN NEVER LEAVES HALF A WORKBOOK
+                    start = time.perf_counter()
+                    temp_path = os.path.splitext(path)[0] + ".tmp." + args.format
+                    makeWorkbook(temp_path, numLeds, numFrames, args.sparsity, args.section_leds, args.layout)
+                    os.replace(temp_path, path)
+                    print(f"Generated {path} in {time.perf_counter() - start:.1f}s")
+                stages = runCase(path, sections, args)
+                cases[name] = {"leds": numLeds, "frames": numFrames, "stages": stages}
+                print(f"{name}: " + ", ".join(f"{stage} {result['seconds']:.3f}s" for stage, result in stages.items()))
+    finally:
+        tracemalloc.stop()
+    return cases
+
+############################################
+# Name        : printScaling
+# Called by   : benchMain
+# Parameters  : dictionary of cases
+# Returns     : N/A
+# Description : Print every stage over the cases with how its time grows with the work
+#               (LEDs x frames). A growth of 1 is linear, 2 is quadratic
+############################################
+def printScaling(cases):
+    stage_names = []
+    for case in cases.values():
+        stage_names.extend(stage for stage in case["stages"] if stage not in stage_names)
+    for stage in stage_names:
+        print(f"\n{stage}")
+        print(f"{'LEDs':>8} {'frames':>8} {'seconds':>10} {'peak MB':>9} {'objects':>8} {'keyframes':>11} {'growth':>7}")
+        previous = None
+        for case in cases.values():
+            result = case["stages"].get(stage)
+            if result is None:
+                continue
+            work = case["leds"] * case["frames"]
+            growth = ""
+            if previous and work > previous[0] and previous[1] > 0 and result["seconds"] > 0:
+                growth = f"{math.log(result['seconds'] / previous[1]) / math.log(work / previous[0]):.2f}"
+            print(f"{case['leds']:>8} {case['frames']:>8} {result['seconds']:>10.3f} {result['peakBytes'] / 1e6:>9.1f} "
+                  f"{result['counts']['objects']:>8} {result['counts']['keyframes']:>11} {growth:>7}")
+            previous = (work, result["seconds"])
+
+############################################
+# Name        : findRegressions
+# Called by   : benchMain
+# Parameters  : dictionary of cases, dictionary of baseline cases, allowed slowdown, allowed memory growth
+# Returns     : list of regression messages
+# Description : A stage regressed when it got slower or used more memory than allowed, or when it
+#               made more data blocks, keyframes or operator calls than the baseline
+############################################
+def findRegressions(cases, baseline, tolerance, memoryTolerance):
+    regressions = []
+    for name, case in cases.items():
+        if name not in baseline:
+            print(f"{name}: no baseline")
+            continue
+        for stage, result in case["stages"].items():
+            base = baseline[name]["stages"].get(stage)
+            if base is None:
+                continue
+            seconds = result["seconds"]
+            if seconds > base["seconds"] * (1 + tolerance) and seconds - base["seconds"] > MIN_SECONDS:
+                regressions.append(f"{name} {stage}: {seconds:.3f}s, baseline {base['seconds']:.3f}s")
+            peak = result["peakBytes"]
+            if peak > base["peakBytes"] * (1 + memoryTolerance) and peak - base["peakBytes"] > MIN_BYTES:
+                regressions.append(f"{name} {stage}: peak {peak / 1e6:.1f} MB, baseline {base['peakBytes'] / 1e6:.1f} MB")
+            for key in CHECKED_COUNTS:
+                if result["counts"].get(key, 0) > base["counts"].get(key, 0):
+                    regressions.append(f"{name} {stage}: {result['counts'][key]} {key}, baseline {base['counts'][key]}")
+    return regressions
+
+############################################
+# Name        : benchMain
+# Called by   : python bench/benchRunner.py --leds 100 1000 10000 --frames 1000 10000
+# Parameters  : command line arguments
+# Returns     : exit code (1 when a stage regressed against the baseline)
+# Description : Time every pipeline stage on synthetic workbooks with the stand-in bpy, compare
+#               the results with the baseline and optionally save them as the new baseline
+############################################
+def benchMain(argv):
+    parser = argparse.ArgumentParser(prog="benchRunner", description="Time the LED pipeline stages outside blender")
+    parser.add_argument("--leds", type=int, nargs='+', default=[100, 1000], help="LED counts to run")
+    parser.add_argument("--frames", type=int, nargs='+', default=[1000, 10000], help="frame counts to run")
+    parser.add_argument("--sparsity", type=float, default=0.9, help="chance a LED keeps its brightness on a row")
+    parser.add_argument("--section-leds", type=int, default=50, help="LEDs per section")
+    parser.add_argument("--layout", choices=LAYOUTS, default='grid', help="how the sections are laid out")
+    parser.add_argument("--mode", choices=['KEYFRAMES', 'POOLED', 'TEXTURE'], default='KEYFRAMES', help="animation mode")
+    parser.add_argument("--chunk-rows", type=int, default=0,
+                        help="stream the sheet in chunks of this many rows (needed for the largest sheets)")
+    parser.add_argument("--key-tolerance", type=float, default=None, help="keyframe compression tolerance")
+    parser.add_argument("--legacy-keyframes", action='store_true', help="insert keyframes one at a time")
+    parser.add_argument("--format", choices=['csv', 'parquet', 'xlsx'], default='parquet', help="workbook format")
+    parser.add_argument("--data", default=DEFAULT_DATA_DIR, help="folder for the generated workbooks")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON baseline to compare with")
+    parser.add_argument("--save-baseline", action='store_true', help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown (0.25 is 25%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed memory growth")
+    parser.add_argument("--report", default=None, help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    if args.mode != 'KEYFRAMES' and args.chunk_rows:
+        parser.error("--chunk-rows only works with the KEYFRAMES mode")
+    #PIPELINE MESSAGES ARE NOT PART OF WHAT IS TIMED
+    setLogLevel('WARNING')
+
+    cases = runBench(args)
+    printScaling(cases)
+    results = {"python": platform.python_version(), "machine": platform.machine(), "cases": cases}
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)["cases"]
+        regressions = findRegressions(cases, baseline, args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            exit_code = 1
+        else:
+            print("\nNo regressions against the baseline")
+
+    if args.save_baseline:
+        #CASES NOT RUN THIS TIME KEEP THEIR OLD BASELINE
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as file:
+                baseline = json.load(file)["cases"]
+        baseline.update(cases)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump({**results, "cases": baseline}, file, indent=2)
+        print(f"\nSaved the baseline to {args.baseline}")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(benchMain(sys.argv[1:]))
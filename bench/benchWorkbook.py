@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pds
+
+#Cells generated and written at a time, keeps 10k LEDs x 100k frames within memory
+GENERATE_CELLS = 5000000
+#LED section layouts the generator can lay out
+LAYOUTS = ('strips', 'columns', 'grid')
+COLORS = ('White', 'Yellow', 'Red')
+
+############################################
+# Name        : benchSections
+# Called by   : makeWorkbook, bench benchRunner
+# Parameters  : number of LEDs, LEDs per section, layout ('strips', 'columns' or 'grid')
+# Returns     : list of LED sections as dictionaries (the format of ledBatch job files)
+# Description : Split the LED columns into sections. Strips are horizontal sections stacked in rows,
+#               columns are vertical sections side by side and grid mixes both directions,
+#               reversed sections and colors over a square grid of cells
+############################################
+def benchSections(numLeds, sectionLeds, layout):
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout}, use one of {', '.join(LAYOUTS)}")
+    sectionLeds = max(1, sectionLeds)
+    num_sections = -(-numLeds // sectionLeds)
+    grid_cols = max(1, int(np.ceil(np.sqrt(num_sections))))
+    sections = []
+    for index, start in enumerate(range(0, numLeds, sectionLeds)):
+        end = min(start + sectionLeds, numLeds) - 1
+        if layout == 'strips':
+            row, col, vert = index, 0, False
+        elif layout == 'columns':
+            row, col, vert = 0, index, True
+        else:
+            row, col, vert = index // grid_cols, index % grid_cols, bool(index % 2)
+        reverse = layout == 'grid' and index % 3 == 2
+        if reverse:
+            #A REVERSED SECTION RUNS FROM ITS LAST COLUMN BACK TO ITS FIRST
+            start, end = end, start
+        sections.append({"row": row, "col": col, "start": start, "end": end, "vert": vert,
+                         "reverse": reverse, "color": COLORS[index % len(COLORS)]})
+    return sections
+
+############################################
+# Name        : brightnessRows
+# Called by   : makeWorkbook
+# Parameters  : random generator, number of rows, number of LEDs, sparsity, brightness of the row before
+# Returns     : matrix (rows x LEDs) of brightness percentages
+# Description : A LED changes brightness on a row with probability 1 - sparsity and keeps its
+#               brightness otherwise, half of the changes switch it off. A sparse sheet is
+#               mostly long holds, the case keyframe compression and pooling are made for
+############################################
+def brightnessRows(rng, numRows, numLeds, sparsity, previous):
+    changes = rng.random((numRows, numLeds)) >= sparsity
+    new_values = np.where(rng.random((numRows, numLeds)) < 0.5, 0, rng.integers(1, 101, (numRows, numLeds)))
+    #FORWARD FILL EVERY HOLD FROM THE LAST CHANGE ABOVE IT (ROW -1 IS THE ROW BEFORE THE CHUNK)
+    last_change = np.where(changes, np.arange(numRows)[:, None], -1)
+    np.maximum.accumulate(last_change, axis=0, out=last_change)
+    held = np.take_along_axis(new_values, np.maximum(last_change, 0), axis=0)
+    return np.where(last_change >= 0, held, previous[None, :]).astype(np.int16)
+
+############################################
+# Name        : makeWorkbook
+# Called by   : benchMain, bench benchRunner
+# Parameters  : output path (.csv, .parquet or .xlsx), number of LEDs, number of frames, sparsity,
+#               LEDs per section, layout, random seed
+# Returns     : list of LED sections as dictionaries, the LEDs start in column 1 and row 0
+# Description : Write a synthetic sheet with a frame column and one brightness column per LED.
+#               Rows are generated and written in pieces so large sheets never sit in memory
+############################################
+def makeWorkbook(path, numLeds, numFrames, sparsity=0.9, sectionLeds=50, layout='grid', seed=0):
+    sections = benchSections(numLeds, sectionLeds, layout)
+    columns = ["Time"] + [f"LED{index + 1}" for index in range(numLeds)]
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.xlsx' and (numFrames + 1 > 1048576 or numLeds + 1 > 16384):
+        raise ValueError("An .xlsx sheet holds at most 1048576 rows and 16384 columns, use .csv or .parquet")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    previous = np.zeros(numLeds, dtype=np.int16)
+    writer = None
+    frames = []
+    generate_rows = max(1, GENERATE_CELLS // max(numLeds, 1))
+    try:
+        for first in range(0, numFrames, generate_rows):
+            num_rows = min(generate_rows, numFrames - first)
+            block = brightnessRows(rng, num_rows, numLeds, sparsity, previous)
+            previous = block[-1]
+            chunk = pds.DataFrame(block, columns=columns[1:])
+            chunk.insert(0, "Time", np.arange(first, first + num_rows))
+            if extension == '.csv':
+                chunk.to_csv(path, mode='w' if first == 0 else 'a', header=first == 0, index=False)
+            elif extension in ('.parquet', '.pq'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                frames.append(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if frames:
+        pds.concat(frames).to_excel(path, index=False)
+    return sections
+
+############################################
+# Name        : benchMain
+# Called by   : python bench/benchWorkbook.py out.csv --leds 1000 --frames 10000
+# Parameters  : command line arguments
+# Returns     : exit code
+# Description : Write a synthetic workbook and a ledBatch job file that builds it
+############################################
+def benchMain(argv):
+    parser = argparse.ArgumentParser(prog="benchWorkbook", description="Write a synthetic LED workbook")
+    parser.add_argument("output", help=".csv, .parquet or .xlsx file to write")
+    parser.add_argument("--leds", type=int, default=1000, help="number of LED columns")
+    parser.add_argument("--frames", type=int, default=1000, help="number of frame rows")
+    parser.add_argument("--sparsity", type=float, default=0.9, help="chance a LED keeps its brightness on a row")
+    parser.add_argument("--section-leds", type=int, default=50, help="LEDs per section")
+    parser.add_argument("--layout", choices=LAYOUTS, default='grid', help="how the sections are laid out")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--job", default=None, help="also write a ledBatch job file for the workbook")
+    args = parser.parse_args(argv)
+
+    sections = makeWorkbook(args.output, args.leds, args.frames, args.sparsity, args.section_leds, args.layout, args.seed)
+    print(f"Wrote {args.leds} LEDs x {args.frames} frames in {len(sections)} sections to {args.output}")
+    if args.job:
+        job = {"name": os.path.splitext(os.path.basename(args.output))[0], "workbook": os.path.abspath(args.output),
+               "sheet": "Sheet1", "startRow": 0, "startCol": 1, "sections": sections}
+        with open(args.job, 'w', encoding='utf-8') as file:
+            json.dump({"jobs": [job]}, file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(benchMain(sys.argv[1:]))
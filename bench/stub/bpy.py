@@ -0,0 +1,636 @@
+import types as _types
+import numpy as np
+
+#Stand-in for the parts of blender's bpy module the LED pipeline uses, so the pipeline can be
+#timed in plain python. Nothing is drawn, it only keeps the data blocks and counts the work
+
+#Calls counted since the last reset()
+_stats = {"operators": 0, "keyframeInserts": 0, "foreachSets": 0}
+
+#Default name and type of the shader nodes the pipeline creates
+NODE_TYPES = {
+    'ShaderNodeOutputMaterial': ('Material Output', 'OUTPUT_MATERIAL'),
+    'ShaderNodeBsdfPrincipled': ('Principled BSDF', 'BSDF_PRINCIPLED'),
+    'ShaderNodeEmission': ('Emission', 'EMISSION'),
+    'ShaderNodeTexImage': ('Image Texture', 'TEX_IMAGE'),
+    'ShaderNodeMath': ('Math', 'MATH'),
+    'ShaderNodeValue': ('Value', 'VALUE'),
+    'ShaderNodeAttribute': ('Attribute', 'ATTRIBUTE'),
+    'ShaderNodeCombineXYZ': ('Combine XYZ', 'COMBXYZ'),
+    'ShaderNodeSeparateColor': ('Separate Color', 'SEPARATE_COLOR'),
+    'ShaderNodeSeparateRGB': ('Separate RGB', 'SEPRGB'),
+    'ShaderNodeObjectInfo': ('Object Info', 'OBJECT_INFO'),
+}
+
+############################################
+# Name        : uniqueName
+# Called by   : DataCollection new, Nodes new
+# Parameters  : set of names in use, dictionary of the last number used per name, wanted name
+# Returns     : wanted name, or the name with the next free .001 suffix like blender
+# Description : Numbering is remembered per name so creating thousands of LEDs stays linear
+############################################
+def uniqueName(names, counters, name):
+    if name not in names:
+        return name
+    number = counters.get(name, 0)
+    while True:
+        number += 1
+        unique = f"{name}.{number:03d}"
+        if unique not in names:
+            counters[name] = number
+            return unique
+
+class ID():
+    def __init__(self, name=""):
+        self.name = name
+        self.users = 0
+        self.use_fake_user = False
+        self.animation_data = None
+        self._props = {}
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        self._props[key] = value
+
+    def __contains__(self, key):
+        return key in self._props
+
+    def get(self, key, default=None):
+        return self._props.get(key, default)
+
+    def as_pointer(self):
+        return id(self)
+
+    def animation_data_create(self):
+        if self.animation_data is None:
+            self.animation_data = AnimData()
+        return self.animation_data
+
+class AnimData():
+    def __init__(self):
+        self.action = None
+        self.drivers = FCurves()
+        self.nla_tracks = NlaTracks()
+
+class NlaStrip():
+    def __init__(self, name, start, action):
+        self.name = name
+        self.action = action
+        self.frame_start = float(start)
+
+class NlaStrips(list):
+    def new(self, name, start, action):
+        strip = NlaStrip(name, start, action)
+        self.append(strip)
+        return strip
+
+    def get(self, name, default=None):
+        return next((strip for strip in self if strip.name == name), default)
+
+class NlaTrack():
+    def __init__(self):
+        self.name = "NlaTrack"
+        self.mute = False
+        self.strips = NlaStrips()
+
+class NlaTracks(list):
+    def new(self, prev=None):
+        track = NlaTrack()
+        self.append(track)
+        return track
+
+    def get(self, name, default=None):
+        return next((track for track in self if track.name == name), default)
+
+class DataCollection():
+    def __init__(self, factory):
+        self._factory = factory
+        self._items = {}
+        self._counters = {}
+
+    def new(self, name, *args, **kwargs):
+        item = self._factory(uniqueName(self._items, self._counters, name), *args, **kwargs)
+        self._items[item.name] = item
+        return item
+
+    def remove(self, item, **kwargs):
+        del self._items[item.name]
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def __getitem__(self, name):
+        return self._items[name]
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+class KeyframePoints():
+    def __init__(self):
+        self._co = np.zeros((0, 2), dtype=np.float32)
+        self._interpolation = np.zeros(0, dtype=np.int32)
+        #KEYS INSERTED AFTER THE LAST KEY ARE BUFFERED SO KEYFRAME_INSERT STAYS LINEAR
+        self._tail = []
+
+    def _flush(self):
+        if self._tail:
+            tail = np.array(self._tail, dtype=np.float32)
+            interpolation = np.full(len(tail), _interpolationValue(), dtype=np.int32)
+            self._co = np.concatenate((self._co, tail))
+            self._interpolation = np.concatenate((self._interpolation, interpolation))
+            self._tail = []
+
+    def __len__(self):
+        return len(self._co) + len(self._tail)
+
+    def add(self, count):
+        self._flush()
+        self._co = np.concatenate((self._co, np.zeros((count, 2), dtype=np.float32)))
+        self._interpolation = np.concatenate((self._interpolation, np.full(count, _interpolationValue(), dtype=np.int32)))
+
+    def clear(self):
+        self.__init__()
+
+    def insert(self, frame, value, options=None):
+        last = self._tail[-1][0] if self._tail else (self._co[-1, 0] if len(self._co) else None)
+        if last is None or frame > last:
+            self._tail.append((frame, value))
+            return
+        self._flush()
+        index = int(np.searchsorted(self._co[:, 0], frame))
+        if index < len(self._co) and self._co[index, 0] == frame:
+            self._co[index, 1] = value
+            return
+        self._co = np.insert(self._co, index, (frame, value), axis=0)
+        self._interpolation = np.insert(self._interpolation, index, _interpolationValue())
+
+    def foreach_set(self, attr, seq):
+        self._flush()
+        _stats["foreachSets"] += 1
+        values = np.asarray(seq)
+        if attr == 'co':
+            if values.size != self._co.size:
+                raise RuntimeError(f"foreach_set: expected {self._co.size} values for co, got {values.size}")
+            self._co = values.astype(np.float32).reshape(-1, 2)
+        elif values.size != len(self._co):
+            raise RuntimeError(f"foreach_set: expected {len(self._co)} values for {attr}, got {values.size}")
+        elif attr == 'interpolation':
+            self._interpolation = values.astype(np.int32)
+
+    def foreach_get(self, attr, seq):
+        self._flush()
+        if attr == 'co':
+            seq[:] = self._co.ravel()
+        elif attr == 'interpolation':
+            seq[:] = self._interpolation
+
+class FCurve():
+    def __init__(self, data_path, index=0):
+        self.data_path = data_path
+        self.array_index = index
+        self.keyframe_points = KeyframePoints()
+
+    def update(self):
+        points = self.keyframe_points
+        points._flush()
+        order = np.argsort(points._co[:, 0], kind='stable')
+        points._co = points._co[order]
+        points._interpolation = points._interpolation[order]
+
+class FCurves():
+    def __init__(self):
+        self._fcurves = {}
+
+    def new(self, data_path, index=0, action_group=""):
+        if (data_path, index) in self._fcurves:
+            raise RuntimeError(f"F-Curve '{data_path}[{index}]' already exists in action")
+        fcurve = FCurve(data_path, index)
+        self._fcurves[(data_path, index)] = fcurve
+        return fcurve
+
+    def find(self, data_path, index=0):
+        return self._fcurves.get((data_path, index))
+
+    def remove(self, fcurve):
+        del self._fcurves[(fcurve.data_path, fcurve.array_index)]
+
+    def __iter__(self):
+        return iter(list(self._fcurves.values()))
+
+    def __len__(self):
+        return len(self._fcurves)
+
+class Action(ID):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self.fcurves = FCurves()
+
+class NodeSocket():
+    def __init__(self, node, name, index, is_output):
+        self.node = node
+        self.name = name
+        self.index = index
+        self.is_output = is_output
+        self.default_value = 0.0
+
+    @property
+    def id_data(self):
+        return self.node.id_data
+
+    def path_from_id(self, attr=None):
+        kind = "outputs" if self.is_output else "inputs"
+        path = f'nodes["{self.node.name}"].{kind}[{self.index}]'
+        return f"{path}.{attr}" if attr else path
+
+    def keyframe_insert(self, data_path, frame=None, **kwargs):
+        _stats["keyframeInserts"] += 1
+        node_tree = self.id_data
+        animation_data = node_tree.animation_data_create()
+        if animation_data.action is None:
+            animation_data.action = data.actions.new(name=node_tree.name + "Action")
+        path = self.path_from_id(data_path)
+        fcurves = animation_data.action.fcurves
+        fcurve = fcurves.find(path) or fcurves.new(path, index=0)
+        fcurve.keyframe_points.insert(frame, self.default_value)
+        return True
+
+    def driver_add(self, data_path, index=-1):
+        fcurve = self.id_data.animation_data_create().drivers.new(self.path_from_id(data_path), index=max(index, 0))
+        fcurve.driver = _types.SimpleNamespace(type='AVERAGE', expression="", variables=[])
+        return fcurve
+
+class NodeSockets():
+    def __init__(self, node, is_output):
+        self._node = node
+        self._is_output = is_output
+        self._sockets = []
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for socket in self._sockets:
+                if socket.name == key:
+                    return socket
+            socket = NodeSocket(self._node, key, len(self._sockets), self._is_output)
+            self._sockets.append(socket)
+            return socket
+        #SOCKETS ARE MADE WHEN FIRST USED, THE STUB DOES NOT KNOW THE SOCKETS OF EACH NODE TYPE
+        while len(self._sockets) <= key:
+            self._sockets.append(NodeSocket(self._node, f"Socket_{len(self._sockets)}", len(self._sockets), self._is_output))
+        return self._sockets[key]
+
+class Node():
+    def __init__(self, id_data, name, type):
+        self.id_data = id_data
+        self.name = name
+        self.type = type
+        self.location = (0.0, 0.0)
+        self.inputs = NodeSockets(self, False)
+        self.outputs = NodeSockets(self, True)
+
+class Nodes():
+    def __init__(self, id_data):
+        self._id_data = id_data
+        self._nodes = {}
+        self._counters = {}
+
+    def new(self, type):
+        name, node_type = NODE_TYPES.get(type, (type, type))
+        node = Node(self._id_data, uniqueName(self._nodes, self._counters, name), node_type)
+        self._nodes[node.name] = node
+        return node
+
+    def get(self, name, default=None):
+        return self._nodes.get(name, default)
+
+    def remove(self, node):
+        del self._nodes[node.name]
+
+    def __iter__(self):
+        return iter(list(self._nodes.values()))
+
+    def __len__(self):
+        return len(self._nodes)
+
+class NodeLinks(list):
+    def new(self, from_socket, to_socket):
+        link = _types.SimpleNamespace(from_socket=from_socket, to_socket=to_socket)
+        self.append(link)
+        return link
+
+class NodeTree(ID):
+    def __init__(self, name="Shader Nodetree"):
+        super().__init__(name)
+        self.nodes = Nodes(self)
+        self.links = NodeLinks()
+
+class Material(ID):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self.node_tree = None
+
+    @property
+    def use_nodes(self):
+        return self.node_tree is not None
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        #A NEW NODE MATERIAL STARTS WITH A PRINCIPLED BSDF CONNECTED TO THE OUTPUT LIKE IN BLENDER
+        if value and self.node_tree is None:
+            self.node_tree = NodeTree()
+            bsdf = self.node_tree.nodes.new(type='ShaderNodeBsdfPrincipled')
+            output = self.node_tree.nodes.new(type='ShaderNodeOutputMaterial')
+            self.node_tree.links.new(bsdf.outputs[0], output.inputs[0])
+
+class Mesh(ID):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self.vertices = []
+        self.polygons = []
+        self.materials = []
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices = list(vertices)
+        self.polygons = list(faces)
+
+    def update(self):
+        pass
+
+class MaterialSlot():
+    def __init__(self):
+        self.link = 'DATA'
+        self.material = None
+
+class Object(ID):
+    def __init__(self, name="", object_data=None):
+        super().__init__(name)
+        self.data = object_data
+        self.type = 'MESH' if isinstance(object_data, Mesh) else 'EMPTY'
+        self.location = (0.0, 0.0, 0.0)
+        self.scale = (1.0, 1.0, 1.0)
+        self.color = (1.0, 1.0, 1.0, 1.0)
+        self.material_slots = [MaterialSlot() for _ in getattr(object_data, "materials", [])]
+        self.users_collection = []
+        self._selected = False
+
+    @property
+    def active_material(self):
+        return self.material_slots[0].material if self.material_slots else None
+
+    @active_material.setter
+    def active_material(self, material):
+        if not self.material_slots:
+            self.material_slots.append(MaterialSlot())
+        old = self.material_slots[0].material
+        if old is not None:
+            old.users -= 1
+        if material is not None:
+            material.users += 1
+        self.material_slots[0].material = material
+
+    def select_set(self, state):
+        self._selected = state
+
+    def select_get(self):
+        return self._selected
+
+class CollectionObjects():
+    def __init__(self, collection):
+        self._collection = collection
+        self._objects = {}
+
+    def link(self, ob):
+        if ob.name in self._objects:
+            raise RuntimeError(f"Object '{ob.name}' already in collection '{self._collection.name}'")
+        self._objects[ob.name] = ob
+        ob.users += 1
+        ob.users_collection.append(self._collection)
+
+    def unlink(self, ob):
+        del self._objects[ob.name]
+        ob.users -= 1
+        ob.users_collection.remove(self._collection)
+
+    def __iter__(self):
+        return iter(list(self._objects.values()))
+
+    def __len__(self):
+        return len(self._objects)
+
+class Collection(ID):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self.objects = CollectionObjects(self)
+        self.children = []
+
+    @property
+    def all_objects(self):
+        objects = list(self.objects)
+        for child in self.children:
+            objects.extend(child.all_objects)
+        return objects
+
+class ImagePixels():
+    def __init__(self, size):
+        self._pixels = np.zeros(size, dtype=np.float32)
+
+    def foreach_set(self, seq):
+        _stats["foreachSets"] += 1
+        values = np.asarray(seq, dtype=np.float32)
+        if values.size != self._pixels.size:
+            raise RuntimeError(f"foreach_set: expected {self._pixels.size} pixel values, got {values.size}")
+        self._pixels = values.ravel()
+
+    def __len__(self):
+        return self._pixels.size
+
+class Image(ID):
+    def __init__(self, name="", width=1, height=1, alpha=False, float_buffer=False):
+        super().__init__(name)
+        self.size = (width, height)
+        self.pixels = ImagePixels(width * height * 4)
+        self.colorspace_settings = _types.SimpleNamespace(name='sRGB')
+        self.alpha_mode = 'STRAIGHT'
+        self.file_format = 'PNG'
+        self.packed_file = None
+
+    def update(self):
+        pass
+
+    def pack(self):
+        self.packed_file = _types.SimpleNamespace(size=len(self.pixels) * 4)
+
+class Scene(ID):
+    def __init__(self, name="Scene"):
+        super().__init__(name)
+        self.collection = Collection("Scene Collection")
+        self.render = _types.SimpleNamespace(engine='BLENDER_EEVEE', fps=24, fps_base=1.0, filepath="")
+        self.eevee = _types.SimpleNamespace(use_bloom=False)
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_current = 1
+
+    @property
+    def objects(self):
+        return self.collection.all_objects
+
+class Operator():
+    def __init__(self, idname, function=None):
+        self.idname = idname
+        self.function = function
+
+    def __call__(self, *args, **kwargs):
+        _stats["operators"] += 1
+        if self.function is not None:
+            self.function(**kwargs)
+        return {'FINISHED'}
+
+class OperatorModule():
+    def __init__(self, name, functions=None):
+        self._name = name
+        self._functions = functions or {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Operator(f"{self._name}.{name}", self._functions.get(name))
+
+############################################
+# Name        : _interpolationValue
+# Called by   : KeyframePoints
+# Parameters  : N/A
+# Returns     : raw interpolation value of new keyframes from the preferences
+# Description : New keyframes use the interpolation set in the preferences like in blender
+############################################
+def _interpolationValue():
+    return {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}.get(context.preferences.edit.keyframe_new_interpolation_type, 2)
+
+############################################
+# Name        : _primitiveCubeAdd
+# Called by   : bpy.ops.mesh.primitive_cube_add
+# Parameters  : size, location
+# Returns     : N/A
+# Description : Add a cube object to the active collection and make it the active object
+############################################
+def _primitiveCubeAdd(size=2.0, location=(0.0, 0.0, 0.0), **kwargs):
+    half = size / 2
+    mesh = data.meshes.new(name='Cube')
+    mesh.from_pydata([(x * half, y * half, z * half) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], [], [])
+    ob = data.objects.new('Cube', mesh)
+    ob.location = tuple(location)
+    context.collection.objects.link(ob)
+    context.view_layer.objects.active = ob
+    context.active_object = ob
+
+############################################
+# Name        : _selectAll
+# Called by   : bpy.ops.object.select_all
+# Parameters  : action
+# Returns     : N/A
+# Description : Select or deselect every object of the scene
+############################################
+def _selectAll(action='TOGGLE', **kwargs):
+    for ob in context.scene.objects:
+        ob.select_set(action == 'SELECT')
+
+############################################
+# Name        : _deleteObjects
+# Called by   : bpy.ops.object.delete
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Unlink and remove the selected objects
+############################################
+def _deleteObjects(**kwargs):
+    for ob in [ob for ob in context.scene.objects if ob.select_get()]:
+        for collection in list(ob.users_collection):
+            collection.objects.unlink(ob)
+        ob.active_material = None
+        data.objects.remove(ob)
+
+############################################
+# Name        : _batchRemove
+# Called by   : bpy.data.batch_remove
+# Parameters  : list of data blocks
+# Returns     : N/A
+# Description : Remove data blocks of any type, unlinking removed objects from their collections
+############################################
+def _batchRemove(ids):
+    collections = {Object: data.objects, Mesh: data.meshes, Material: data.materials, Action: data.actions,
+                   Image: data.images, Collection: data.collections, NodeTree: data.node_groups}
+    for datablock in ids:
+        if isinstance(datablock, Object):
+            for collection in list(datablock.users_collection):
+                collection.objects.unlink(datablock)
+            datablock.active_material = None
+        collection = collections[type(datablock)]
+        if datablock.name in collection:
+            collection.remove(datablock)
+
+############################################
+# Name        : reset
+# Called by   : bench benchRunner
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Start again from an empty file with an empty scene
+############################################
+def reset():
+    global data
+    data = _types.SimpleNamespace(
+        objects=DataCollection(Object), meshes=DataCollection(Mesh), materials=DataCollection(Material),
+        actions=DataCollection(Action), images=DataCollection(Image), collections=DataCollection(Collection),
+        node_groups=DataCollection(NodeTree), scenes=DataCollection(Scene), filepath="", batch_remove=_batchRemove)
+    scene = data.scenes.new("Scene")
+    context.scene = scene
+    context.collection = scene.collection
+    context.active_object = None
+    context.view_layer = _types.SimpleNamespace(objects=_types.SimpleNamespace(active=None))
+    for key in _stats:
+        _stats[key] = 0
+
+############################################
+# Name        : counts
+# Called by   : bench benchRunner
+# Parameters  : N/A
+# Returns     : dictionary of data block counts and calls so far
+# Description : What a pipeline stage made, compared between runs to catch extra work
+############################################
+def counts():
+    fcurves = [fcurve for action in data.actions for fcurve in action.fcurves]
+    return {
+        "operators": _stats["operators"],
+        "objects": len(data.objects),
+        "meshes": len(data.meshes),
+        "materials": len(data.materials),
+        "images": len(data.images),
+        "fcurves": len(fcurves),
+        "keyframes": sum(len(fcurve.keyframe_points) for fcurve in fcurves),
+        "keyframeInserts": _stats["keyframeInserts"],
+        "foreachSets": _stats["foreachSets"],
+    }
+
+context = _types.SimpleNamespace(
+    preferences=_types.SimpleNamespace(edit=_types.SimpleNamespace(
+        keyframe_new_interpolation_type='BEZIER', keyframe_new_handle_type='AUTO_CLAMPED')),
+    window_manager=_types.SimpleNamespace(windows=[]))
+data = None
+reset()
+
+ops = _types.SimpleNamespace(
+    mesh=OperatorModule("mesh", {"primitive_cube_add": _primitiveCubeAdd}),
+    object=OperatorModule("object", {"select_all": _selectAll, "delete": _deleteObjects}),
+    wm=OperatorModule("wm"),
+    render=OperatorModule("render"),
+)
+types = _types.SimpleNamespace(ID=ID, Object=Object, Material=Material, Image=Image, Scene=Scene, NodeSocket=NodeSocket,
+                               Operator=object, Panel=object, PropertyGroup=object, WindowManager=object)
+app = _types.SimpleNamespace(binary_path="blender", version=(4, 1, 0),
+                             timers=_types.SimpleNamespace(register=lambda function, **kwargs: None,
+                                                           is_registered=lambda function: False,
+                                                           unregister=lambda function: None))
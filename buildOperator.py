@@ -0,0 +1,380 @@
+import bpy
+import threading
+import time
+from bpy.app.handlers import persistent
+from bpy.props import StringProperty, FloatProperty
+from bpy.types import Scene
+from animation import prepareSheet, prepareSheets, buildSteps, sheetSteps, sceneCounts, sceneTimeBase
+from ledBatch import buildJob, writeBuildReport
+from ledData import ExitError, SHEETS_PROPERTY
+from ledProfile import BuildProfile, log
+from ledUpdate import watchWorkbook
+from DeleteObject import removeTable
+from sheetActions import useSheet
+
+#Seconds of work on blender data between two redraws, short enough to keep the interface responsive
+SLICE_SECONDS = 0.1
+#Seconds between two timer events of a running build
+TIMER_INTERVAL = 0.02
+STAGE_LABELS = {"readSheet": "Reading the sheet", "cubes": "Cubes", "materials": "Materials", "keyframes": "Keyframes"}
+
+#Job queued for the build operator, whether a build is running and the operator running it
+_build = {}
+
+############################################
+# Name        : startBuild
+# Called by   : Panel Creation popUpMenu execute
+# Parameters  : LedJob, watch the workbook once the build finished
+# Returns     : False when a build is already running
+# Description : Hand the job to the modal build operator
+############################################
+def startBuild(job, watch=False):
+    if _build.get("running"):
+        return False
+    _build["job"] = job
+    _build["watch"] = watch
+    bpy.ops.wm.led_build_operator('INVOKE_DEFAULT')
+    return True
+
+############################################
+# Name        : dropBuildData
+# Called by   : blender before a file is loaded (load_pre handler registered by register)
+# Parameters  : path of the file being loaded (and whatever else blender passes)
+# Returns     : N/A
+# Description : The LED data of a running build is freed with the file it was built in. The
+#               operator forgets it so the cancel blender sends next never removes freed data
+############################################
+@persistent
+def dropBuildData(*args):
+    operator = _build.get("operator")
+    if operator is not None:
+        operator.fileLoaded = True
+        operator.table = None
+        operator.steps = None
+
+############################################
+# Name        : prepareJob
+# Called by   : LedBuildOperator invoke in a worker thread
+# Parameters  : LedJob, BuildProfile for the stages of the thread, TimeBase with the scene frame rate,
+#               dictionary receiving the result
+# Returns     : N/A
+# Description : Read and prepare the sheet off the main thread, the prepared sheet (a list of them
+#               for several sheets) or the error is left in the result for the operator to pick up
+############################################
+def prepareJob(job, profile, timeBase, result):
+    try:
+        if job.sheetNames:
+            result["prepared"] = prepareSheets(job.filePathName, job.sheetNames, job.ledRowStart, job.ledColStart, job.ledSections,
+                                               job.animationMode, profile, timeBase, job.keyTolerance,
+                                               job.keyWorkers if job.bulkKeyframes else None, job.window)
+            return None
+        result["prepared"] = prepareSheet(job.filePathName, job.sheetName, job.ledRowStart, job.ledColStart, job.ledSections,
+                                          job.animationMode, job.chunkRows, profile, timeBase, job.keyTolerance,
+                                          job.keyWorkers if job.bulkKeyframes else None, job.window)
+    except Exception as error:
+        result["error"] = error
+
+############################################
+# Name        : reportBuild
+# Called by   : LedBuildOperator invoke and finishBuild
+# Parameters  : scene, LedJob, finished BuildProfile, watch the workbook
+# Returns     : N/A
+# Description : Show the stages of the finished build and start watching the workbook
+############################################
+def reportBuild(scene, job, profile, watch):
+    scene.buildSummary = "\n".join(profile.summaryLines())
+    log.info("Built the LEDs in %.2fs", profile.seconds)
+    #AN UPDATE ONLY WRITES ONE WHOLE SHEET, SO MULTI SHEET AND WINDOW IMPORTS ARE NOT WATCHED
+    if watch and not job.sheetNames and job.window is None:
+        watchWorkbook(job)
+
+############################################
+# Name        : redrawPanels
+# Called by   : LedBuildOperator showProgress and endBuild
+# Parameters  : context
+# Returns     : N/A
+# Description : Redraw the side panels so the progress is seen while the build runs
+############################################
+def redrawPanels(context):
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+############################################
+# Name        : drawBuildProgress
+# Called by   : Panel Creation draw_summary
+# Parameters  : layout, scene
+# Returns     : N/A
+# Description : Progress bar of the running build, or why the last build stopped
+############################################
+def drawBuildProgress(layout, scene):
+    if not scene.buildStatus:
+        return None
+    box = layout.box()
+    if _build.get("running"):
+        box.prop(scene, "buildProgress", slider=True)
+        box.label(text=scene.buildStatus)
+        box.label(text="Press ESC to cancel")
+    else:
+        box.label(text=scene.buildStatus, icon='ERROR')
+
+############################################
+# Name        : drawSheets
+# Called by   : Panel Creation OBJECT_PT_LED_Panel draw
+# Parameters  : layout, scene
+# Returns     : N/A
+# Description : One button per sheet of the last multi sheet import
+############################################
+def drawSheets(layout, scene):
+    sheet_names = list(scene.get(SHEETS_PROPERTY, []))
+    if not sheet_names:
+        return None
+    box = layout.box()
+    box.label(text="Sheets", icon='ACTION')
+    box.operator("wm.led_use_sheet", text="All sheets back to back").sheetName = ""
+    for sheet_name in sheet_names:
+        box.operator("wm.led_use_sheet", text=sheet_name).sheetName = sheet_name
+
+class LedSheetOperator(bpy.types.Operator):
+    bl_idname = "wm.led_use_sheet"
+    bl_label = "Use Sheet"
+
+    sheetName: StringProperty(name="Sheet", default="")
+
+    ############################################
+    # Name        : execute
+    # Called by   : Panel UI sheet buttons
+    # Parameters  : self, context
+    # Returns     : 'FINISHED'
+    # Description : Play one sheet of a multi sheet import, or every sheet back to back
+    ############################################
+    def execute(self, context):
+        num_switched = useSheet(self.sheetName)
+        self.report({'INFO'}, f"{self.sheetName or 'All sheets'} on {num_switched} materials")
+        return {'FINISHED'}
+
+class LedBuildOperator(bpy.types.Operator):
+    bl_idname = "wm.led_build_operator"
+    bl_label = "Build LEDs"
+
+    ############################################
+    # Name        : invoke
+    # Called by   : startBuild
+    # Parameters  : self, context, event
+    # Returns     : 'RUNNING_MODAL' while building, 'FINISHED' or 'CANCELLED' for updates
+    # Description : Start reading the sheet in a worker thread and the timer applying the build.
+    #               Updates change the existing LEDs in place, they are run at once as they cannot be rolled back
+    ############################################
+    def invoke(self, context, event):
+        job = _build.pop("job", None)
+        watch = _build.pop("watch", False)
+        if job is None:
+            self.report({'ERROR'}, "There is no build to run, use Execute Animation")
+            return {'CANCELLED'}
+        if job.update:
+            try:
+                profile = buildJob(job)
+            except Exception as error:
+                log.error("Update failed: %s", error, exc_info=None if isinstance(error, ExitError) else error)
+                self.report({'ERROR'}, f"Update failed: {error}")
+                return {'CANCELLED'}
+            reportBuild(context.scene, job, profile, watch)
+            return {'FINISHED'}
+
+        self.job = job
+        self.watch = watch
+        self.steps = None
+        self.table = None
+        self.fileLoaded = False
+        self.result = {}
+        self.profile = BuildProfile(sceneCounts, job.traceMemory, job.profileCode)
+        #THE THREAD CANNOT COUNT BLENDER DATA, ITS STAGES ARE TIMED ON THEIR OWN AND MERGED LATER
+        self.prepareProfile = BuildProfile(traceMemory=job.traceMemory)
+        self.profile.start()
+        #THE FRAME RATE IS READ HERE AS THE THREAD CANNOT READ THE SCENE
+        timeBase = sceneTimeBase(job.timeBase)
+        self.thread = threading.Thread(target=prepareJob, args=(job, self.prepareProfile, timeBase, self.result), daemon=True)
+        self.thread.start()
+
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(TIMER_INTERVAL, window=context.window)
+        window_manager.modal_handler_add(self)
+        window_manager.progress_begin(0, 100)
+        _build["running"] = True
+        _build["operator"] = self
+        self.showProgress(context, "readSheet", 0, 0)
+        return {'RUNNING_MODAL'}
+
+    ############################################
+    # Name        : modal
+    # Called by   : blender for every event while the build runs
+    # Parameters  : self, context, event
+    # Returns     : 'RUNNING_MODAL' until the build finished, failed or was cancelled
+    # Description : Wait for the worker thread, then apply the build in time slices on every timer
+    #               event. Other events go through so the viewport can still be used
+    ############################################
+    def modal(self, context, event):
+        if self.fileLoaded:
+            self.endBuild(context, "Build stopped, another file was loaded")
+            return {'CANCELLED'}
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.rollBack()
+            self.endBuild(context, "Build cancelled, the partly built LEDs were removed")
+            self.report({'WARNING'}, "Build cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        if self.steps is None:
+            if self.thread.is_alive():
+                return {'RUNNING_MODAL'}
+            if "error" in self.result:
+                return self.failBuild(context, self.result["error"])
+            self.profile.stages.extend(self.prepareProfile.stages)
+            job = self.job
+            prepared = self.result["prepared"]
+            if job.sheetNames:
+                #THE TABLE HOLDS EVERY DATA BLOCK THE BUILD MAKES, A ROLL BACK REMOVES EXACTLY THOSE
+                self.table = prepared[0].table
+                self.steps = sheetSteps(prepared, job.bulkKeyframes, job.keyTolerance, self.profile, geometryCache=job.geometryCache)
+            else:
+                self.table = prepared.table
+                self.steps = buildSteps(job.ledSections, prepared, job.ledColStart, job.animationMode,
+                                        job.bulkKeyframes, job.keyTolerance, self.profile, geometryCache=job.geometryCache)
+
+        deadline = time.perf_counter() + SLICE_SECONDS
+        try:
+            while True:
+                stage, done, total = next(self.steps)
+                if time.perf_counter() >= deadline:
+                    break
+        except StopIteration:
+            return self.finishBuild(context)
+        except Exception as error:
+            return self.failBuild(context, error)
+        self.showProgress(context, stage, done, total)
+        return {'RUNNING_MODAL'}
+
+    ############################################
+    # Name        : cancel
+    # Called by   : blender when the build is stopped from outside (file loaded, window closed)
+    # Parameters  : self, context
+    # Returns     : N/A
+    # Description : Roll the build back like ESC does, a build whose file was replaced has nothing left to remove
+    ############################################
+    def cancel(self, context):
+        if self.fileLoaded:
+            self.endBuild(context, "Build stopped, another file was loaded")
+            return None
+        self.rollBack()
+        self.endBuild(context, "Build stopped, the partly built LEDs were removed")
+
+    ############################################
+    # Name        : showProgress
+    # Called by   : invoke, modal
+    # Parameters  : self, context, stage name, steps done, steps in the stage (0 when unknown)
+    # Returns     : N/A
+    # Description : Show how far the current stage is in the panel and on the cursor
+    ############################################
+    def showProgress(self, context, stage, done, total):
+        scene = context.scene
+        label = STAGE_LABELS.get(stage, stage)
+        if stage == "readSheet":
+            scene.buildProgress = 0.0
+            scene.buildStatus = label
+        elif total:
+            scene.buildProgress = 100.0 * done / total
+            scene.buildStatus = f"{label}: {done} of {total}"
+        else:
+            scene.buildStatus = f"{label}: {done} rows"
+        context.window_manager.progress_update(scene.buildProgress)
+        redrawPanels(context)
+
+    ############################################
+    # Name        : rollBack
+    # Called by   : modal, cancel, failBuild
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Stop the build and remove the LED data it made so far in one batch,
+    #               LED data of earlier builds is kept
+    ############################################
+    def rollBack(self):
+        if self.steps is not None:
+            self.steps.close()
+        num_removed = removeTable(self.table) if self.table is not None else 0
+        log.info("Removed %i data blocks of the unfinished build", num_removed)
+
+    ############################################
+    # Name        : endBuild
+    # Called by   : modal, cancel, finishBuild, failBuild
+    # Parameters  : self, context, status left in the panel (empty when the build finished)
+    # Returns     : N/A
+    # Description : Stop the timer, the progress and the build profile
+    ############################################
+    def endBuild(self, context, status):
+        self.profile.finish()
+        window_manager = context.window_manager
+        window_manager.event_timer_remove(self.timer)
+        window_manager.progress_end()
+        _build["running"] = False
+        _build.pop("operator", None)
+        context.scene.buildStatus = status
+        redrawPanels(context)
+
+    ############################################
+    # Name        : finishBuild
+    # Called by   : modal
+    # Parameters  : self, context
+    # Returns     : 'FINISHED'
+    # Description : Write the report of the finished build and show its summary
+    ############################################
+    def finishBuild(self, context):
+        self.endBuild(context, "")
+        writeBuildReport(self.job, self.profile)
+        reportBuild(context.scene, self.job, self.profile, self.watch)
+        return {'FINISHED'}
+
+    ############################################
+    # Name        : failBuild
+    # Called by   : modal
+    # Parameters  : self, context, exception raised by the build
+    # Returns     : 'CANCELLED'
+    # Description : Roll the build back and tell the user what went wrong. Problems with the sheet
+    #               are shown as they are, anything else also prints its traceback to the console
+    ############################################
+    def failBuild(self, context, error):
+        log.error("Build failed: %s", error, exc_info=None if isinstance(error, ExitError) else error)
+        self.rollBack()
+        self.endBuild(context, f"Build failed: {error}")
+        self.report({'ERROR'}, f"Build failed: {error}")
+        return {'CANCELLED'}
+
+############################################
+# Name        : register
+# Called by   : Panel Creation main
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Register the build and sheet operators, the file load handler and the build progress variables
+############################################
+def register():
+    bpy.utils.register_class(LedBuildOperator)
+    bpy.utils.register_class(LedSheetOperator)
+    bpy.app.handlers.load_pre.append(dropBuildData)
+    Scene.buildProgress = FloatProperty(name="Progress", subtype='PERCENTAGE', min=0.0, max=100.0, default=0.0)
+    Scene.buildStatus = StringProperty(name="", default="")
+
+############################################
+# Name        : unregister
+# Called by   : called when blender closes
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Used to clean up space and delete the build and sheet operators
+############################################
+def unregister():
+    bpy.utils.unregister_class(LedBuildOperator)
+    bpy.utils.unregister_class(LedSheetOperator)
+    if dropBuildData in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(dropBuildData)
+    del Scene.buildProgress
+    del Scene.buildStatus
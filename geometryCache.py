@@ -0,0 +1,150 @@
+import hashlib
+import os
+import numpy as np
+import bpy
+from ledGeometry import ledCubeSteps, LED_INDEX_PROPERTY
+from ledProfile import log
+
+#Changed whenever the cubes are built differently so older cache files are never matched
+GEOMETRY_VERSION = 1
+#Bound of the cache folder, the least recently used layouts are removed first
+MAX_GEOMETRY_BYTES = 512 * 1024 * 1024
+#Name of the cache files, followed by the layout hash
+GEOMETRY_PREFIX = "ledGeometry_"
+GEOMETRY_EXTENSION = ".blend"
+
+############################################
+# Name        : geometryHash
+# Called by   : cachedLedCubeSteps
+# Parameters  : ledLayout LedTable, size of led
+# Returns     : hex digest of the cube geometry
+# Description : The cubes only depend on the position of every LED and the size of a cube, so
+#               the hash is taken on the laid out positions. Sections that lay out the same cubes
+#               share one cache file whatever their colors or columns
+############################################
+def geometryHash(table, size_of_led):
+    positions = np.ascontiguousarray(table.position, dtype='<f8')
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{GEOMETRY_VERSION}:{float(size_of_led)!r}:{len(positions)}".encode('utf-8'))
+    digest.update(positions.tobytes())
+    return digest.hexdigest()
+
+############################################
+# Name        : geometryPath
+# Called by   : cachedLedCubeSteps
+# Parameters  : cache folder, layout hash
+# Returns     : path of the cache file of the layout
+# Description : One .blend library per layout
+############################################
+def geometryPath(directory, key):
+    return os.path.join(os.path.abspath(os.path.expanduser(directory)), GEOMETRY_PREFIX + key + GEOMETRY_EXTENSION)
+
+############################################
+# Name        : loadGeometry
+# Called by   : cachedLedCubeSteps
+# Parameters  : path of the cache file, ledLayout LedTable, collection to add the cubes to
+# Returns     : list of cube objects in LED index order, None when the file does not match the table
+# Description : Append the cubes and their shared mesh from the library. Linking would leave the
+#               cubes read-only and every LED needs its own material, so they are appended
+############################################
+def loadGeometry(path, table, collection):
+    with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+    led_objects = [ob for ob in data_to.objects if ob is not None]
+    led_indices = sorted(ob.get(LED_INDEX_PROPERTY, -1) for ob in led_objects)
+    if led_indices != list(range(len(table))):
+        datablocks = {ob.data.name: ob.data for ob in led_objects if ob.data is not None}
+        bpy.data.batch_remove(led_objects + list(datablocks.values()))
+        return None
+
+    led_objects.sort(key=lambda ob: ob[LED_INDEX_PROPERTY])
+    #KEPT IN THE TABLE BEFORE LINKING SO A FAILED BUILD CAN REMOVE THEM
+    table.objects = led_objects
+    table.mesh = led_objects[0].data
+    for ob in led_objects:
+        collection.objects.link(ob)
+    return led_objects
+
+############################################
+# Name        : writeGeometry
+# Called by   : cachedLedCubeSteps
+# Parameters  : path of the cache file, ledLayout LedTable with its cubes
+# Returns     : N/A
+# Description : Write the cubes before they get materials, the mesh goes with them. The library
+#               is written next to the cache file first so a reader never sees half a file
+############################################
+def writeGeometry(path, table):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        bpy.data.libraries.write(temp_path, set(table.objects), compress=True)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+############################################
+# Name        : evictGeometry
+# Called by   : cachedLedCubeSteps
+# Parameters  : cache folder
+# Returns     : N/A
+# Description : Remove the least recently used cache files until the folder fits its bound.
+#               A file is used when it is written or loaded, the newest file is always kept
+############################################
+def evictGeometry(directory):
+    entries = []
+    for name in os.listdir(directory):
+        if name.startswith(GEOMETRY_PREFIX) and name.endswith(GEOMETRY_EXTENSION):
+            stat = os.stat(os.path.join(directory, name))
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+    entries.sort()
+    num_bytes = sum(size for mtime, size, name in entries)
+    while len(entries) > 1 and num_bytes > MAX_GEOMETRY_BYTES:
+        mtime, size, name = entries.pop(0)
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            #ANOTHER BLENDER SHARING THE FOLDER REMOVED IT FIRST
+            pass
+        num_bytes -= size
+        log.debug("Removed %s from the geometry cache", name)
+
+############################################
+# Name        : cachedLedCubeSteps
+# Called by   : animation barSteps
+# Parameters  : size of led, ledLayout LedTable, cache folder (empty always builds the cubes),
+#               collection to add the cubes to, cubes built per step
+# Returns     : generator of ledGeometry ledCubeSteps steps, returning the list of cube objects
+#               (index in list is the LED index)
+# Description : ledCubeSteps through a cache of .blend libraries keyed by the layout hash.
+#               A layout built before is appended from its library in one step, a new one is built
+#               in batches and written for the next run. A cache that cannot be read or written
+#               only costs the time of building the cubes
+############################################
+def cachedLedCubeSteps(size_of_led, table, directory="", collection=None, batchSize=None):
+    if not directory or not len(table):
+        return (yield from ledCubeSteps(size_of_led, table, collection, batchSize))
+    if collection is None:
+        collection = bpy.context.collection
+    path = geometryPath(directory, geometryHash(table, size_of_led))
+
+    if os.path.exists(path):
+        try:
+            led_objects = loadGeometry(path, table, collection)
+            if led_objects is None:
+                log.warning("Geometry cache %s does not match the layout, building the cubes again", path)
+        except (OSError, RuntimeError) as error:
+            log.warning("Could not read the geometry cache %s (%s), building the cubes again", path, error)
+            led_objects = None
+        if led_objects is not None:
+            os.utime(path)
+            log.info("Loaded %i LED cubes from the geometry cache", len(led_objects))
+            return led_objects
+
+    led_objects = yield from ledCubeSteps(size_of_led, table, collection, batchSize)
+    try:
+        writeGeometry(path, table)
+        evictGeometry(os.path.dirname(path))
+    except (OSError, RuntimeError) as error:
+        log.warning("Could not write the geometry cache %s: %s", path, error)
+    return led_objects
@@ -0,0 +1,102 @@
+import numpy as np
+
+#Keys closer than this to the line through their neighbours are treated as on the line
+COLLINEAR_TOLERANCE = 1e-6
+
+############################################
+# Name        : dropCollinearKeys
+# Called by   : compressKeys
+# Parameters  : sorted array of frame numbers, array of values
+# Returns     : frames and values without keys that lie on the line through their neighbours
+# Description : Lossless pass in one vectorized step. Repeated values and linear ramps both lie
+#               on a line, so each run keeps only its first and last key
+############################################
+def dropCollinearKeys(frames, values):
+    previous_frames = frames[:-2]
+    next_frames = frames[2:]
+    t = (frames[1:-1] - previous_frames) / (next_frames - previous_frames)
+    expected = values[:-2] + t * (values[2:] - values[:-2])
+    keep = np.ones(len(frames), dtype=bool)
+    keep[1:-1] = ~(np.abs(values[1:-1] - expected) <= COLLINEAR_TOLERANCE)
+    return frames[keep], values[keep]
+
+############################################
+# Name        : withinTolerance
+# Called by   : greedyKeys
+# Parameters  : array of frame numbers, array of values, index of the first key, index of the last key, tolerance
+# Returns     : True if every key between the two keys is within the tolerance of the line between them
+# Description : Check if the keys between two keys can be dropped
+############################################
+def withinTolerance(frames, values, first, last, tolerance):
+    if last - first < 2:
+        return True
+    t = (frames[first + 1:last] - frames[first]) / (frames[last] - frames[first])
+    expected = values[first] + t * (values[last] - values[first])
+    return np.max(np.abs(values[first + 1:last] - expected)) <= tolerance
+
+############################################
+# Name        : greedyKeys
+# Called by   : compressKeys
+# Parameters  : sorted array of frame numbers, array of values, tolerance
+# Returns     : frames and values of the kept keys
+# Description : Lossy pass, from each kept key jump to the furthest key that keeps every key in
+#               between within the tolerance. Checking the kept keys of the lossless pass is enough
+#               since the curve between them is linear
+############################################
+def greedyKeys(frames, values, tolerance):
+    num_keys = len(frames)
+    kept = [0]
+    anchor = 0
+    while anchor < num_keys - 1:
+        #GROW THE JUMP UNTIL IT FAILS, THEN SEARCH BACK FOR THE FURTHEST KEY THAT WORKS
+        good = anchor + 1
+        step = 2
+        while anchor + step < num_keys and withinTolerance(frames, values, anchor, anchor + step, tolerance):
+            good = anchor + step
+            step *= 2
+        bad = min(anchor + step, num_keys)
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if withinTolerance(frames, values, anchor, middle, tolerance):
+                good = middle
+            else:
+                bad = middle
+        kept.append(good)
+        anchor = good
+    return frames[kept], values[kept]
+
+############################################
+# Name        : compressKeys
+# Called by   : keyPrepare keyBuffer, keyframeWriter writeKeyFrames, keyframeWriter insertKeyFrames
+# Parameters  : sorted array of frame numbers with one value per frame, array of values,
+#               tolerance (0 keeps the curve exactly)
+# Returns     : frames and values of the kept keys
+# Description : Drop keys a linear/constant curve does not need: repeated values keep only the
+#               keys where the value changes, linear ramps keep their two ends, and with a
+#               tolerance keys within it of the line through the kept keys are dropped too
+############################################
+def compressKeys(frames, values, tolerance=0.0):
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(frames) <= 2:
+        return frames, values
+    frames, values = dropCollinearKeys(frames, values)
+    if tolerance > 0 and len(frames) > 2:
+        frames, values = greedyKeys(frames, values, tolerance)
+    return frames, values
+
+############################################
+# Name        : stepInterpolation
+# Called by   : keyPrepare interpolationValues
+# Parameters  : array of key values
+# Returns     : array of interpolation names, one per key
+# Description : Compressed keys are joined by straight lines, keys followed by the same
+#               value are held constant
+############################################
+def stepInterpolation(values):
+    values = np.asarray(values)
+    interpolation = np.full(len(values), 'LINEAR', dtype=object)
+    interpolation[:-1][values[:-1] == values[1:]] = 'CONSTANT'
+    if len(values):
+        interpolation[-1] = 'CONSTANT'
+    return interpolation
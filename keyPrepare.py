@@ -0,0 +1,195 @@
+import os
+import sys
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from keyCompression import compressKeys, stepInterpolation
+from ledData import glowCurve
+from ledProfile import log
+
+#Raw values blender stores for keyframe interpolation (used by foreach_set)
+INTERPOLATION_VALUES = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}
+#Below this many cells (frames x prepared columns) starting processes costs more than it saves
+PARALLEL_MIN_CELLS = 20000000
+#Compression with a tolerance is about 50 times slower per cell, so it pays off on smaller sheets
+LOSSY_MIN_CELLS = 400000
+#Column batches handed to each process, more batches even out columns that compress slowly
+BATCHES_PER_WORKER = 4
+
+#Shared intensity matrix and settings of a worker process, set by attachWorker
+_worker = {}
+#Held while __main__ has no file, so two builds starting processes at once restore it in order
+_main_lock = threading.Lock()
+
+############################################
+# Name        : prepareKeys
+# Called by   : keyBuffer, keyframeWriter writeKeyFrames, keyframeWriter insertKeyFrames
+# Parameters  : array of frame numbers, array of values
+# Returns     : sorted frames and values with one value per frame
+# Description : Sort keys by frame and keep the last value of a repeated frame,
+#               the same result keyframe_insert gives when a frame is inserted twice
+############################################
+def prepareKeys(frames, values):
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(frames, kind='stable')
+    frames = frames[order]
+    values = values[order]
+    last = np.ones(len(frames), dtype=bool)
+    last[:-1] = frames[1:] != frames[:-1]
+    return frames[last], values[last]
+
+############################################
+# Name        : interpolationValues
+# Called by   : keyBuffer, keyframeWriter writeKeyFrames, keyframeWriter insertKeyFrames
+# Parameters  : array of key values
+# Returns     : raw interpolation values of compressed keys
+# Description : Linear between keys that change, constant between keys that hold a value
+############################################
+def interpolationValues(values):
+    names = stepInterpolation(values)
+    return np.where(names == 'CONSTANT', INTERPOLATION_VALUES['CONSTANT'], INTERPOLATION_VALUES['LINEAR']).astype(np.int32)
+
+############################################
+# Name        : keyBuffer
+# Called by   : prepareColumns, keyframeWriter writeKeyFrames
+# Parameters  : array of frame numbers, array of values, compression tolerance (None keeps every key)
+# Returns     : float32 array of interleaved (frame, value) pairs ready for foreach_set,
+#               raw interpolation of every key (None to use the preferences of blender)
+# Description : Everything a bulk keyframe write does before it touches blender
+############################################
+def keyBuffer(frames, values, tolerance=None):
+    frames, values = prepareKeys(frames, values)
+    if tolerance is not None:
+        frames, values = compressKeys(frames, values, tolerance)
+    co = np.empty(len(frames) * 2, dtype=np.float32)
+    co[0::2] = frames
+    co[1::2] = values
+    return co, interpolationValues(values) if tolerance is not None else None
+
+############################################
+# Name        : prepareColumns
+# Called by   : prepareKeyBuffers, worker processes through mapColumns
+# Parameters  : array of frame numbers, matrix of brightness percentages (columns x frames), list of column indices,
+#               compression tolerance
+# Returns     : list of keyBuffer results, one for every column
+# Description : Prepare the keys of a batch of columns, the glow of each column is computed on its own
+#               so no emission strength matrix is needed
+############################################
+def prepareColumns(frames, columnIntensity, columns, tolerance):
+    glow = np.empty(len(frames), dtype=np.float64)
+    return [keyBuffer(frames, glowCurve(columnIntensity[column], glow), tolerance) for column in columns]
+
+############################################
+# Name        : attachWorker
+# Called by   : ProcessPoolExecutor when a worker process starts
+# Parameters  : name of the shared memory block, shape of the matrix, dtype of the matrix, array of frame numbers,
+#               compression tolerance
+# Returns     : N/A
+# Description : Map the shared intensity matrix into the worker without copying it
+############################################
+def attachWorker(sharedName, shape, dtype, frames, tolerance):
+    block = shared_memory.SharedMemory(name=sharedName)
+    _worker["block"] = block
+    _worker["matrix"] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    _worker["frames"] = frames
+    _worker["tolerance"] = tolerance
+
+############################################
+# Name        : mapColumns
+# Called by   : prepareKeyBuffers in a worker process
+# Parameters  : list of column indices
+# Returns     : list of keyBuffer results, one for every column
+# Description : prepareColumns on the shared matrix of the worker
+############################################
+def mapColumns(columns):
+    return prepareColumns(_worker["frames"], _worker["matrix"], columns, _worker["tolerance"])
+
+############################################
+# Name        : detachedMain
+# Called by   : prepareKeyBuffers
+# Parameters  : N/A
+# Returns     : context manager
+# Description : Spawned workers run the main script again unless it has no file. Inside blender the
+#               main script is a text block importing bpy, so it is hidden while the workers start.
+#               __main__ is shared by every thread and add-on, so it is only changed while the
+#               processes are created (not while they work) and one thread at a time
+############################################
+@contextmanager
+def detachedMain():
+    with _main_lock:
+        main = sys.modules['__main__']
+        main_file = main.__dict__.pop('__file__', None)
+        try:
+            yield
+        finally:
+            if main_file is not None:
+                main.__file__ = main_file
+
+############################################
+# Name        : keyWorkerCount
+# Called by   : prepareKeyBuffers
+# Parameters  : requested number of processes (0 for one per core), number of cells to prepare,
+#               number of columns, compression tolerance
+# Returns     : number of processes to use, 1 prepares the keys in this process
+# Description : Small sheets are prepared in this process, starting processes would take longer
+############################################
+def keyWorkerCount(workers, numCells, numColumns, tolerance):
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if numCells < (LOSSY_MIN_CELLS if tolerance else PARALLEL_MIN_CELLS):
+        return 1
+    return max(1, min(workers, numColumns))
+
+############################################
+# Name        : prepareKeyBuffers
+# Called by   : animation prepareSheet, bench benchKeys
+# Parameters  : array of frame numbers, matrix of brightness percentages (frames x led columns),
+#               array of the columns to prepare, compression tolerance (None keeps every key),
+#               number of processes (0 for one per core, 1 prepares them in this process)
+# Returns     : dictionary of column index to keyBuffer result
+# Description : Prepare the keyframe arrays of every column, split by column over a process pool.
+#               The percentages (float32 from the sheet) are written once into shared memory column
+#               by column, every worker reads its columns without a copy, computes their glow and
+#               only sends back the compact key buffers
+############################################
+def prepareKeyBuffers(frames_list, intensity, columns, tolerance=None, workers=0):
+    columns = [int(column) for column in np.unique(columns)]
+    frames = np.asarray(frames_list, dtype=np.float64)
+    intensity = np.asarray(intensity)
+    workers = keyWorkerCount(workers, len(frames) * len(columns), len(columns), tolerance)
+    if workers <= 1:
+        return dict(zip(columns, prepareColumns(frames, intensity.T, columns, tolerance)))
+
+    #INTEGER PERCENTAGES ARE SHARED AS FLOAT32, FLOAT64 ONES KEEP THEIR PRECISION
+    dtype = np.result_type(intensity.dtype, np.float32)
+    shape = (intensity.shape[1], intensity.shape[0])
+    block = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * dtype.itemsize))
+    try:
+        shared = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        shared[:] = intensity.T
+        num_batches = min(len(columns), workers * BATCHES_PER_WORKER)
+        batches = [batch.tolist() for batch in np.array_split(np.array(columns), num_batches)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=attachWorker, initargs=(block.name, shape, dtype, frames, tolerance)) as pool:
+                #THE PROCESSES ARE STARTED WHEN THE BATCHES ARE SUBMITTED
+                with detachedMain():
+                    futures = [pool.submit(mapColumns, batch) for batch in batches]
+                results = [future.result() for future in futures]
+        except (BrokenProcessPool, OSError) as error:
+            log.warning("Could not start the key preparation processes (%s), preparing the keys here", error)
+            results = [prepareColumns(frames, shared, batch, tolerance) for batch in batches]
+        del shared
+    finally:
+        block.close()
+        block.unlink()
+    buffers = {}
+    for batch, result in zip(batches, results):
+        buffers.update(zip(batch, result))
+    log.debug("Prepared the keys of %i columns in %i processes", len(columns), workers)
+    return buffers
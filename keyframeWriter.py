@@ -0,0 +1,135 @@
+import bpy
+import numpy as np
+from keyCompression import compressKeys
+from keyPrepare import prepareKeys, interpolationValues, keyBuffer, INTERPOLATION_VALUES
+
+#Raw values blender stores for keyframe handle types (used by foreach_set)
+HANDLE_VALUES = {'FREE': 0, 'AUTO': 1, 'VECTOR': 2, 'ALIGNED': 3, 'AUTO_CLAMPED': 4}
+
+############################################
+# Name        : defaultKeyStyle
+# Called by   : applyKeyFrames
+# Parameters  : N/A
+# Returns     : interpolation and handle type used for new keyframes
+# Description : Read the user preferences so bulk keys match keys made by keyframe_insert
+############################################
+def defaultKeyStyle():
+    edit = bpy.context.preferences.edit
+    return edit.keyframe_new_interpolation_type, edit.keyframe_new_handle_type
+
+############################################
+# Name        : getFCurve
+# Called by   : writeKeyFrames, writeKeyBuffer, insertKeyFrames, ledUpdate writeLedCurve
+# Parameters  : node socket to animate, keep the keyframes of an existing F-curve
+# Returns     : F-curve for the default value of the socket
+# Description : Create the action of the node tree once and a fresh F-curve for the socket
+############################################
+def getFCurve(socket, keep=False):
+    node_tree = socket.id_data
+    if node_tree.animation_data is None:
+        node_tree.animation_data_create()
+    animation_data = node_tree.animation_data
+    if animation_data.action is None:
+        animation_data.action = bpy.data.actions.new(name=node_tree.name + "Action")
+    action = animation_data.action
+
+    data_path = socket.path_from_id('default_value')
+    fcurve = action.fcurves.find(data_path)
+    if fcurve is not None:
+        if keep:
+            return fcurve
+        action.fcurves.remove(fcurve)
+    return action.fcurves.new(data_path, index=0)
+
+############################################
+# Name        : writeKeyFrames
+# Called by   : animation createKeyFrames, animation streamKeyFrames
+# Parameters  : node socket to animate, array of frame numbers, array of values,
+#               add to the keyframes already on the socket instead of replacing them,
+#               compression tolerance (None writes every key)
+# Returns     : created F-curve
+# Description : Bulk keyframe writer, appended keys are merged with the keys already on the socket
+############################################
+def writeKeyFrames(socket, frames, values, append=False, tolerance=None):
+    fcurve = getFCurve(socket, keep=append)
+    points = fcurve.keyframe_points
+    if not len(points):
+        return applyKeyFrames(socket, fcurve, *keyBuffer(frames, values, tolerance))
+
+    if tolerance is not None:
+        #ONLY THE NEW KEYS ARE COMPRESSED SO THE ERROR NEVER BUILDS UP OVER APPENDS
+        frames, values = compressKeys(*prepareKeys(frames, values), tolerance)
+    #MERGE WITH THE EXISTING KEYS, NEW KEYS REPLACE EXISTING KEYS ON THE SAME FRAME
+    existing = np.empty(len(points) * 2, dtype=np.float32)
+    points.foreach_get('co', existing)
+    frames = np.concatenate((existing[0::2], np.asarray(frames, dtype=np.float32)))
+    values = np.concatenate((existing[1::2], values))
+    frames, values = prepareKeys(frames, values)
+    co = np.empty(len(frames) * 2, dtype=np.float32)
+    co[0::2] = frames
+    co[1::2] = values
+    return applyKeyFrames(socket, fcurve, co, interpolationValues(values) if tolerance is not None else None)
+
+############################################
+# Name        : writeKeyBuffer
+# Called by   : animation keyFrameSteps
+# Parameters  : node socket to animate, keyPrepare keyBuffer result (interleaved keys, interpolation)
+# Returns     : created F-curve
+# Description : Replace the keyframes of the socket with keys prepared beforehand, maybe in another process
+############################################
+def writeKeyBuffer(socket, co, interpolation):
+    return applyKeyFrames(socket, getFCurve(socket), co, interpolation)
+
+############################################
+# Name        : applyKeyFrames
+# Called by   : writeKeyFrames, writeKeyBuffer
+# Parameters  : node socket, its F-curve, float32 array of interleaved (frame, value) pairs,
+#               raw interpolation of every key (None to use the preferences)
+# Returns     : the F-curve
+# Description : Size the keyframe points once and fill coordinates, interpolation and handles
+#               from flat arrays
+############################################
+def applyKeyFrames(socket, fcurve, co, interpolation):
+    points = fcurve.keyframe_points
+    num_keys = len(co) // 2
+    points.add(num_keys - len(points))
+    points.foreach_set('co', co)
+    key_interpolation, handle = defaultKeyStyle()
+    if interpolation is None:
+        interpolation = np.full(num_keys, INTERPOLATION_VALUES.get(key_interpolation, 2), dtype=np.int32)
+    points.foreach_set('interpolation', interpolation)
+    handles = np.full(num_keys, HANDLE_VALUES.get(handle, 4), dtype=np.int32)
+    points.foreach_set('handle_left_type', handles)
+    points.foreach_set('handle_right_type', handles)
+
+    #Recalculate the automatic handles from the new coordinates
+    fcurve.update()
+    if num_keys:
+        socket.default_value = float(co[-1])
+    return fcurve
+
+############################################
+# Name        : insertKeyFrames
+# Called by   : animation createKeyFrames, animation streamKeyFrames
+# Parameters  : node socket to animate, array of frame numbers, array of values,
+#               compression tolerance (None writes every key)
+# Returns     : F-curve of the socket, None if there are no keys
+# Description : Fallback writer that inserts one keyframe at a time through keyframe_insert
+############################################
+def insertKeyFrames(socket, frames, values, tolerance=None):
+    if tolerance is not None:
+        frames, values = compressKeys(*prepareKeys(frames, values), tolerance)
+    for frame, value in zip(frames, values):
+        socket.default_value = value
+        socket.keyframe_insert(data_path='default_value', frame=frame)
+    if not len(frames):
+        return None
+
+    fcurve = getFCurve(socket, keep=True)
+    if tolerance is not None:
+        points = fcurve.keyframe_points
+        co = np.empty(len(points) * 2, dtype=np.float32)
+        points.foreach_get('co', co)
+        points.foreach_set('interpolation', interpolationValues(co[1::2]))
+        fcurve.update()
+    return fcurve
@@ -0,0 +1,353 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+#Import local scripts when run by blender --python
+dir = os.path.dirname(os.path.abspath(__file__))
+if not dir in sys.path:
+    sys.path.append(dir)
+
+from ledData import ExitError, EMISSION_COLORS, ANIMATION_MODES, LedSection, Color
+from ledTime import TimeBase, TIME_UNITS, MERGE_POLICIES
+from ledWindow import ImportWindow
+from ledProfile import BuildProfile, log
+
+#Workers print their result on a line starting with this
+RESULT_PREFIX = "LEDBATCH_RESULT "
+#Number of output lines kept from a failed worker
+ERROR_LINES = 20
+
+@dataclass
+class LedJob():
+    name: str
+    filePathName: str
+    sheetName: str
+    ledRowStart: int
+    ledColStart: int
+    ledSections: list = field(default_factory=list)
+    animationMode: str = 'KEYFRAMES'
+    chunkRows: int = 0
+    keyTolerance: float = None
+    bulkKeyframes: bool = True
+    timeBase: TimeBase = field(default_factory=TimeBase)
+    keyWorkers: int = 0         #processes preparing the keyframe arrays, 0 for one per core
+    geometryCache: str = ""     #folder caching the LED cubes of a layout, empty always builds them
+    sheetNames: list = field(default_factory=list)  #sheets built as actions on the same LEDs, empty builds sheetName only
+    window: ImportWindow = None #rows and sections to build, None builds the whole sheet
+    update: bool = False
+    output: str = ""
+    report: str = ""            #JSON report of the build stages, empty for no report
+    traceMemory: bool = False
+    profileCode: bool = False   #capture a cProfile of the build next to the report
+
+############################################
+# Name        : buildJob
+# Called by   : runJob, buildOperator LedBuildOperator (updates)
+# Parameters  : LedJob (sections can be LedSection or dictionaries from a job file)
+# Returns     : BuildProfile with the time, counts and memory of every stage of the build
+# Description : Build (or update) the LEDs of one job in the current scene. The panel and the
+#               batch workers both go through here so a build can be timed without a display
+############################################
+def buildJob(job):
+    #BLENDER MODULES ARE IMPORTED HERE SO THE BATCH COORDINATOR RUNS WITHOUT BLENDER
+    from animation import main, importSheets, sceneCounts
+    from ledUpdate import updateAnimation
+
+    #SECTIONS READ FROM A JOB FILE ARE TURNED INTO LED SECTIONS INSIDE BLENDER
+    ledSections = [sectionFromDict(led) if isinstance(led, dict) else led for led in job.ledSections]
+    if job.update and job.sheetNames:
+        raise ExitError("Only a single sheet import can be updated, import the sheets again")
+    if job.update and job.window is not None:
+        raise ExitError("An import window cannot be updated, import the window again")
+    profile = BuildProfile(sceneCounts, job.traceMemory, job.profileCode)
+    profile.start()
+    try:
+        if job.update:
+            updateAnimation(job.filePathName, job.sheetName, job.ledRowStart, job.ledColStart, ledSections,
+                            job.bulkKeyframes, job.animationMode, job.keyTolerance, profile, job.timeBase,
+                            job.chunkRows, job.keyWorkers, job.geometryCache)
+        elif job.sheetNames:
+            importSheets(job.filePathName, job.sheetNames, job.ledRowStart, job.ledColStart, ledSections, job.bulkKeyframes,
+                         job.animationMode, job.keyTolerance, profile, job.timeBase, job.keyWorkers, job.geometryCache, job.window)
+        else:
+            main(job.filePathName, job.sheetName, job.ledRowStart, job.ledColStart, ledSections,
+                 job.bulkKeyframes, job.animationMode, job.chunkRows, job.keyTolerance, profile, job.timeBase, job.keyWorkers,
+                 job.geometryCache, job.window)
+    finally:
+        profile.finish()
+    writeBuildReport(job, profile)
+    return profile
+
+############################################
+# Name        : writeBuildReport
+# Called by   : buildJob, buildOperator LedBuildOperator
+# Parameters  : LedJob, finished BuildProfile
+# Returns     : N/A
+# Description : Write the report the job asked for, a cProfile without a report goes to the console
+############################################
+def writeBuildReport(job, profile):
+    if job.report:
+        profile.writeReport(job.report)
+    elif job.profileCode:
+        log.info(profile.profileText())
+
+############################################
+# Name        : checkSection
+# Called by   : jobFromDict
+# Parameters  : dictionary of one LED section from a job file, job name
+# Returns     : N/A
+# Description : Check a LED section before any worker is started
+############################################
+def checkSection(data, jobName):
+    for key in ("row", "col", "start", "end"):
+        if key not in data:
+            raise ExitError(f"A LED section of job {jobName} is missing '{key}'")
+    if data.get("color", "White") not in EMISSION_COLORS:
+        raise ExitError(f"A LED section of job {jobName} has the unknown color {data['color']}")
+
+############################################
+# Name        : sectionFromDict
+# Called by   : buildJob, ledPreview previewMain
+# Parameters  : dictionary of one LED section from a job file
+# Returns     : LedSection
+# Description : Read a LED section, color is the color name (White, Yellow or Red)
+############################################
+def sectionFromDict(data):
+    return LedSection(int(data["row"]), int(data["col"]), int(data["start"]), int(data["end"]),
+                      bool(data.get("vert", False)), bool(data.get("reverse", False)), Color[data.get("color", "White")],
+                      bool(data.get("difSize", False)), int(data.get("optionalSize", 0)))
+
+############################################
+# Name        : timeBaseFromDict
+# Called by   : jobFromDict
+# Parameters  : dictionary of one job, job name
+# Returns     : TimeBase
+# Description : Read the unit of the time column and how rows on the same frame are merged.
+#               Without "fps" the frame rate of the scene the job is built in is used
+############################################
+def timeBaseFromDict(data, jobName):
+    unit = data.get("timeUnit", 'AUTO')
+    policy = data.get("mergePolicy", 'KEEP')
+    if unit not in TIME_UNITS:
+        raise ExitError(f"Job {jobName} has the unknown time unit {unit}, use one of {', '.join(TIME_UNITS)}")
+    if policy not in MERGE_POLICIES:
+        raise ExitError(f"Job {jobName} has the unknown merge policy {policy}, use one of {', '.join(MERGE_POLICIES)}")
+    fps = data.get("fps")
+    return TimeBase(unit, None if fps is None else float(fps), policy, float(data.get("targetFps", 0)))
+
+############################################
+# Name        : windowFromDict
+# Called by   : jobFromDict
+# Parameters  : dictionary of one job, job name
+# Returns     : ImportWindow, None when the job builds the whole sheet
+# Description : "windowStart" and "windowEnd" are times in the units of the time column,
+#               "windowSections" are indices into the sections of the job
+############################################
+def windowFromDict(data, jobName):
+    if not any(key in data for key in ("windowStart", "windowEnd", "windowSections")):
+        return None
+    start = data.get("windowStart")
+    end = data.get("windowEnd")
+    if start is not None and end is not None and float(end) < float(start):
+        raise ExitError(f"Job {jobName} has a window ending at {end} before it starts at {start}")
+    sections = data.get("windowSections")
+    if sections is not None:
+        sections = [int(index) for index in sections]
+        if not sections or min(sections) < 0 or max(sections) >= len(data["sections"]):
+            raise ExitError(f"Job {jobName} has window sections {sections} but only {len(data['sections'])} sections")
+    return ImportWindow(None if start is None else float(start), None if end is None else float(end), sections)
+
+############################################
+# Name        : jobFromDict
+# Called by   : loadJobs
+# Parameters  : dictionary of one job, index of the job, folder of the job file
+# Returns     : LedJob
+# Description : Read a job, relative paths are relative to the job file
+############################################
+def jobFromDict(data, index, baseDir):
+    name = str(data.get("name", f"job{index}"))
+    for key in ("workbook", "startRow", "startCol", "sections"):
+        if key not in data:
+            raise ExitError(f"Job {name} is missing '{key}'")
+
+    for section in data["sections"]:
+        checkSection(section, name)
+    animationMode = data.get("animationMode", 'KEYFRAMES')
+    if animationMode not in ANIMATION_MODES:
+        raise ExitError(f"Job {name} has the unknown animation mode {animationMode}, use one of {', '.join(ANIMATION_MODES)}")
+    output = data.get("output", name + ".blend")
+    report = data.get("report", "")
+    keyTolerance = data.get("keyTolerance")
+    return LedJob(name=name,
+                  filePathName=os.path.join(baseDir, os.path.expanduser(data["workbook"])),
+                  sheetName=data.get("sheet", ""),
+                  sheetNames=[str(sheet) for sheet in data.get("sheets", [])],
+                  window=windowFromDict(data, name),
+                  ledRowStart=int(data["startRow"]),
+                  ledColStart=int(data["startCol"]),
+                  ledSections=list(data["sections"]),
+                  animationMode=animationMode,
+                  chunkRows=int(data.get("chunkRows", 0)),
+                  keyTolerance=None if keyTolerance is None else float(keyTolerance),
+                  bulkKeyframes=bool(data.get("bulkKeyframes", True)),
+                  timeBase=timeBaseFromDict(data, name),
+                  keyWorkers=int(data.get("keyWorkers", 0)),
+                  geometryCache=os.path.join(baseDir, os.path.expanduser(data["geometryCache"])) if data.get("geometryCache") else "",
+                  output=os.path.join(baseDir, os.path.expanduser(output)),
+                  report=os.path.join(baseDir, os.path.expanduser(report)) if report else "",
+                  traceMemory=bool(data.get("traceMemory", False)),
+                  profileCode=bool(data.get("profile", False)))
+
+############################################
+# Name        : loadJobs
+# Called by   : runJobs, runJob
+# Parameters  : path of a JSON or YAML job file
+# Returns     : list of LedJob
+# Description : A job file is a list of jobs or {"defaults": {...}, "jobs": [...]} where
+#               the defaults are used for every key a job leaves out
+############################################
+def loadJobs(jobsPath):
+    with open(jobsPath, 'r', encoding='utf-8') as file:
+        text = file.read()
+    if os.path.splitext(jobsPath)[1].lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ExitError("Reading YAML job files needs PyYAML (pip install pyyaml), use a JSON job file instead")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+
+    defaults = {}
+    jobs = data
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        jobs = data.get("jobs", [])
+    baseDir = os.path.dirname(os.path.abspath(jobsPath))
+    return [jobFromDict({**defaults, **job}, index, baseDir) for index, job in enumerate(jobs)]
+
+############################################
+# Name        : runJob
+# Called by   : batchMain inside a worker blender
+# Parameters  : path of the job file, index of the job to run
+# Returns     : N/A
+# Description : Build one job in an empty scene and save it to its .blend file
+############################################
+def runJob(jobsPath, index):
+    import bpy
+
+    job = loadJobs(jobsPath)[index]
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    profile = buildJob(job)
+    os.makedirs(os.path.dirname(job.output), exist_ok=True)
+    bpy.ops.wm.save_as_mainfile(filepath=job.output)
+    print(RESULT_PREFIX + json.dumps({"buildSeconds": profile.seconds, "stages": profile.report()["stages"], "output": job.output}))
+
+############################################
+# Name        : launchWorker
+# Called by   : runJobs
+# Parameters  : blender executable, path of the job file, LedJob, index of the job
+# Returns     : dictionary with the result and timing of the job
+# Description : Run one job in its own background blender and collect its result
+############################################
+def launchWorker(blenderPath, jobsPath, job, index):
+    command = [blenderPath, '--background', '--factory-startup', '--python-exit-code', '1',
+               '--python', os.path.abspath(__file__), '--', jobsPath, '--run-job', str(index)]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True)
+    except OSError as error:
+        return {"job": job.name, "ok": False, "seconds": 0.0, "error": str(error)}
+    result = {"job": job.name, "ok": process.returncode == 0, "seconds": time.perf_counter() - start}
+
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result.update(json.loads(line[len(RESULT_PREFIX):]))
+    if not result["ok"] or "output" not in result:
+        result["ok"] = False
+        lines = (process.stdout + process.stderr).strip().splitlines()
+        result["error"] = "\n".join(lines[-ERROR_LINES:])
+    return result
+
+############################################
+# Name        : runJobs
+# Called by   : batchMain
+# Parameters  : path of the job file, number of worker processes, blender executable,
+#               optional path to write the JSON report to
+# Returns     : list of job results
+# Description : Fan the jobs of a job file out over a pool of background blender workers
+#               and report the timing and failures of every job
+############################################
+def runJobs(jobsPath, workers, blenderPath, reportPath=None):
+    jobsPath = os.path.abspath(jobsPath)
+    jobs = loadJobs(jobsPath)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(launchWorker, blenderPath, jobsPath, job, index) for index, job in enumerate(jobs)]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            status = "done" if result["ok"] else "FAILED"
+            print(f"{result['job']}: {status} in {result['seconds']:.1f}s")
+            if not result["ok"]:
+                print(result["error"])
+    total = time.perf_counter() - start
+
+    num_failed = sum(not result["ok"] for result in results)
+    print(f"{len(results) - num_failed} of {len(results)} jobs done in {total:.1f}s with {workers} workers")
+    if reportPath:
+        with open(reportPath, 'w', encoding='utf-8') as file:
+            json.dump({"jobs": results, "seconds": total, "workers": workers}, file, indent=2)
+    return results
+
+############################################
+# Name        : defaultBlender
+# Called by   : batchMain
+# Parameters  : N/A
+# Returns     : path of the blender executable
+# Description : The running blender when run inside blender, otherwise blender from the PATH
+############################################
+def defaultBlender():
+    try:
+        import bpy
+        return bpy.app.binary_path
+    except ImportError:
+        return "blender"
+
+############################################
+# Name        : batchMain
+# Called by   : blender --background --python ledBatch.py -- jobs.json, python ledBatch.py jobs.json
+# Parameters  : command line arguments
+# Returns     : exit code (0 when every job succeeded)
+# Description : Headless entry point. Runs every job of a job file over a worker pool,
+#               workers are started with --run-job to build a single job
+############################################
+def batchMain(argv):
+    parser = argparse.ArgumentParser(prog="ledBatch", description="Build LED animations from a job file without the UI")
+    parser.add_argument("jobs", help="JSON or YAML job file")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="number of blender processes")
+    parser.add_argument("--blender", default=None, help="blender executable for the workers")
+    parser.add_argument("--report", default=None, help="write a JSON report of every job to this file")
+    parser.add_argument("--run-job", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_job is not None:
+        runJob(args.jobs, args.run_job)
+        return 0
+    try:
+        results = runJobs(args.jobs, args.workers, args.blender or defaultBlender(), args.report)
+    except (ExitError, OSError, ValueError) as error:
+        print(f"Could not read the job file: {error}")
+        return 2
+    return 0 if all(result["ok"] for result in results) else 1
+
+if __name__ == "__main__":
+    #BLENDER PASSES THE SCRIPT ARGUMENTS AFTER --
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(batchMain(argv))
@@ -0,0 +1,386 @@
+import hashlib
+import numpy as np
+import pandas as pds
+from dataclasses import dataclass
+from enum import Enum
+
+#Constants of the exponential glow function (percent brightness -> emission strength)
+GLOW_SCALE = 0.371327
+GLOW_RATE = 4.20955
+
+#Emission color of each LED color, any other color glows red
+EMISSION_COLORS = {
+    "White": (0.625, 0.818, 1, 1),
+    "Yellow": (0.98, 0.85, 0.22, 1),
+    "Red": (1, 0, 0, 1),
+}
+
+#Animation modes of a build, the same ones the panel offers
+ANIMATION_MODES = ('KEYFRAMES', 'POOLED', 'TEXTURE')
+
+#Custom properties remembering what an import built so an update can reuse it
+LAYOUT_PROPERTY = "led_layout"
+TIMELINE_PROPERTY = "led_timeline"
+SHEETS_PROPERTY = "led_sheets"
+
+class ExitError(Exception):
+    pass
+
+class Color(Enum):
+    White = 1
+    Yellow = 2
+    Red = 3
+    Black = 4
+
+@dataclass
+class LedSection():
+    row: int
+    col: int
+    start: int
+    end: int
+    vert: bool
+    reverse: bool
+    color: Color
+    difSize: bool
+    optionalSize: int
+
+############################################
+# Name        : excelCellName
+# Called by   : raiseInvalidCells
+# Parameters  : row index in the data frame, column index in the data frame
+# Returns     : cell name as seen in excel (ex. "B12")
+# Description : Convert a data frame position into the cell name shown in excel.
+#               The first excel row is used as the header so data frame row 0 is excel row 2
+############################################
+def excelCellName(rowIndex, colIndex):
+    letters = ""
+    colNum = colIndex + 1
+    while colNum > 0:
+        colNum, remainder = divmod(colNum - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return f"{letters}{rowIndex + 2}"
+
+############################################
+# Name        : usedColumns
+# Called by   : readIntensityBlock
+# Parameters  : list of LED sections
+# Returns     : sorted numpy array of LED column indices (relative to led column start) read by the sections
+# Description : Find every column of the excel block that is turned into an animation
+############################################
+def usedColumns(ledSections):
+    columns = set()
+    for led in ledSections:
+        columns.update(range(min(led.start, led.end), max(led.start, led.end) + 1))
+    return np.array(sorted(columns), dtype=np.int64)
+
+############################################
+# Name        : toNumeric
+# Called by   : sheetArrays, ledWindow sheetTimes
+# Parameters  : data frame block
+# Returns     : float matrix of the block, boolean matrix of cells that are not numbers
+# Description : Convert a whole block to floats in one pass. Empty cells stay NaN and are
+#               not reported, cells holding text are NaN and reported as invalid
+############################################
+def toNumeric(block):
+    numeric = block.apply(pds.to_numeric, errors='coerce')
+    values = numeric.to_numpy(dtype=np.float64)
+    invalid = np.isnan(values) & block.notna().to_numpy()
+    return values, invalid
+
+############################################
+# Name        : findInvalidCells
+# Called by   : sheetArrays, ledWindow sheetTimes
+# Parameters  : raw data frame block, boolean matrix of invalid cells, first row index, first column index
+# Returns     : list of [row, column, value] of every invalid cell (data frame indices)
+# Description : Collect every invalid cell of a block with the text it holds
+############################################
+def findInvalidCells(block, invalid, rowOffset, colOffset):
+    cells = []
+    for row, col in zip(*np.nonzero(invalid)):
+        cells.append([int(row) + rowOffset, int(col) + colOffset, repr(block.iat[row, col])])
+    return cells
+
+############################################
+# Name        : raiseInvalidCells
+# Called by   : readIntensityBlock, readTimes
+# Parameters  : list of [row, column, value] of invalid cells
+# Returns     : N/A
+# Description : Raise a single error listing every invalid cell with its excel row and column
+############################################
+def raiseInvalidCells(cells):
+    names = [f"{excelCellName(row, col)}: {value}" for row, col, value in cells]
+    raise ExitError("Something went wrong in the EXCEL sheet. Each value must be either an int or a float. "
+                    "Found %i invalid cell(s):\n%s" % (len(names), "\n".join(names)))
+
+@dataclass
+class SheetArrays():
+    times: np.ndarray       #time/frames column from the start row
+    block: np.ndarray       #float32 LED block from the start row and start column
+    invalid_cells: list     #[row, column, value] of cells that are not numbers (data frame indices)
+    startRow: int
+    startCol: int
+
+############################################
+# Name        : sheetArrays
+# Called by   : ledSidecar loadSheetArrays, ledStream iterSheetChunks, ledWindow readRows
+# Parameters  : data from excel, row to start reading from in excel, column to start reading from in excel,
+#               row of the sheet the data frame starts at (for row chunks of a sheet)
+# Returns     : SheetArrays of the sheet
+# Description : Convert the time column and the LED block to arrays once, remembering every
+#               cell that is not a number so it can be reported if an LED section uses it
+############################################
+def sheetArrays(xls_data, ledRowStart, ledColStart, firstRow=0):
+    time_block = xls_data.iloc[ledRowStart - firstRow:, [0]]
+    times, time_invalid = toNumeric(time_block)
+    led_block = xls_data.iloc[ledRowStart - firstRow:, ledColStart:]
+    block, block_invalid = toNumeric(led_block)
+    invalid_cells = findInvalidCells(time_block, time_invalid, ledRowStart, 0)
+    invalid_cells += findInvalidCells(led_block, block_invalid, ledRowStart, ledColStart)
+    return SheetArrays(times[:, 0], block.astype(np.float32), invalid_cells, ledRowStart, ledColStart)
+
+############################################
+# Name        : readTimes
+# Called by   : animation prepareSheet, animation streamKeyFrameSteps, ledUpdate updateAnimation, ledWindow loadWindow
+# Parameters  : SheetArrays of the sheet, row to start reading from in excel
+# Returns     : numpy array of the time column from the start row
+# Description : Read the time/frames column, ledTime applyTimeBase turns it into frames of the scene
+############################################
+def readTimes(sheet, ledRowStart):
+    invalid = [cell for cell in sheet.invalid_cells if cell[1] == 0 and cell[0] >= ledRowStart]
+    if invalid:
+        raiseInvalidCells(invalid)
+    return np.asarray(sheet.times[ledRowStart - sheet.startRow:], dtype=np.float64)
+
+############################################
+# Name        : readIntensityBlock
+# Called by   : animation main, ledWindow loadWindow
+# Parameters  : SheetArrays of the sheet, row to start reading from in excel, column to start reading from in excel,
+#               list of LED sections
+# Returns     : float matrix (frames x LED columns) of brightness percentages
+# Description : Slice the LED block used by the sections and check that every cell
+#               used by a LED section is a number. All invalid cells are reported together
+############################################
+def readIntensityBlock(sheet, ledRowStart, ledColStart, ledSections):
+    columns = usedColumns(ledSections)
+    numColumns = int(columns[-1]) + 1 if len(columns) else 0
+    colOffset = ledColStart - sheet.startCol
+    block = sheet.block[ledRowStart - sheet.startRow:, colOffset:colOffset + numColumns]
+    if block.shape[1] < numColumns:
+        raise ExitError("The LED sections use %i columns but the EXCEL sheet only has %i columns after the start column"
+                        % (numColumns, block.shape[1]))
+
+    #ONLY CELLS THAT ARE ANIMATED NEED TO BE NUMBERS
+    used = set((columns + ledColStart).tolist())
+    invalid = [cell for cell in sheet.invalid_cells if cell[1] in used and cell[0] >= ledRowStart]
+    if invalid:
+        raiseInvalidCells(invalid)
+    return block
+
+############################################
+# Name        : glowCurve
+# Called by   : animation main, keyPrepare prepareColumns
+# Parameters  : array of brightness percentages, float64 array of the same shape to write into (None for a new one)
+# Returns     : array of emission strengths
+# Description : Exponential glow function applied to the whole array at once, 0% stays fully off.
+#               Computed in place in the result so a large sheet needs no temporary matrices
+############################################
+def glowCurve(intensity, out=None):
+    if out is None:
+        out = np.empty(np.shape(intensity), dtype=np.float64)
+    out[...] = intensity
+    off = out == 0.0
+    with np.errstate(over='ignore', invalid='ignore'):
+        np.divide(out, 100.0, out=out)
+        np.multiply(GLOW_RATE, out, out=out)
+        np.exp(out, out=out)
+        np.multiply(GLOW_SCALE, out, out=out)
+    out[off] = 0.0
+    return out
+
+############################################
+# Name        : emissionColor
+# Called by   : animation createKeyFrames, textureAnimation createTextureAnimation, ledPreview previewLayout
+# Parameters  : name of the LED color
+# Returns     : RGBA emission color
+# Description : Look up the glow color of a LED color
+############################################
+def emissionColor(colorName):
+    return EMISSION_COLORS.get(colorName, EMISSION_COLORS["Red"])
+
+############################################
+# Name        : keyTimeline
+# Called by   : resampleFrames, ledPreview renderPreview
+# Parameters  : array of frame numbers, matrix of values (frames x columns)
+# Returns     : sorted array of distinct frame numbers, matrix of values on those frames
+# Description : A repeated frame keeps its last value, like a keyframe inserted twice
+############################################
+def keyTimeline(frames, values):
+    frames = np.asarray(frames, dtype=np.float64)
+    order = np.argsort(frames, kind='stable')
+    frames = frames[order]
+    values = np.asarray(values, dtype=np.float64)[order]
+    last = np.ones(len(frames), dtype=bool)
+    last[:-1] = frames[1:] != frames[:-1]
+    return frames[last], values[last]
+
+############################################
+# Name        : interpolateFrames
+# Called by   : resampleFrames, ledPreview renderPreview
+# Parameters  : sorted array of distinct frame numbers, matrix of values (frames x columns),
+#               array of frames to sample
+# Returns     : matrix of values on the sampled frames
+# Description : Linearly interpolate every column, frames outside the timeline hold the first or last value
+############################################
+def interpolateFrames(frames, values, sample_frames):
+    if len(frames) == 1:
+        return np.repeat(values[:1], len(sample_frames), axis=0)
+    upper = np.clip(np.searchsorted(frames, sample_frames, side='right'), 1, len(frames) - 1)
+    lower = upper - 1
+    t = np.clip((sample_frames - frames[lower]) / (frames[upper] - frames[lower]), 0.0, 1.0)[:, None]
+    return values[lower] * (1.0 - t) + values[upper] * t
+
+############################################
+# Name        : resampleFrames
+# Called by   : textureAnimation createTextureAnimation
+# Parameters  : array of frame numbers, matrix of values (frames x columns)
+# Returns     : array of every whole frame from the first to the last frame, matrix of values on those frames
+# Description : Linearly interpolate every column onto each whole frame of the timeline.
+#               A repeated frame keeps its last value, like a keyframe inserted twice
+############################################
+def resampleFrames(frames, values):
+    frames, values = keyTimeline(frames, values)
+    dense_frames = np.arange(np.floor(frames[0]), np.floor(frames[-1]) + 1)
+    return dense_frames, interpolateFrames(frames, values, dense_frames)
+
+############################################
+# Name        : ledColumns
+# Called by   : poolKeys, materialPoolKeys, TimelineHash, ledLayout ledTable
+# Parameters  : list of LED sections
+# Returns     : arrays of the section, the LED column and the duplicate index of every cube in creation order
+# Description : Map each cube to the excel column it is animated by in one vectorized pass. Sections
+#               with a different size repeat each column, the last column takes the remaining cubes.
+#               The duplicate index counts the cubes of a section sharing a column
+############################################
+def ledColumns(ledSections):
+    led_start = np.array([min(led.start, led.end) for led in ledSections], dtype=np.int64)
+    led_end = np.array([max(led.start, led.end) for led in ledSections], dtype=np.int64)
+    dif_size = np.array([led.difSize for led in ledSections], dtype=bool)
+    optional = np.array([led.optionalSize for led in ledSections], dtype=np.int64)
+    led_range = led_end - led_start + 1
+    counts = np.where(dif_size, optional + 1, led_range)
+
+    section = np.repeat(np.arange(len(ledSections)), counts)
+    step = np.arange(len(section)) - (np.cumsum(counts) - counts)[section]
+    duplicateSize = np.where(dif_size, (optional + 1) // led_range, 1)[section]
+    #CUBES PAST THE LAST FULL REPEAT (OR ALL OF THEM WHEN THERE ARE FEWER CUBES THAN COLUMNS) GO TO THE LAST COLUMN
+    offset = np.minimum(step // np.maximum(duplicateSize, 1), led_range[section] - 1)
+    offset = np.where(duplicateSize > 0, offset, led_range[section] - 1)
+    return section, led_start[section] + offset, step - offset * duplicateSize
+
+############################################
+# Name        : poolKeys
+# Called by   : materialPoolKeys, TimelineHash keys
+# Parameters  : dictionary of led column to the hash of its emission strengths (None when always off),
+#               list of LED sections
+# Returns     : list of pool keys, one for every cube in creation order
+# Description : Join the timeline hash of the column of every cube with its color
+############################################
+def poolKeys(column_hashes, ledSections):
+    section, columns, _ = ledColumns(ledSections)
+    colors = [led.color.name for led in ledSections]
+    keys = []
+    for led_section, column in zip(section.tolist(), columns.tolist()):
+        timeline = column_hashes[column]
+        keys.append("Off" if timeline is None else f"{colors[led_section]}:{timeline}")
+    return keys
+
+############################################
+# Name        : materialPoolKeys
+# Called by   : animation prepareSheet
+# Parameters  : matrix of emission strengths (frames x led columns), list of LED sections
+# Returns     : list of pool keys, one for every cube in creation order
+# Description : Hash the brightness timeline and color of every cube. Cubes with the same key
+#               can share one material, cubes that are always off share a key whatever their color
+############################################
+def materialPoolKeys(glow_matrix, ledSections):
+    _, columns, _ = ledColumns(ledSections)
+    column_hashes = {}
+    for column in np.unique(columns).tolist():
+        values = np.ascontiguousarray(glow_matrix[:, column])
+        column_hashes[column] = hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest() if np.any(values) else None
+    return poolKeys(column_hashes, ledSections)
+
+############################################
+# Name        : layoutHash
+# Called by   : animation main, ledUpdate updateAnimation
+# Parameters  : list of LED sections, animation mode
+# Returns     : hash of everything that decides the cubes and their materials
+# Description : An update keeps the existing cubes only while this hash stays the same
+############################################
+def layoutHash(ledSections, animationMode):
+    layout = [animationMode]
+    for led in ledSections:
+        layout.append((led.row, led.col, led.start, led.end, led.vert, led.reverse,
+                       led.color.name, led.difSize, led.optionalSize))
+    return hashlib.blake2b(repr(layout).encode('utf-8'), digest_size=16).hexdigest()
+
+############################################
+# Name        : ledTimelineKeys
+# Called by   : animation buildSteps, ledUpdate updateAnimation
+# Parameters  : array of frame numbers, matrix of emission strengths (frames x led columns),
+#               list of LED sections, animation mode
+# Returns     : list of timeline keys, one for every cube in creation order
+# Description : Key the frames, color and brightness of every cube. A cube whose key changed
+#               needs its animation written again. The texture mode bakes every LED into one
+#               image so every cube gets the same key
+############################################
+def ledTimelineKeys(frames_list, glow_matrix, ledSections, animationMode):
+    timeline = TimelineHash(ledSections)
+    timeline.update(frames_list, glow_matrix)
+    return timeline.keys(animationMode)
+
+#ledTimelineKeys of a sheet read in row chunks, the hashes of the chunks are chained
+class TimelineHash():
+    ############################################
+    # Name        : __init__
+    # Called by   : ledTimelineKeys, animation buildSteps, ledUpdate updateStreamed
+    # Parameters  : list of LED sections
+    # Returns     : N/A
+    # Description : Hashes of no rows yet
+    ############################################
+    def __init__(self, ledSections):
+        self.ledSections = ledSections
+        self.frames = hashlib.blake2b(digest_size=16)
+        self.columns = {column: hashlib.blake2b(digest_size=16) for column in np.unique(ledColumns(ledSections)[1]).tolist()}
+        self.lit = set()
+
+    ############################################
+    # Name        : update
+    # Called by   : ledTimelineKeys, animation streamKeyFrameSteps, ledUpdate updateStreamed
+    # Parameters  : array of frame numbers of the next rows, matrix of their emission strengths (rows x led columns)
+    # Returns     : N/A
+    # Description : Add the next rows, the keys are the same however the rows are split
+    ############################################
+    def update(self, frames_list, glow_matrix):
+        self.frames.update(np.ascontiguousarray(frames_list, dtype=np.float64).tobytes())
+        for column, column_hash in self.columns.items():
+            values = np.ascontiguousarray(glow_matrix[:, column])
+            column_hash.update(values.tobytes())
+            if column not in self.lit and np.any(values):
+                self.lit.add(column)
+
+    ############################################
+    # Name        : keys
+    # Called by   : ledTimelineKeys, animation buildSteps, ledUpdate updateStreamed
+    # Parameters  : animation mode
+    # Returns     : list of timeline keys, one for every cube in creation order
+    # Description : Timeline keys of every row added so far
+    ############################################
+    def keys(self, animationMode):
+        column_hashes = {column: column_hash.hexdigest() if column in self.lit else None for column, column_hash in self.columns.items()}
+        frames_hash = self.frames.hexdigest()
+        keys = [f"{frames_hash}:{key}" for key in poolKeys(column_hashes, self.ledSections)]
+        if animationMode == 'TEXTURE':
+            texture_hash = hashlib.blake2b("|".join(keys).encode('utf-8'), digest_size=16).hexdigest()
+            keys = [texture_hash] * len(keys)
+        return keys
@@ -0,0 +1,63 @@
+import bpy
+
+#Object property holding the index of each LED cube in creation order
+LED_INDEX_PROPERTY = "led_index"
+#Property marking the data blocks a build made ("Cube" for LEDs, "Plane" for the background),
+#teardown removes exactly the tagged data blocks
+GENERATED_PROPERTY = "led_generated"
+LED_KIND = "Cube"
+
+#Corners and faces of a cube centered on the origin (faces wound counter-clockwise from outside)
+CUBE_CORNERS = [(-1, -1, -1), (1, -1, -1), (1, 1, -1), (-1, 1, -1),
+                (-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1)]
+CUBE_FACES = [(0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4),
+              (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]
+
+############################################
+# Name        : createCubeMesh
+# Called by   : ledCubeSteps
+# Parameters  : size of led
+# Returns     : cube mesh shared by every LED
+# Description : Build the LED cube mesh directly through the data API with one
+#               material slot so every object can link its own material
+############################################
+def createCubeMesh(size_of_led):
+    half = size_of_led / 2
+    mesh = bpy.data.meshes.new(name='Cube')
+    mesh.from_pydata([(x * half, y * half, z * half) for x, y, z in CUBE_CORNERS], [], CUBE_FACES)
+    mesh.materials.append(None)
+    mesh.update()
+    mesh[GENERATED_PROPERTY] = LED_KIND
+    return mesh
+
+############################################
+# Name        : ledCubeSteps
+# Called by   : geometryCache cachedLedCubeSteps
+# Parameters  : size of led, ledLayout LedTable, collection to add the cubes to, cubes created per step
+# Returns     : generator yielding ("cubes", cubes done, cubes in the table), returning the list of
+#               cube objects (index in list is the LED index)
+# Description : Create every LED cube as linked duplicates of one mesh, without operator calls,
+#               scene updates or undo pushes per LED, pausing after every batch of cubes. The cubes
+#               and mesh are kept in the table as they are made so a failed build can remove them
+############################################
+def ledCubeSteps(size_of_led, table, collection=None, batchSize=None):
+    if collection is None:
+        collection = bpy.context.collection
+    table.mesh = mesh = createCubeMesh(size_of_led)
+    objects = bpy.data.objects
+    table.objects = led_objects = []
+    positions = table.position.tolist()
+    for led_index, (x, y) in enumerate(positions):
+        ob = objects.new('Cube', mesh)
+        led_objects.append(ob)
+        ob.location = (x, y, 0)
+        #POSITION IN CREATION ORDER, USED TO FIND THE CUBES AGAIN WHEN UPDATING
+        ob[LED_INDEX_PROPERTY] = led_index
+        ob[GENERATED_PROPERTY] = LED_KIND
+        collection.objects.link(ob)
+        #MATERIAL IS STORED ON THE OBJECT SO EACH LED CAN HAVE ITS OWN
+        ob.material_slots[0].link = 'OBJECT'
+        if batchSize and (led_index + 1) % batchSize == 0 and led_index + 1 < len(positions):
+            yield "cubes", led_index + 1, len(positions)
+    return led_objects
+
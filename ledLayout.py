@@ -0,0 +1,168 @@
+import numpy as np
+from dataclasses import dataclass, field
+from ledData import ExitError, Color, ledColumns
+
+#Side of a LED cube in blender units
+LED_SIZE = 2
+
+############################################
+# Name        : sectionExtents
+# Called by   : ledPositions
+# Parameters  : list of LED sections, size of led
+# Returns     : arrays of section width (along x) and height (along y), number of cubes of each section
+# Description : A horizontal section spans its LEDs along x and one LED along y, a vertical
+#               section the other way around
+############################################
+def sectionExtents(ledSections, size_of_led):
+    vert = np.array([led.vert for led in ledSections], dtype=bool)
+    dif_size = np.array([led.difSize for led in ledSections], dtype=bool)
+    span = np.array([abs(led.end - led.start) for led in ledSections], dtype=np.int64)
+    optional = np.array([led.optionalSize for led in ledSections], dtype=np.int64)
+    span = np.where(dif_size, optional, span)
+    width = np.where(vert, 1, span) * size_of_led
+    height = np.where(vert, span, 1) * size_of_led
+    return width, height, span + 1
+
+############################################
+# Name        : gridOffsets
+# Called by   : ledPositions
+# Parameters  : array of grid index of each section, array of section extents
+# Returns     : array of start offset of each grid index
+# Description : The extent of a grid row or column is the largest extent of its sections, the
+#               offset of each one is the sum of the extents before it (prefix sum).
+#               Indices without sections take no space
+############################################
+def gridOffsets(indices, extents):
+    grid_extents = np.zeros(indices.max() + 1, dtype=np.int64)
+    np.maximum.at(grid_extents, indices, extents)
+    offsets = np.zeros(len(grid_extents), dtype=np.int64)
+    np.cumsum(grid_extents[:-1], out=offsets[1:])
+    return offsets
+
+############################################
+# Name        : ledPositions
+# Called by   : ledTable
+# Parameters  : list of LED sections, size of led
+# Returns     : array of (x, y) position of every LED cube in creation order,
+#               array of flags for cubes not orignally in excel
+# Description : Lay out a grid of LED sections of any size. Columns grow along +x and rows along -y,
+#               each section starts in the corner of its grid cell and a reverse section starts
+#               at its far end so it covers the same cubes in the opposite order
+############################################
+def ledPositions(ledSections, size_of_led=LED_SIZE):
+    if not ledSections:
+        return np.zeros((0, 2), dtype=np.float64), np.zeros(0, dtype=bool)
+    rows = np.array([led.row for led in ledSections], dtype=np.int64)
+    cols = np.array([led.col for led in ledSections], dtype=np.int64)
+    if rows.min() < 0 or cols.min() < 0:
+        raise ExitError("LED sections need a row and column of 0 or more")
+
+    width, height, counts = sectionExtents(ledSections, size_of_led)
+    col_offsets = gridOffsets(cols, width)
+    row_offsets = gridOffsets(rows, height)
+
+    vert = np.array([led.vert for led in ledSections], dtype=bool)
+    reverse = np.array([led.reverse for led in ledSections], dtype=bool)
+    start_x = col_offsets[cols] + np.where(reverse & ~vert, width, 0)
+    start_y = -row_offsets[rows] - np.where(reverse & vert, height, 0)
+
+    #STEP BETWEEN TWO CUBES OF A SECTION
+    direction = np.where(reverse, -1, 1) * size_of_led
+    step_x = np.where(vert, 0, direction)
+    step_y = np.where(vert, -direction, 0)
+
+    #INDEX OF EACH CUBE INSIDE ITS SECTION
+    section = np.repeat(np.arange(len(ledSections)), counts)
+    first_cube = np.cumsum(counts) - counts
+    step = np.arange(len(section)) - first_cube[section]
+
+    positions = np.empty((len(section), 2), dtype=np.float64)
+    positions[:, 0] = start_x[section] + step * step_x[section]
+    positions[:, 1] = start_y[section] + step * step_y[section]
+    dif_size = np.array([led.difSize for led in ledSections], dtype=bool)
+    return positions, dif_size[section]
+
+@dataclass
+class LedTable():
+    section: np.ndarray             #section of every LED
+    column: np.ndarray              #LED column (from the led column start) animating every LED
+    duplicate: np.ndarray           #index among the LEDs of its section animated by the same column
+    position: np.ndarray            #(x, y) of every LED cube
+    color: np.ndarray               #Color value of every LED
+    material: np.ndarray            #index in materials of the material of every LED, -1 until it has one
+    objects: list = None            #cube object of every LED once the cubes exist
+    mesh: object = None             #cube mesh shared by every LED
+    materials: list = field(default_factory=list)   #materials in creation order, pooled LEDs share one
+
+    ############################################
+    # Name        : __len__
+    # Called by   : len(table)
+    # Parameters  : self
+    # Returns     : number of LEDs
+    # Description : One row of the table for every LED cube
+    ############################################
+    def __len__(self):
+        return len(self.column)
+
+    ############################################
+    # Name        : colorName
+    # Called by   : animation createEmissionNodes
+    # Parameters  : self, LED index
+    # Returns     : name of the color of the LED
+    # Description : Colors are stored as Color values, the emission nodes look them up by name
+    ############################################
+    def colorName(self, ledIndex):
+        return Color(int(self.color[ledIndex])).name
+
+    ############################################
+    # Name        : colorNames
+    # Called by   : textureAnimation createTextureAnimation, ledUpdate updateAnimation, ledPreview previewLayout
+    # Parameters  : self
+    # Returns     : list of the color name of every LED
+    # Description : colorName for every LED at once
+    ############################################
+    def colorNames(self):
+        names = {color.value: color.name for color in Color}
+        return [names[value] for value in self.color.tolist()]
+
+    ############################################
+    # Name        : animatedLeds
+    # Called by   : animation createEmissionNodes
+    # Parameters  : self
+    # Returns     : array of the first LED of every material, in the order the materials were made
+    # Description : A material shared by several LEDs is only animated once, through its first LED
+    ############################################
+    def animatedLeds(self):
+        used = np.flatnonzero(self.material >= 0)
+        return used[np.unique(self.material[used], return_index=True)[1]]
+
+    ############################################
+    # Name        : animatedColumns
+    # Called by   : animation prepareSheet
+    # Parameters  : self, list of material pool keys (one per LED, None for one material per LED)
+    # Returns     : array of the LED columns of the LEDs whose material gets animated
+    # Description : The materials do not exist yet, a pooled material is animated through the first
+    #               LED of its pool key like animatedLeds picks it once the materials exist
+    ############################################
+    def animatedColumns(self, pool_keys=None):
+        if pool_keys is None:
+            return np.unique(self.column)
+        first = np.unique(np.array(pool_keys), return_index=True)[1]
+        return np.unique(self.column[first])
+
+############################################
+# Name        : ledTable
+# Called by   : animation prepareSheet, ledUpdate updateAnimation, ledPreview renderPreview, bench benchRunner
+# Parameters  : list of LED sections, size of led, indices of the sections to keep (None keeps every section)
+# Returns     : LedTable with one row per LED cube in creation order
+# Description : Lay out and map every LED once. The build fills in the cubes and materials and every
+#               later stage indexes the table instead of walking the sections again. Kept sections
+#               stay where the whole layout puts them
+############################################
+def ledTable(ledSections, size_of_led=LED_SIZE, sections=None):
+    positions = ledPositions(ledSections, size_of_led)[0]
+    section, columns, duplicate = ledColumns(ledSections)
+    colors = np.array([led.color.value for led in ledSections], dtype=np.int8)
+    keep = slice(None) if sections is None else np.isin(section, sections)
+    return LedTable(section[keep].astype(np.int32), columns[keep], duplicate[keep].astype(np.int32), positions[keep],
+                    colors[section[keep]], np.full(len(section[keep]), -1, dtype=np.int32))
@@ -0,0 +1,305 @@
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+import numpy as np
+
+#Import local scripts when run from another folder
+dir = os.path.dirname(os.path.abspath(__file__))
+if not dir in sys.path:
+    sys.path.append(dir)
+
+from ledData import ExitError, readTimes, readIntensityBlock, glowCurve, emissionColor, keyTimeline, interpolateFrames
+from ledLayout import ledTable, LED_SIZE
+from ledSidecar import loadSheetArrays
+from ledTime import applyTimeBase
+from ledRender import framePath
+from ledBatch import loadJobs, sectionFromDict
+from ledProfile import log
+
+#Pixels along the side of one LED in the preview
+LED_PIXELS = 4
+#Longest side of a preview image, the LEDs get smaller to fit
+MAX_PREVIEW_SIDE = 1280
+#Frames rasterized at a time
+FRAME_BATCH = 64
+#Frame rate of a new blender scene
+DEFAULT_FPS = 24
+#zlib level of the PNG frames, LED images compress well at the fastest level
+PNG_LEVEL = 1
+#Display gamma of the preview images, the LED colors are linear like in blender
+DISPLAY_GAMMA = 2.2
+PREVIEW_FORMATS = ('.png', '.gif', '.mp4')
+
+############################################
+# Name        : previewLayout
+# Called by   : renderPreview
+# Parameters  : ledLayout LedTable of the LEDs, pixels along the side of one LED
+# Returns     : grid (rows x columns) of the cube shown in every LED cell (number of cubes for an
+#               empty cell), pixels along the side of one LED, array of linear RGB colors (cubes x 3)
+# Description : Place the cubes of the table in one grid cell per LED. The pixels per LED
+#               are reduced until the image fits MAX_PREVIEW_SIDE
+############################################
+def previewLayout(table, ledPixels=LED_PIXELS):
+    positions = table.position
+    num_cubes = len(positions)
+    if not num_cubes:
+        raise ExitError("There are no LED sections to preview")
+    grid_x = np.rint((positions[:, 0] - positions[:, 0].min()) / LED_SIZE).astype(np.int64)
+    grid_y = np.rint((positions[:, 1].max() - positions[:, 1]) / LED_SIZE).astype(np.int64)
+    grid = np.full((int(grid_y.max()) + 1, int(grid_x.max()) + 1), num_cubes, dtype=np.int32)
+    grid[grid_y, grid_x] = np.arange(num_cubes, dtype=np.int32)
+    ledPixels = max(1, min(ledPixels, MAX_PREVIEW_SIDE // max(grid.shape)))
+
+    colors = np.array([emissionColor(color)[:3] for color in table.colorNames()], dtype=np.float32)
+    return grid, ledPixels, colors
+
+############################################
+# Name        : rasterize
+# Called by   : renderPreview
+# Parameters  : uint8 colors (frames x cubes + 1 x 4), grid of the cube in every LED cell, pixels per LED
+# Returns     : uint8 RGBA images (frames x height x width x 4)
+# Description : Every LED is a square with a one pixel gap. The colors are looked up on the small grid and
+#               then scaled up as whole 4 byte pixels, the image size is rounded up to even sides so it can
+#               be encoded as video
+############################################
+def rasterize(shaded, grid, ledPixels):
+    cells = shaded.view(np.uint32)[:, :, 0][:, grid]
+    height, width = imageSize(grid, ledPixels)
+    lit = ledPixels - 1 if ledPixels >= 3 else ledPixels
+    #THE LAST COLOR IS THE OPAQUE BLACK BACKGROUND, ALSO USED FOR THE GAPS
+    background = shaded.view(np.uint32)[0, -1, 0]
+    images = np.full((cells.shape[0], height, width), background, dtype=np.uint32)
+    rows = np.repeat(cells, ledPixels, axis=2)
+    if lit < ledPixels:
+        rows[:, :, lit::ledPixels] = background
+    for dy in range(lit):
+        images[:, dy:cells.shape[1] * ledPixels:ledPixels, :rows.shape[2]] = rows
+    return images.view(np.uint8).reshape(cells.shape[0], height, width, 4)
+
+############################################
+# Name        : imageSize
+# Called by   : rasterize, renderPreview
+# Parameters  : grid of the cube in every LED cell, pixels per LED
+# Returns     : height and width of the preview images
+# Description : Both rounded up to even numbers, video encoders need even sides
+############################################
+def imageSize(grid, ledPixels):
+    return -(-grid.shape[0] * ledPixels // 2) * 2, -(-grid.shape[1] * ledPixels // 2) * 2
+
+############################################
+# Name        : shadeLeds
+# Called by   : renderPreview
+# Parameters  : matrix of emission strengths (frames x cubes), array of linear RGB colors (cubes x 3)
+# Returns     : uint8 RGBA colors (frames x cubes + 1 x 4), the last one is the black background
+# Description : Map the emission strength to a displayed brightness. Strengths well above 1 saturate
+#               the way the bloom of the render does
+############################################
+def shadeLeds(glow, colors):
+    shaded = np.zeros((glow.shape[0], glow.shape[1] + 1, 3), dtype=np.float32)
+    shaded[:, :-1] = (1.0 - np.exp(-glow.astype(np.float32)))[:, :, None] * colors[None]
+    np.power(shaded, 1.0 / DISPLAY_GAMMA, out=shaded)
+    rgba = np.full((glow.shape[0], glow.shape[1] + 1, 4), 255, dtype=np.uint8)
+    rgba[:, :, :3] = shaded * 255.0 + 0.5
+    return rgba
+
+############################################
+# Name        : pngBytes
+# Called by   : PreviewWriter write
+# Parameters  : uint8 RGBA image (height x width x 4)
+# Returns     : PNG file contents
+# Description : Encode an image as PNG with zlib only, no imaging library needed
+############################################
+def pngBytes(image):
+    height, width = image.shape[:2]
+    #UP FILTER, ROWS INSIDE A LED EQUAL THE ROW ABOVE AND COMPRESS TO ALMOST NOTHING
+    pixels = image.reshape(height, width * 4)
+    rows = np.full((height, width * 4 + 1), 2, dtype=np.uint8)
+    rows[:1, 1:] = pixels[:1]
+    np.subtract(pixels[1:], pixels[:-1], out=rows[1:, 1:])
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", zlib.compress(rows.tobytes(), PNG_LEVEL)) + chunk(b"IEND", b""))
+
+class PreviewWriter():
+    ############################################
+    # Name        : __init__
+    # Called by   : renderPreview
+    # Parameters  : output path (folder or .png for an image sequence, .gif or .mp4), image width and height,
+    #               frames per second of the output, ffmpeg executable (None looks for it on the PATH)
+    # Returns     : N/A
+    # Description : PNG sequences are written here, GIF and MP4 are piped to a local ffmpeg.
+    #               Without ffmpeg a GIF is written with Pillow when it is installed
+    ############################################
+    def __init__(self, path, width, height, fps, ffmpegPath=None):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.extension = os.path.splitext(self.path)[1].lower()
+        self.fps = fps
+        self.numFrames = 0
+        self.process = None
+        self.images = None
+        self.pool = None
+        if self.extension not in PREVIEW_FORMATS and self.extension:
+            raise ExitError(f"Cannot write a preview to {path}, use a folder, .png, .gif or .mp4")
+        if self.extension in ('', '.png'):
+            #FRAMES GO IN THE FOLDER, OR NEXT TO THE GIVEN .PNG NAME
+            self.outputDir = self.path if not self.extension else os.path.dirname(self.path)
+            os.makedirs(self.outputDir, exist_ok=True)
+            self.pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 2)
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        ffmpegPath = ffmpegPath or shutil.which("ffmpeg")
+        if ffmpegPath is None:
+            if self.extension == '.gif':
+                try:
+                    from PIL import Image
+                except ImportError:
+                    raise ExitError("Writing a GIF needs ffmpeg on the PATH or Pillow (pip install pillow), write PNG frames instead")
+                self.images = []
+                return
+            raise ExitError("Writing an MP4 needs ffmpeg on the PATH (or --ffmpeg), write PNG frames instead")
+        command = [ffmpegPath, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                   '-s', f"{width}x{height}", '-r', f"{fps:g}", '-i', '-']
+        if self.extension == '.gif':
+            #ONE PALETTE MADE FROM EVERY FRAME KEEPS THE FEW LED COLORS EXACT
+            command += ['-vf', 'split[a][b];[a]palettegen=stats_mode=full[p];[b][p]paletteuse=dither=none']
+        else:
+            command += ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-movflags', '+faststart']
+        try:
+            self.process = subprocess.Popen(command + [self.path], stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as error:
+            raise ExitError(f"Could not start ffmpeg: {error}")
+
+    ############################################
+    # Name        : write
+    # Called by   : renderPreview
+    # Parameters  : uint8 RGBA images (frames x height x width x 4), frame number of every image
+    # Returns     : N/A
+    # Description : Add a batch of frames to the output
+    ############################################
+    def write(self, images, frames):
+        if self.process is not None:
+            try:
+                self.process.stdin.write(np.ascontiguousarray(images).tobytes())
+            except BrokenPipeError:
+                raise ExitError("ffmpeg stopped: " + self.process.stderr.read().decode(errors='replace').strip())
+        elif self.images is not None:
+            from PIL import Image
+            self.images.extend(Image.fromarray(image[:, :, :3]) for image in images)
+        else:
+            #ZLIB RELEASES THE GIL SO THE FRAMES OF A BATCH ARE ENCODED IN PARALLEL
+            for frame, data in zip(frames, self.pool.map(pngBytes, images)):
+                with open(framePath(self.outputDir, int(frame)), 'wb') as file:
+                    file.write(data)
+        self.numFrames += len(images)
+
+    ############################################
+    # Name        : close
+    # Called by   : renderPreview
+    # Parameters  : N/A
+    # Returns     : N/A
+    # Description : Finish the movie, an encoder error is raised here
+    ############################################
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.process is not None:
+            self.process.stdin.close()
+            error = self.process.stderr.read().decode(errors='replace').strip()
+            if self.process.wait() != 0:
+                raise ExitError(f"ffmpeg could not write {self.path}: {error}")
+        elif self.images:
+            self.images[0].save(self.path, save_all=True, append_images=self.images[1:], loop=0,
+                                duration=round(1000 / self.fps))
+
+############################################
+# Name        : renderPreview
+# Called by   : previewMain
+# Parameters  : array of frame numbers, matrix of emission strengths (frames x led columns), list of LED sections,
+#               output path, frames between two preview images, pixels along the side of one LED,
+#               first and last frame (None for the whole timeline), frames per second of the show,
+#               ffmpeg executable
+# Returns     : number of images written
+# Description : Rasterize the LED grid on every stride-th frame and write the images. Brightness between
+#               two rows is interpolated linearly and a strided preview plays at the speed of the show
+############################################
+def renderPreview(frames_list, glow_matrix, ledSections, outputPath, stride=1, ledPixels=LED_PIXELS,
+                  frameStart=None, frameEnd=None, fps=DEFAULT_FPS, ffmpegPath=None):
+    table = ledTable(ledSections, LED_SIZE)
+    grid, ledPixels, colors = previewLayout(table, ledPixels)
+    height, width = imageSize(grid, ledPixels)
+    columns = table.column
+    #ONLY THE COLUMNS USED BY A CUBE ARE INTERPOLATED
+    used_columns, cube_columns = np.unique(columns, return_inverse=True)
+    frames, values = keyTimeline(frames_list, glow_matrix[:, used_columns])
+    if not len(frames):
+        raise ExitError("There are no rows after the start row in the EXCEL sheet")
+
+    first = np.floor(frames[0]) if frameStart is None else frameStart
+    last = np.floor(frames[-1]) if frameEnd is None else frameEnd
+    sample_frames = np.arange(first, last + 1, max(1, stride))
+    writer = PreviewWriter(outputPath, width, height, fps / max(1, stride), ffmpegPath)
+    try:
+        for start in range(0, len(sample_frames), FRAME_BATCH):
+            batch = sample_frames[start:start + FRAME_BATCH]
+            glow = interpolateFrames(frames, values, batch)[:, cube_columns]
+            writer.write(rasterize(shadeLeds(glow, colors), grid, ledPixels), batch)
+    finally:
+        writer.close()
+    return writer.numFrames
+
+############################################
+# Name        : previewMain
+# Called by   : python ledPreview.py jobs.json preview.mp4 --stride 10
+# Parameters  : command line arguments
+# Returns     : exit code
+# Description : Preview one job of a job file without blender
+############################################
+def previewMain(argv):
+    parser = argparse.ArgumentParser(prog="ledPreview", description="Preview the LED animation of a job without blender")
+    parser.add_argument("jobs", help="JSON or YAML job file")
+    parser.add_argument("output", help="folder or .png for PNG frames, .gif or .mp4")
+    parser.add_argument("--job", type=int, default=0, help="index of the job to preview")
+    parser.add_argument("--stride", type=int, default=1, help="frames between two preview images")
+    parser.add_argument("--start", type=int, default=None, help="first frame, the start of the sheet by default")
+    parser.add_argument("--end", type=int, default=None, help="last frame, the end of the sheet by default")
+    parser.add_argument("--led-pixels", type=int, default=LED_PIXELS, help="pixels along the side of one LED")
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS, help="frames per second of the show")
+    parser.add_argument("--ffmpeg", default=None, help="ffmpeg executable, found on the PATH by default")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = loadJobs(args.jobs)
+        if not 0 <= args.job < len(jobs):
+            raise ExitError(f"The job file has {len(jobs)} jobs, there is no job {args.job}")
+        job = jobs[args.job]
+        ledSections = [sectionFromDict(led) for led in job.ledSections]
+        start = time.perf_counter()
+        sheet = loadSheetArrays(job.filePathName, job.sheetName, job.ledRowStart, job.ledColStart)
+        #THE SHEET IS KEYED ON FRAMES OF THE PREVIEW FRAME RATE UNLESS THE JOB GIVES ITS OWN
+        timeBase = replace(job.timeBase, fps=job.timeBase.fps or args.fps)
+        frames_list, intensity = applyTimeBase(readTimes(sheet, job.ledRowStart),
+                                               readIntensityBlock(sheet, job.ledRowStart, job.ledColStart, ledSections), timeBase)
+        glow_matrix = glowCurve(intensity)
+        read_seconds = time.perf_counter() - start
+        num_images = renderPreview(frames_list, glow_matrix, ledSections, args.output, args.stride, args.led_pixels,
+                                   args.start, args.end, args.fps, args.ffmpeg)
+    except (ExitError, OSError, ValueError) as error:
+        print(f"Could not preview the job: {error}")
+        return 1
+    log.info("Read the sheet in %.2fs, wrote %i images to %s in %.2fs", read_seconds, num_images, args.output,
+             time.perf_counter() - start - read_seconds)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(previewMain(sys.argv[1:]))
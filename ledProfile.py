@@ -0,0 +1,204 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+
+#Logger of the LED scripts, debug messages cost nothing unless the level is DEBUG
+log = logging.getLogger("ledAnimation")
+if not log.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.propagate = False
+    log.setLevel(logging.INFO)
+
+LOG_LEVELS = ('WARNING', 'INFO', 'DEBUG')
+#Functions listed from a cProfile capture
+PROFILE_LINES = 30
+
+@dataclass
+class StageRecord():
+    name: str
+    seconds: float
+    counts: dict = field(default_factory=dict)    #data blocks and keyframes the stage added
+    peakBytes: int = None                         #peak python memory of the stage (traceMemory only)
+
+############################################
+# Name        : setLogLevel
+# Called by   : Panel Creation popUpMenu execute
+# Parameters  : level name ('WARNING', 'INFO' or 'DEBUG')
+# Returns     : N/A
+# Description : Choose which messages of the LED scripts are printed
+############################################
+def setLogLevel(level):
+    log.setLevel(getattr(logging, level, logging.INFO))
+
+############################################
+# Name        : processPeakBytes
+# Called by   : BuildProfile finish
+# Parameters  : N/A
+# Returns     : peak resident memory of the process in bytes, None where it cannot be read
+# Description : Covers the memory blender itself uses, which python memory tracing cannot see
+############################################
+def processPeakBytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #LINUX REPORTS KILOBYTES, MACOS BYTES
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class BuildProfile():
+    ############################################
+    # Name        : __init__
+    # Called by   : ledBatch buildJob, animation main
+    # Parameters  : function returning the current data block and keyframe counts,
+    #               trace the peak python memory of every stage, capture a cProfile of the build
+    # Returns     : N/A
+    # Description : Timers, counts and memory of every stage of one build
+    ############################################
+    def __init__(self, countFunction=None, traceMemory=False, profileCode=False):
+        self.countFunction = countFunction
+        self.traceMemory = traceMemory
+        self.profileCode = profileCode
+        self.stages = []
+        self.seconds = 0.0
+        self.peakBytes = None
+        self.profiler = None
+        self._start = None
+        self._tracing = False
+
+    ############################################
+    # Name        : start
+    # Called by   : ledBatch buildJob
+    # Parameters  : N/A
+    # Returns     : N/A
+    # Description : Start the build timer, memory tracing and the cProfile capture
+    ############################################
+    def start(self):
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        if self.profileCode:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self._start = time.perf_counter()
+
+    ############################################
+    # Name        : finish
+    # Called by   : ledBatch buildJob
+    # Parameters  : N/A
+    # Returns     : N/A
+    # Description : Stop everything start started and record the build totals
+    ############################################
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        self.peakBytes = processPeakBytes()
+
+    ############################################
+    # Name        : stage
+    # Called by   : animation main, animation createBars, ledUpdate updateAnimation
+    # Parameters  : stage name
+    # Returns     : context manager timing the code inside it
+    # Description : Record the time, added data blocks and peak memory of one stage of the build
+    ############################################
+    @contextmanager
+    def stage(self, name):
+        before = self.countFunction() if self.countFunction else {}
+        tracing = tracemalloc.is_tracing() and self.traceMemory
+        if tracing:
+            tracemalloc.reset_peak()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = StageRecord(name, time.perf_counter() - start)
+            if tracing:
+                record.peakBytes = tracemalloc.get_traced_memory()[1] - start_bytes
+            if self.countFunction:
+                after = self.countFunction()
+                record.counts = {key: after[key] - before.get(key, 0) for key in after}
+            self.stages.append(record)
+            log.debug("%s: %.3fs", name, record.seconds)
+
+    ############################################
+    # Name        : report
+    # Called by   : writeReport, ledBatch runJob
+    # Parameters  : N/A
+    # Returns     : dictionary of the build totals and every stage
+    # Description : JSON friendly report of the build
+    ############################################
+    def report(self):
+        return {"seconds": self.seconds, "peakBytes": self.peakBytes, "stages": [asdict(record) for record in self.stages]}
+
+    ############################################
+    # Name        : summaryLines
+    # Called by   : Panel Creation popUpMenu execute
+    # Parameters  : N/A
+    # Returns     : list of lines describing the build
+    # Description : One line per stage with its time, share of the build and what it created
+    ############################################
+    def summaryLines(self):
+        lines = []
+        for record in self.stages:
+            share = 100 * record.seconds / self.seconds if self.seconds else 0
+            line = f"{record.name}: {record.seconds:.2f}s ({share:.0f}%)"
+            created = [f"{count} {key}" for key, count in record.counts.items() if count > 0]
+            if created:
+                line += ", " + ", ".join(created)
+            if record.peakBytes is not None:
+                line += f", peak {record.peakBytes / 1e6:.1f} MB"
+            lines.append(line)
+        total = f"Total: {self.seconds:.2f}s"
+        if self.peakBytes is not None:
+            total += f", process peak {self.peakBytes / 1e6:.0f} MB"
+        lines.append(total)
+        return lines
+
+    ############################################
+    # Name        : profileText
+    # Called by   : writeReport
+    # Parameters  : N/A
+    # Returns     : the slowest functions of the cProfile capture, None without a capture
+    # Description : Functions sorted by cumulative time
+    ############################################
+    def profileText(self):
+        if self.profiler is None:
+            return None
+        text = io.StringIO()
+        pstats.Stats(self.profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return text.getvalue()
+
+    ############################################
+    # Name        : writeReport
+    # Called by   : ledBatch buildJob
+    # Parameters  : path of the JSON report
+    # Returns     : N/A
+    # Description : Write the report as JSON. A cProfile capture is saved next to it as a .prof
+    #               file (open it with snakeviz or pstats) and its slowest functions go in the report
+    ############################################
+    def writeReport(self, path):
+        path = os.path.abspath(os.path.expanduser(path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        report = self.report()
+        if self.profiler is not None:
+            profile_path = os.path.splitext(path)[0] + ".prof"
+            self.profiler.dump_stats(profile_path)
+            report["profile"] = profile_path
+            report["slowestFunctions"] = self.profileText()
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
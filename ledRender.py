@@ -0,0 +1,358 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+#Import local scripts when run by blender --python
+dir = os.path.dirname(os.path.abspath(__file__))
+if not dir in sys.path:
+    sys.path.append(dir)
+
+from ledProfile import log
+
+#Frames rendered by one worker at a time
+DEFAULT_CHUNK_FRAMES = 50
+#Times a failed chunk is rendered again
+DEFAULT_RETRIES = 2
+#Rendered frames are named frame_000001.png
+FRAME_PREFIX = "frame_"
+FRAME_DIGITS = 6
+#Samples used by the CPU fallback
+CPU_SAMPLES = 64
+#Number of output lines kept from a failed worker
+ERROR_LINES = 20
+
+############################################
+# Name        : frameChunks
+# Called by   : renderFrames
+# Parameters  : first frame, last frame, frames per chunk
+# Returns     : list of (first frame, last frame) of every chunk
+# Description : Split the frame range into chunks a worker renders in one go
+############################################
+def frameChunks(frameStart, frameEnd, chunkFrames):
+    chunkFrames = max(1, chunkFrames)
+    return [(start, min(start + chunkFrames - 1, frameEnd)) for start in range(frameStart, frameEnd + 1, chunkFrames)]
+
+############################################
+# Name        : framePath
+# Called by   : missingFrames, clearFrames, workerAssemble
+# Parameters  : output folder, frame number
+# Returns     : path of the rendered image of the frame
+# Description : Same name blender gives the frame with the frame_###### output pattern
+############################################
+def framePath(outputDir, frame):
+    return os.path.join(outputDir, f"{FRAME_PREFIX}{frame:0{FRAME_DIGITS}d}.png")
+
+############################################
+# Name        : missingFrames
+# Called by   : chooseCpu, renderChunk, renderFrames, countRenderedFrames
+# Parameters  : output folder, first frame, last frame
+# Returns     : list of frames without a rendered image
+# Description : Find what is left to render, a retried chunk only renders these frames
+############################################
+def missingFrames(outputDir, frameStart, frameEnd):
+    try:
+        rendered = set(os.listdir(outputDir))
+    except OSError:
+        rendered = set()
+    return [frame for frame in range(frameStart, frameEnd + 1)
+            if os.path.basename(framePath(outputDir, frame)) not in rendered]
+
+############################################
+# Name        : clearFrames
+# Called by   : renderFrames, chooseCpu
+# Parameters  : output folder, first frame, last frame
+# Returns     : N/A
+# Description : Remove the images an earlier render left for the frame range, so a new render never
+#               keeps frames of an older animation. Only retries within one render reuse frames
+############################################
+def clearFrames(outputDir, frameStart, frameEnd):
+    for frame in range(frameStart, frameEnd + 1):
+        try:
+            os.remove(framePath(outputDir, frame))
+        except FileNotFoundError:
+            pass
+
+############################################
+# Name        : countRenderedFrames
+# Called by   : renderPanel updateRenderProgress
+# Parameters  : output folder, first frame, last frame
+# Returns     : number of frames rendered so far
+# Description : Progress is read from the images on disk so it survives a worker crashing
+############################################
+def countRenderedFrames(outputDir, frameStart, frameEnd):
+    return (frameEnd - frameStart + 1) - len(missingFrames(outputDir, frameStart, frameEnd))
+
+############################################
+# Name        : runBlender
+# Called by   : chooseCpu, renderChunk, assembleSequence
+# Parameters  : blender executable, list of blender arguments before the script, list of script arguments
+# Returns     : (True if blender succeeded, last lines of its output)
+# Description : Run this script in a background blender
+############################################
+def runBlender(blenderPath, blenderArgs, scriptArgs):
+    command = ([blenderPath, '--background'] + blenderArgs +
+               ['--python-exit-code', '1', '--python', os.path.abspath(__file__), '--'] + scriptArgs)
+    try:
+        process = subprocess.run(command, capture_output=True, text=True)
+    except OSError as error:
+        return False, str(error)
+    lines = (process.stdout + process.stderr).strip().splitlines()
+    return process.returncode == 0, "\n".join(lines[-ERROR_LINES:])
+
+############################################
+# Name        : chooseCpu
+# Called by   : renderFrames
+# Parameters  : blender executable, saved .blend file, output folder, first frame, device ('AUTO', 'EEVEE' or 'CPU')
+# Returns     : True when every chunk renders on the CPU
+# Description : Choose the renderer once before the workers start so every frame uses the same one.
+#               AUTO renders the first frame with EEVEE and falls back to the CPU when that fails
+############################################
+def chooseCpu(blenderPath, blendPath, outputDir, frameStart, device):
+    if device != 'AUTO':
+        return device == 'CPU'
+    ok, output = runBlender(blenderPath, [blendPath], ['--worker-chunk', str(frameStart), str(frameStart), outputDir])
+    if ok and not missingFrames(outputDir, frameStart, frameStart):
+        return False
+    log.warning("EEVEE could not render frame %i, rendering on the CPU\n%s", frameStart, output)
+    #A FRAME THE PROBE LEFT IS RENDERED AGAIN WITH THE CPU
+    clearFrames(outputDir, frameStart, frameStart)
+    return True
+
+############################################
+# Name        : renderChunk
+# Called by   : renderFrames
+# Parameters  : blender executable, saved .blend file, output folder, (first frame, last frame),
+#               number of retries, render on the CPU
+# Returns     : dictionary with the result of the chunk
+# Description : Render one chunk in a background blender. A failed chunk is rendered again
+#               starting from its first missing frame, with the same renderer
+############################################
+def renderChunk(blenderPath, blendPath, outputDir, chunk, retries, cpu):
+    start = time.perf_counter()
+    output = ""
+    attempts = 0
+    for attempt in range(retries + 1):
+        missing = missingFrames(outputDir, chunk[0], chunk[1])
+        if not missing:
+            break
+        attempts += 1
+        scriptArgs = ['--worker-chunk', str(missing[0]), str(chunk[1]), outputDir]
+        if cpu:
+            scriptArgs.append('--cpu')
+        ok, output = runBlender(blenderPath, [blendPath], scriptArgs)
+    missing = missingFrames(outputDir, chunk[0], chunk[1])
+    result = {"frames": list(chunk), "ok": not missing, "attempts": attempts, "seconds": time.perf_counter() - start}
+    if missing:
+        result["missing"] = missing
+        result["error"] = output
+    return result
+
+############################################
+# Name        : assembleSequence
+# Called by   : renderFrames
+# Parameters  : blender executable, output folder, first frame, last frame, frames per second, movie path
+# Returns     : (True if the movie was written, last lines of the blender output)
+# Description : Join the rendered images into a movie with the blender sequencer
+############################################
+def assembleSequence(blenderPath, outputDir, frameStart, frameEnd, fps, moviePath):
+    return runBlender(blenderPath, ['--factory-startup'],
+                      ['--worker-assemble', outputDir, str(frameStart), str(frameEnd), str(fps), moviePath])
+
+############################################
+# Name        : renderFrames
+# Called by   : renderMain, renderPanel startRender
+# Parameters  : saved .blend file, output folder, first frame, last frame, number of workers,
+#               frames per chunk, retries per chunk, device ('AUTO', 'EEVEE' or 'CPU'),
+#               blender executable, movie path (None keeps only the images), frames per second,
+#               optional dictionary the progress is written to
+# Returns     : dictionary with the result of every chunk and the movie
+# Description : Render the frame range over a pool of background blender workers, each rendering
+#               its own chunk to an image sequence, then assemble the images into a movie.
+#               The renderer is chosen once so the frames of every chunk look the same.
+#               Images and the movie left by an earlier render are removed first
+############################################
+def renderFrames(blendPath, outputDir, frameStart, frameEnd, workers=2, chunkFrames=DEFAULT_CHUNK_FRAMES,
+                 retries=DEFAULT_RETRIES, device='AUTO', blenderPath="blender", moviePath=None, fps=24, progress=None):
+    if progress is None:
+        progress = {}
+    os.makedirs(outputDir, exist_ok=True)
+    clearFrames(outputDir, frameStart, frameEnd)
+    if moviePath and os.path.exists(moviePath):
+        os.remove(moviePath)
+    chunks = frameChunks(frameStart, frameEnd, chunkFrames)
+    progress.update({"status": "Rendering", "chunks": len(chunks), "chunksDone": 0, "done": False})
+
+    start = time.perf_counter()
+    cpu = chooseCpu(blenderPath, blendPath, outputDir, frameStart, device)
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(renderChunk, blenderPath, blendPath, outputDir, chunk, retries, cpu) for chunk in chunks]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            progress["chunksDone"] = len(results)
+            if result["ok"]:
+                log.info("Frames %i-%i: done in %.1fs (%i attempts)", *result["frames"], result["seconds"], result["attempts"])
+            else:
+                log.warning("Frames %i-%i: FAILED in %.1fs (%i attempts)\n%s", *result["frames"], result["seconds"], result["attempts"], result["error"])
+
+    report = {"chunks": results, "seconds": time.perf_counter() - start, "cpu": cpu}
+    missing = missingFrames(outputDir, frameStart, frameEnd)
+    if missing:
+        progress["status"] = f"{len(missing)} frames failed to render"
+    elif moviePath:
+        progress["status"] = "Assembling"
+        ok, output = assembleSequence(blenderPath, outputDir, frameStart, frameEnd, fps, moviePath)
+        report["movie"] = moviePath if ok else None
+        progress["status"] = "Finished" if ok else "Could not assemble the movie"
+        if not ok:
+            report["error"] = output
+    else:
+        progress["status"] = "Finished"
+    progress["done"] = True
+    log.info("%s in %.1fs", progress['status'], time.perf_counter() - start)
+    return report
+
+############################################
+# Name        : useCpuRender
+# Called by   : workerRender
+# Parameters  : scene
+# Returns     : N/A
+# Description : Render with Cycles on the CPU for machines without a GPU. Cycles has no bloom
+#               so a fog glow in the compositor gives the LEDs their halo
+############################################
+def useCpuRender(scene):
+    scene.render.engine = 'CYCLES'
+    scene.cycles.device = 'CPU'
+    scene.cycles.samples = CPU_SAMPLES
+
+    scene.use_nodes = True
+    nodes = scene.node_tree.nodes
+    links = scene.node_tree.links
+    layers = nodes.get('Render Layers') or nodes.new(type='CompositorNodeRLayers')
+    composite = nodes.get('Composite') or nodes.new(type='CompositorNodeComposite')
+    glare = nodes.new(type='CompositorNodeGlare')
+    glare.glare_type = 'FOG_GLOW'
+    glare.quality = 'HIGH'
+    links.new(layers.outputs['Image'], glare.inputs['Image'])
+    links.new(glare.outputs['Image'], composite.inputs['Image'])
+
+############################################
+# Name        : workerRender
+# Called by   : renderMain inside a worker blender
+# Parameters  : first frame, last frame, output folder, render on the CPU
+# Returns     : N/A
+# Description : Render a chunk of the open .blend file to PNG images
+############################################
+def workerRender(frameStart, frameEnd, outputDir, cpu):
+    import bpy
+
+    scene = bpy.context.scene
+    if cpu:
+        useCpuRender(scene)
+    scene.frame_start = frameStart
+    scene.frame_end = frameEnd
+    scene.render.filepath = os.path.join(outputDir, FRAME_PREFIX + "#" * FRAME_DIGITS)
+    scene.render.use_file_extension = True
+    scene.render.image_settings.file_format = 'PNG'
+    #FRAMES LEFT BY A FAILED ATTEMPT OF THIS RENDER ARE KEPT, renderFrames REMOVED THOSE OF EARLIER RENDERS
+    scene.render.use_overwrite = False
+    bpy.ops.render.render(animation=True)
+
+############################################
+# Name        : workerAssemble
+# Called by   : renderMain inside a worker blender
+# Parameters  : output folder, first frame, last frame, frames per second, movie path
+# Returns     : N/A
+# Description : Put the rendered images in the sequencer of an empty scene and render it to an H.264 movie
+############################################
+def workerAssemble(outputDir, frameStart, frameEnd, fps, moviePath):
+    import bpy
+
+    scene = bpy.context.scene
+    editor = scene.sequence_editor_create()
+    strip = editor.sequences.new_image(name="LedFrames", filepath=framePath(outputDir, frameStart), channel=1, frame_start=1)
+    for frame in range(frameStart + 1, frameEnd + 1):
+        strip.elements.append(os.path.basename(framePath(outputDir, frame)))
+
+    image = bpy.data.images.load(framePath(outputDir, frameStart))
+    scene.render.resolution_x, scene.render.resolution_y = image.size
+    scene.render.resolution_percentage = 100
+    scene.render.fps = fps
+    scene.frame_start = 1
+    scene.frame_end = frameEnd - frameStart + 1
+    scene.render.image_settings.file_format = 'FFMPEG'
+    scene.render.ffmpeg.format = 'MPEG4'
+    scene.render.ffmpeg.codec = 'H264'
+    scene.render.filepath = moviePath
+    bpy.ops.render.render(animation=True)
+
+############################################
+# Name        : sceneSettings
+# Called by   : renderMain
+# Parameters  : N/A
+# Returns     : (first frame, last frame, frames per second) of the open scene, None outside blender
+# Description : Read the frame range when run inside blender with the .blend file open
+############################################
+def sceneSettings():
+    try:
+        import bpy
+    except ImportError:
+        return None
+    scene = bpy.context.scene
+    return scene.frame_start, scene.frame_end, round(scene.render.fps / scene.render.fps_base)
+
+############################################
+# Name        : renderMain
+# Called by   : blender -b show.blend --python ledRender.py -- show.blend renders/, python ledRender.py
+# Parameters  : command line arguments
+# Returns     : exit code (0 when every frame was rendered)
+# Description : Headless entry point of the render orchestrator. Workers are started with
+#               --worker-chunk and --worker-assemble
+############################################
+def renderMain(argv):
+    if argv and argv[0] == '--worker-chunk':
+        workerRender(int(argv[1]), int(argv[2]), argv[3], '--cpu' in argv)
+        return 0
+    if argv and argv[0] == '--worker-assemble':
+        workerAssemble(argv[1], int(argv[2]), int(argv[3]), int(argv[4]), argv[5])
+        return 0
+
+    parser = argparse.ArgumentParser(prog="ledRender", description="Render a .blend file over several background blenders")
+    parser.add_argument("blend", help="saved .blend file to render")
+    parser.add_argument("output", help="folder for the rendered images")
+    parser.add_argument("--frames", type=int, nargs=2, default=None, help="first and last frame (default: scene range)")
+    parser.add_argument("--fps", type=int, default=None, help="frames per second of the movie (default: scene fps)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 4), help="number of blender processes")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_FRAMES, help="frames per chunk")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="retries per failed chunk")
+    parser.add_argument("--device", choices=['AUTO', 'EEVEE', 'CPU'], default='AUTO',
+                        help="EEVEE needs a GPU, CPU renders with Cycles, AUTO renders on the CPU when EEVEE cannot render the first frame")
+    parser.add_argument("--movie", default=None, help="assemble the images into this movie file")
+    parser.add_argument("--blender", default=None, help="blender executable for the workers")
+    args = parser.parse_args(argv)
+
+    settings = sceneSettings()
+    if args.frames is None and settings is None:
+        parser.error("--frames is needed outside blender")
+    frameStart, frameEnd = args.frames or settings[:2]
+    fps = args.fps or (settings[2] if settings else 24)
+    blenderPath = args.blender
+    if blenderPath is None:
+        blenderPath = "blender"
+        if settings is not None:
+            import bpy
+            blenderPath = bpy.app.binary_path
+
+    report = renderFrames(os.path.abspath(args.blend), os.path.abspath(args.output), frameStart, frameEnd,
+                          args.workers, args.chunk, args.retries, args.device, blenderPath,
+                          os.path.abspath(args.movie) if args.movie else None, fps)
+    return 0 if all(chunk["ok"] for chunk in report["chunks"]) and report.get("error") is None else 1
+
+if __name__ == "__main__":
+    #BLENDER PASSES THE SCRIPT ARGUMENTS AFTER --
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(renderMain(argv))
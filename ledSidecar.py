@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import struct
+import numpy as np
+from ledData import SheetArrays, sheetArrays
+from workbookCache import readWorkbook, workbookKey
+from ledProfile import log
+
+#Layout of a sidecar file: magic, header length, JSON header, time column (float64), LED block (float32)
+SIDECAR_MAGIC = b"LEDSIDE1"
+SIDECAR_VERSION = 1
+SIDECAR_ALIGNMENT = 64
+#Files read directly by pandas without a sheet name
+TABLE_EXTENSIONS = ('.csv', '.parquet', '.pq')
+
+############################################
+# Name        : isTableFile
+# Called by   : sidecarPath, findSidecar, loadSheetArrays
+# Parameters  : file path
+# Returns     : True if the file is a csv or parquet file
+# Description : Csv and parquet files have no sheets so the sheet name is ignored for them
+############################################
+def isTableFile(filePathName):
+    return os.path.splitext(filePathName)[1].lower() in TABLE_EXTENSIONS
+
+############################################
+# Name        : sidecarPath
+# Called by   : loadSheetArrays, findSidecar
+# Parameters  : file path, sheet name
+# Returns     : path of the sidecar file next to the workbook
+# Description : One sidecar per sheet of a workbook, csv and parquet files have no sheets
+############################################
+def sidecarPath(filePathName, sheetName):
+    path = os.path.abspath(os.path.expanduser(filePathName))
+    if isTableFile(path):
+        return path + ".ledc"
+    safe_sheet = re.sub(r'[^\w.-]', '_', str(sheetName))
+    return f"{path}.{safe_sheet}.ledc"
+
+############################################
+# Name        : alignOffset
+# Called by   : writeSidecar, readSidecar
+# Parameters  : byte offset
+# Returns     : offset rounded up to the sidecar alignment
+# Description : Keep the arrays aligned so they can be memory mapped
+############################################
+def alignOffset(offset):
+    return -(-offset // SIDECAR_ALIGNMENT) * SIDECAR_ALIGNMENT
+
+############################################
+# Name        : writeSidecar
+# Called by   : loadSheetArrays
+# Parameters  : sidecar path, SheetArrays of the sheet, sheet name, workbook cache key (path, sheet, mtime, size)
+# Returns     : N/A
+# Description : Write the time column and LED block to a compact binary file. The file is
+#               written next to the sidecar first so a reader never sees half a file
+############################################
+def writeSidecar(path, sheet, sheetName, key):
+    times = np.ascontiguousarray(sheet.times, dtype='<f8')
+    block = np.ascontiguousarray(sheet.block, dtype='<f4')
+    header = json.dumps({
+        "version": SIDECAR_VERSION,
+        "sheet": str(sheetName),
+        "startRow": sheet.startRow,
+        "startCol": sheet.startCol,
+        "sourceMtime": key[2],
+        "sourceSize": key[3],
+        "rows": block.shape[0],
+        "columns": block.shape[1],
+        "invalidCells": sheet.invalid_cells,
+    }).encode('utf-8')
+
+    data_offset = alignOffset(len(SIDECAR_MAGIC) + 8 + len(header))
+    block_offset = alignOffset(data_offset + times.nbytes)
+    #EVERY WRITER HAS ITS OWN TEMP FILE, BATCH WORKERS MAY CONVERT THE SAME WORKBOOK AT ONCE
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(SIDECAR_MAGIC)
+            file.write(struct.pack('<Q', len(header)))
+            file.write(header)
+            file.write(b"\0" * (data_offset - file.tell()))
+            times.tofile(file)
+            file.write(b"\0" * (block_offset - file.tell()))
+            block.tofile(file)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+############################################
+# Name        : mapArray
+# Called by   : readSidecar
+# Parameters  : sidecar path, dtype, byte offset, shape
+# Returns     : read only memory mapped array (empty arrays are not mapped)
+# Description : Map an array of the sidecar without copying it into memory
+############################################
+def mapArray(path, dtype, offset, shape):
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+############################################
+# Name        : readSidecar
+# Called by   : findSidecar
+# Parameters  : sidecar path, workbook cache key (path, sheet, mtime, size)
+# Returns     : SheetArrays backed by the file, None if the sidecar is missing or out of date
+# Description : Read the header and memory map the arrays of a sidecar
+############################################
+def readSidecar(path, key):
+    try:
+        with open(path, 'rb') as file:
+            if file.read(len(SIDECAR_MAGIC)) != SIDECAR_MAGIC:
+                return None
+            (length,) = struct.unpack('<Q', file.read(8))
+            header = json.loads(file.read(length).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+    if (header.get("version") != SIDECAR_VERSION or header["sheet"] != str(key[1])
+            or header["sourceMtime"] != key[2] or header["sourceSize"] != key[3]):
+        return None
+
+    rows = header["rows"]
+    columns = header["columns"]
+    data_offset = alignOffset(len(SIDECAR_MAGIC) + 8 + length)
+    block_offset = alignOffset(data_offset + rows * 8)
+    if os.path.getsize(path) < block_offset + rows * columns * 4:
+        return None
+    times = mapArray(path, '<f8', data_offset, (rows,))
+    block = mapArray(path, '<f4', block_offset, (rows, columns))
+    return SheetArrays(times, block, header["invalidCells"], header["startRow"], header["startCol"])
+
+############################################
+# Name        : findSidecar
+# Called by   : loadSheetArrays, testRowColStart popUpTest, ledWindow loadWindow
+# Parameters  : file path, sheet name
+# Returns     : SheetArrays of an up to date sidecar, None if there is none
+# Description : Load a sidecar written for the current version of the workbook
+############################################
+def findSidecar(filePathName, sheetName):
+    if isTableFile(filePathName):
+        sheetName = ""
+    try:
+        key = workbookKey(filePathName, sheetName)
+    except OSError:
+        return None
+    return readSidecar(sidecarPath(filePathName, sheetName), key)
+
+############################################
+# Name        : loadSheetArrays
+# Called by   : animation main
+# Parameters  : file path, sheet name, row to start reading from, column to start reading from
+# Returns     : SheetArrays covering the start row and start column
+# Description : Load the sheet from its sidecar when it is up to date and covers the start
+#               row and column. Otherwise parse the workbook and write a new sidecar
+############################################
+def loadSheetArrays(filePathName, sheetName, ledRowStart, ledColStart):
+    if isTableFile(filePathName):
+        sheetName = ""
+    sheet = findSidecar(filePathName, sheetName)
+    if sheet is not None and sheet.startRow <= ledRowStart and sheet.startCol <= ledColStart:
+        return sheet
+
+    key = workbookKey(filePathName, sheetName)
+    sheet = sheetArrays(readWorkbook(filePathName, sheetName), ledRowStart, ledColStart)
+    try:
+        writeSidecar(sidecarPath(filePathName, sheetName), sheet, sheetName, key)
+    except OSError as error:
+        log.warning("Could not write sidecar for %s: %s", filePathName, error)
+    return sheet
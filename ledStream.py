@@ -0,0 +1,155 @@
+import os
+import pandas as pds
+from ledData import SheetArrays, sheetArrays, readTimes, readIntensityBlock, glowCurve
+from ledSidecar import findSidecar
+from ledTime import TimeBase, timeBaseChunks
+from workbookCache import readWorkbook
+
+#Rows read at a time when streaming a sheet
+DEFAULT_CHUNK_ROWS = 50000
+
+############################################
+# Name        : iterSidecarChunks
+# Called by   : iterSheetChunks
+# Parameters  : SheetArrays of a sidecar, row to start reading from, column to start reading from, rows per chunk
+# Returns     : generator of SheetArrays row chunks
+# Description : Slice row chunks out of the memory mapped sidecar without copying them
+############################################
+def iterSidecarChunks(sheet, ledRowStart, ledColStart, chunkRows):
+    colOffset = ledColStart - sheet.startCol
+    for start in range(ledRowStart - sheet.startRow, len(sheet.times), chunkRows):
+        firstRow = sheet.startRow + start
+        cells = [cell for cell in sheet.invalid_cells if firstRow <= cell[0] < firstRow + chunkRows]
+        yield SheetArrays(sheet.times[start:start + chunkRows], sheet.block[start:start + chunkRows, colOffset:],
+                          cells, firstRow, ledColStart)
+
+############################################
+# Name        : iterFrameChunks
+# Called by   : iterSheetChunks, iterParquetChunks, iterExcelChunks
+# Parameters  : data from excel, row to start reading from, column to start reading from, rows per chunk
+# Returns     : generator of SheetArrays row chunks
+# Description : Fallback for files that cannot be read in pieces, the sheet is parsed
+#               whole and only the array conversion is done in chunks
+############################################
+def iterFrameChunks(xls_data, ledRowStart, ledColStart, chunkRows):
+    for start in range(ledRowStart, len(xls_data.index), chunkRows):
+        yield sheetArrays(xls_data.iloc[start:start + chunkRows], start, ledColStart, start)
+
+############################################
+# Name        : iterCsvChunks
+# Called by   : iterSheetChunks
+# Parameters  : csv file path, row to start reading from, column to start reading from, rows per chunk
+# Returns     : generator of SheetArrays row chunks
+# Description : Read a csv file a chunk of rows at a time, rows before the start row are skipped
+############################################
+def iterCsvChunks(path, ledRowStart, ledColStart, chunkRows):
+    firstRow = ledRowStart
+    with pds.read_csv(path, skiprows=range(1, ledRowStart + 1), chunksize=chunkRows) as reader:
+        for chunk in reader:
+            yield sheetArrays(chunk, firstRow, ledColStart, firstRow)
+            firstRow += len(chunk.index)
+
+############################################
+# Name        : iterParquetChunks
+# Called by   : iterSheetChunks
+# Parameters  : parquet file path, row to start reading from, column to start reading from, rows per chunk
+# Returns     : generator of SheetArrays row chunks
+# Description : Read a parquet file a batch of rows at a time with pyarrow
+############################################
+def iterParquetChunks(path, ledRowStart, ledColStart, chunkRows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        yield from iterFrameChunks(readWorkbook(path, ""), ledRowStart, ledColStart, chunkRows)
+        return
+
+    #BATCHES ARE REGROUPED SO EVERY CHUNK STARTS ON THE START ROW OR A MULTIPLE OF THE CHUNK SIZE AFTER IT
+    batchRow = 0
+    firstRow = ledRowStart
+    pending = None
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunkRows):
+        chunk = batch.to_pandas().iloc[max(0, ledRowStart - batchRow):]
+        batchRow += batch.num_rows
+        pending = chunk if pending is None else pds.concat([pending, chunk])
+        while len(pending.index) >= chunkRows:
+            yield sheetArrays(pending.iloc[:chunkRows], firstRow, ledColStart, firstRow)
+            firstRow += chunkRows
+            pending = pending.iloc[chunkRows:]
+    if pending is not None and len(pending.index):
+        yield sheetArrays(pending, firstRow, ledColStart, firstRow)
+
+############################################
+# Name        : iterExcelChunks
+# Called by   : iterSheetChunks
+# Parameters  : workbook path, sheet name, row to start reading from, column to start reading from, rows per chunk
+# Returns     : generator of SheetArrays row chunks
+# Description : Read an .xlsx sheet a chunk of rows at a time with openpyxl in read only mode.
+#               Blank rows at the end of the sheet are dropped like pandas does
+############################################
+def iterExcelChunks(path, sheetName, ledRowStart, ledColStart, chunkRows):
+    try:
+        import openpyxl
+    except ImportError:
+        openpyxl = None
+    if openpyxl is None or os.path.splitext(path)[1].lower() not in ('.xlsx', '.xlsm'):
+        yield from iterFrameChunks(readWorkbook(path, sheetName), ledRowStart, ledColStart, chunkRows)
+        return
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = []
+        blank_rows = []
+        firstRow = ledRowStart
+        #EXCEL ROW 1 IS THE HEADER, DATA FRAME ROW 0 IS EXCEL ROW 2
+        for values in workbook[sheetName].iter_rows(min_row=ledRowStart + 2, values_only=True):
+            if all(value is None for value in values):
+                blank_rows.append(values)
+                continue
+            rows.extend(blank_rows)
+            blank_rows = []
+            rows.append(values)
+            if len(rows) >= chunkRows:
+                yield sheetArrays(pds.DataFrame(rows), firstRow, ledColStart, firstRow)
+                firstRow += len(rows)
+                rows = []
+        if rows:
+            yield sheetArrays(pds.DataFrame(rows), firstRow, ledColStart, firstRow)
+    finally:
+        workbook.close()
+
+############################################
+# Name        : iterSheetChunks
+# Called by   : animation prepareSheet, ledUpdate updateStreamed
+# Parameters  : file path, sheet name, row to start reading from, column to start reading from, rows per chunk
+# Returns     : generator of SheetArrays row chunks
+# Description : Stream a sheet in row chunks so only one chunk is in memory at a time. An up to
+#               date sidecar is sliced directly, csv, parquet and .xlsx files are read in pieces
+############################################
+def iterSheetChunks(filePathName, sheetName, ledRowStart, ledColStart, chunkRows=DEFAULT_CHUNK_ROWS):
+    sheet = findSidecar(filePathName, sheetName)
+    if sheet is not None and sheet.startRow <= ledRowStart and sheet.startCol <= ledColStart:
+        return iterSidecarChunks(sheet, ledRowStart, ledColStart, chunkRows)
+
+    path = os.path.abspath(os.path.expanduser(filePathName))
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return iterCsvChunks(path, ledRowStart, ledColStart, chunkRows)
+    if extension in ('.parquet', '.pq'):
+        return iterParquetChunks(path, ledRowStart, ledColStart, chunkRows)
+    return iterExcelChunks(path, sheetName, ledRowStart, ledColStart, chunkRows)
+
+############################################
+# Name        : glowChunks
+# Called by   : animation streamKeyFrameSteps, ledUpdate updateStreamed
+# Parameters  : iterator of SheetArrays row chunks, list of LED sections, column to start reading from in excel, TimeBase
+# Returns     : generator of (array of frame numbers, matrix of emission strengths) chunks
+# Description : Check, key and glow every chunk of a streamed sheet
+############################################
+def glowChunks(chunks, ledSections, ledColStart, timeBase):
+    #THE UNIT IS DETECTED ON THE FIRST CHUNK ONLY, ROWS OF A FRAME SPLIT OVER TWO CHUNKS ARE MERGED TOGETHER
+    row_chunks = ((readTimes(chunk, chunk.startRow), readIntensityBlock(chunk, chunk.startRow, ledColStart, ledSections))
+                  for chunk in chunks)
+    for frames_list, intensity in timeBaseChunks(row_chunks, timeBase or TimeBase()):
+        yield frames_list, glowCurve(intensity)
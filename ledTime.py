@@ -0,0 +1,145 @@
+import numpy as np
+from dataclasses import dataclass
+from ledData import ExitError, keyTimeline, interpolateFrames
+from ledProfile import log
+
+#Units the time column can be in, AUTO reads it the way sheets were always imported
+TIME_UNITS = ('AUTO', 'FRAMES', 'SECONDS', 'MILLISECONDS')
+#Scale AUTO gives a time column stepping below 1, whatever the frame rate of the scene
+AUTO_SUBFRAME_SCALE = 1000.0
+#What is done with rows that land on the same frame (or the same slot of the target frame rate)
+MERGE_POLICIES = ('KEEP', 'LAST', 'MEAN', 'MAX', 'RESAMPLE')
+#Frame rate of a new blender scene
+DEFAULT_FPS = 24
+
+@dataclass
+class TimeBase():
+    unit: str = 'AUTO'
+    fps: float = None           #frame rate of the scene, None until it is read from the scene
+    policy: str = 'KEEP'        #KEEP leaves rows between frames as subframe keys, like earlier imports
+    targetFps: float = 0        #keep at most one key per slot of this frame rate, 0 keeps every frame
+
+############################################
+# Name        : detectTimeUnit
+# Called by   : frameScale
+# Parameters  : time column from the start row
+# Returns     : 'FRAMES' or 'SECONDS'
+# Description : The 2 is since the first time is always 0. A sheet whose third time is below 1 looks
+#               like seconds, anything else like frames. Milliseconds look like frames so they must be chosen
+############################################
+def detectTimeUnit(times):
+    if len(times) > 2 and times[2] < 1:
+        return 'SECONDS'
+    return 'FRAMES'
+
+############################################
+# Name        : frameScale
+# Called by   : applyTimeBase, timeBaseChunks, ledWindow loadWindow
+# Parameters  : time column from the start row, TimeBase
+# Returns     : number to multiply the time column by to get frames of the scene
+# Description : Seconds and milliseconds are converted with the frame rate of the scene. AUTO keeps the
+#               scale sheets were always imported with, a column stepping below 1 is multiplied by 1000
+#               and anything else is read as frames, so existing shows keep their timing
+############################################
+def frameScale(times, timeBase):
+    if timeBase.unit not in TIME_UNITS:
+        raise ExitError(f"Unknown time unit {timeBase.unit}, use one of {', '.join(TIME_UNITS)}")
+    if timeBase.unit == 'AUTO':
+        if detectTimeUnit(times) == 'FRAMES':
+            return 1.0
+        log.warning("The time column steps below 1 and is multiplied by %g like earlier imports, "
+                    "choose Seconds or Milliseconds to convert it with the frame rate of the scene", AUTO_SUBFRAME_SCALE)
+        return AUTO_SUBFRAME_SCALE
+    unit = timeBase.unit
+    fps = timeBase.fps or DEFAULT_FPS
+    return {'FRAMES': 1.0, 'SECONDS': fps, 'MILLISECONDS': fps / 1000.0}[unit]
+
+############################################
+# Name        : slotFrames
+# Called by   : mergeFrames, timeBaseChunks, ledWindow windowRows
+# Parameters  : array of frame numbers, TimeBase
+# Returns     : array of the frame each row is keyed on
+# Description : Rows go to the nearest whole frame, or to the nearest slot of the target frame rate
+#               when it is below the frame rate of the scene
+############################################
+def slotFrames(frames, timeBase):
+    fps = timeBase.fps or DEFAULT_FPS
+    step = fps / timeBase.targetFps if 0 < timeBase.targetFps < fps else 1.0
+    return np.rint(frames / step) * step
+
+############################################
+# Name        : mergeFrames
+# Called by   : applyTimeBase, timeBaseChunks, ledWindow loadWindow
+# Parameters  : array of frame numbers, matrix of values (frames x columns), TimeBase
+# Returns     : sorted array of distinct key frames, matrix of values on those frames
+# Description : Merge the rows of every slot in one vectorized pass. LAST keeps the last row of the sheet,
+#               MEAN averages the rows, MAX keeps the brightest and RESAMPLE interpolates the rows at
+#               the slot frame. A sheet already keyed once per slot is returned as it is
+############################################
+def mergeFrames(frames, values, timeBase):
+    if timeBase.policy not in MERGE_POLICIES:
+        raise ExitError(f"Unknown merge policy {timeBase.policy}, use one of {', '.join(MERGE_POLICIES)}")
+    if timeBase.policy == 'KEEP' or not len(frames):
+        return frames, values
+    slots = slotFrames(frames, timeBase)
+    if np.array_equal(slots, frames) and np.all(np.diff(frames) > 0):
+        return frames, values
+
+    order = np.argsort(slots, kind='stable')
+    slots = slots[order]
+    first = np.ones(len(slots), dtype=bool)
+    first[1:] = slots[1:] != slots[:-1]
+    starts = np.flatnonzero(first)
+    if timeBase.policy == 'LAST':
+        merged = values[order[np.append(starts[1:], len(slots)) - 1]]
+    elif timeBase.policy == 'MEAN':
+        counts = np.diff(np.append(starts, len(slots)))
+        merged = np.add.reduceat(values[order], starts, axis=0, dtype=np.float64) / counts[:, None]
+    elif timeBase.policy == 'MAX':
+        merged = np.maximum.reduceat(values[order], starts, axis=0)
+    else:
+        merged = interpolateFrames(*keyTimeline(frames, values), slots[starts])
+    return slots[starts], merged.astype(values.dtype, copy=False)
+
+############################################
+# Name        : applyTimeBase
+# Called by   : animation prepareSheet, ledUpdate updateAnimation, ledPreview previewMain, bench benchRunner readSheet
+# Parameters  : time column from the start row, matrix of values (rows x columns), TimeBase
+# Returns     : array of frame numbers of the scene, matrix of values on those frames
+# Description : Convert the time column to frames of the scene and merge the rows landing on the same frame
+############################################
+def applyTimeBase(times, values, timeBase):
+    frames = np.asarray(times, dtype=np.float64) * frameScale(times, timeBase)
+    return mergeFrames(frames, values, timeBase)
+
+############################################
+# Name        : timeBaseChunks
+# Called by   : animation streamKeyFrameSteps
+# Parameters  : iterator of (time column, matrix of values) row chunks of a sheet sorted by time, TimeBase
+# Returns     : generator of (array of frame numbers, matrix of values) chunks
+# Description : applyTimeBase over a streamed sheet. The unit is found on the first chunk and the rows
+#               of the last slot of a chunk wait for the next chunk, which may have more rows in that slot
+############################################
+def timeBaseChunks(chunks, timeBase):
+    scale = None
+    carry_frames = np.zeros(0)
+    carry_values = None
+    for times, values in chunks:
+        if scale is None:
+            scale = frameScale(times, timeBase)
+        frames = np.asarray(times, dtype=np.float64) * scale
+        if timeBase.policy == 'KEEP':
+            yield frames, values
+            continue
+        if carry_values is not None:
+            frames = np.concatenate((carry_frames, frames))
+            values = np.concatenate((carry_values, values))
+        if not len(frames):
+            continue
+        slots = slotFrames(frames, timeBase)
+        last = slots == slots[-1]
+        carry_frames, carry_values = frames[last], values[last]
+        if not last.all():
+            yield mergeFrames(frames[~last], values[~last], timeBase)
+    if carry_values is not None and len(carry_frames):
+        yield mergeFrames(carry_frames, carry_values, timeBase)
@@ -0,0 +1,315 @@
+import os
+import bpy
+from ledData import ExitError, readTimes, readIntensityBlock, glowCurve
+from ledData import layoutHash, ledTimelineKeys, TimelineHash, LAYOUT_PROPERTY, TIMELINE_PROPERTY
+from ledGeometry import LED_INDEX_PROPERTY, GENERATED_PROPERTY, LED_KIND
+from ledLayout import ledTable
+from ledSidecar import loadSheetArrays
+from ledStream import iterSheetChunks, glowChunks
+from workbookCache import invalidateWorkbook
+from keyframeWriter import writeKeyFrames, insertKeyFrames, getFCurve
+from textureAnimation import createTextureAnimation
+from animation import main, addEmissionNode, tagLedMaterials, sceneCounts, sceneTimeBase
+from ledTime import applyTimeBase
+from ledProfile import BuildProfile, log
+from DeleteObject import remove_object, removeMaterials
+
+#Seconds between two checks of a watched workbook
+WATCH_INTERVAL = 1.0
+
+#LedJob and file state of the watched workbook
+_watch = {}
+
+############################################
+# Name        : findLedCubes
+# Called by   : updateAnimation
+# Parameters  : scene
+# Returns     : list of LED cube objects in creation order
+# Description : Find the cubes made by the last import
+############################################
+def findLedCubes(scene):
+    led_objects = [ob for ob in scene.objects if LED_INDEX_PROPERTY in ob]
+    return sorted(led_objects, key=lambda ob: ob[LED_INDEX_PROPERTY])
+
+############################################
+# Name        : emissionSocket
+# Called by   : updateKeyframeMaterials, updateStreamed
+# Parameters  : material of a cube
+# Returns     : emission strength socket, None if the material has no emission node
+# Description : Find the socket the keyframes of a LED are written to
+############################################
+def emissionSocket(material):
+    for node in material.node_tree.nodes:
+        if node.type == 'EMISSION':
+            return node.inputs[1]
+    return None
+
+############################################
+# Name        : writeLedCurve
+# Called by   : updateKeyframeMaterials, updatePooledMaterials, updateStreamed
+# Parameters  : emission strength socket, array of frame numbers, array of values,
+#               write keyframes in bulk or one at a time, keyframe compression tolerance,
+#               add to the keys of the earlier chunks instead of replacing them
+# Returns     : N/A
+# Description : Replace the keyframes of one LED
+############################################
+def writeLedCurve(socket, frames_list, values, bulkKeyframes, keyTolerance, append=False):
+    if bulkKeyframes:
+        writeKeyFrames(socket, frames_list, values, append=append, tolerance=keyTolerance)
+    else:
+        #START FROM AN EMPTY CURVE SO OLD KEYS BETWEEN THE NEW ONES ARE DROPPED
+        if not append:
+            getFCurve(socket)
+        insertKeyFrames(socket, frames_list, values, keyTolerance)
+
+############################################
+# Name        : updateKeyframeMaterials
+# Called by   : updateAnimation
+# Parameters  : ledLayout LedTable with the existing cubes, list of timeline keys,
+#               array of frame numbers, matrix of emission strengths (frames x led columns),
+#               write keyframes in bulk or one at a time, keyframe compression tolerance
+# Returns     : number of rewritten materials
+# Description : Rewrite the keyframes of the cubes whose timeline changed, every other
+#               cube keeps its material and keyframes
+############################################
+def updateKeyframeMaterials(table, timeline_keys, frames_list, glow_matrix, bulkKeyframes, keyTolerance):
+    num_rewritten = 0
+    for ob, column, key in zip(table.objects, table.column.tolist(), timeline_keys):
+        material = ob.active_material
+        if material.get(TIMELINE_PROPERTY) == key:
+            continue
+        socket = emissionSocket(material)
+        if socket is None:
+            continue
+        writeLedCurve(socket, frames_list, glow_matrix[:, column], bulkKeyframes, keyTolerance)
+        material[TIMELINE_PROPERTY] = key
+        num_rewritten += 1
+    return num_rewritten
+
+############################################
+# Name        : updatePooledMaterials
+# Called by   : updateAnimation
+# Parameters  : ledLayout LedTable with the existing cubes, list of timeline keys,
+#               array of frame numbers, matrix of emission strengths,
+#               write keyframes in bulk or one at a time, keyframe compression tolerance
+# Returns     : number of created materials
+# Description : Point every cube at the pooled material of its new timeline. Materials of
+#               timelines that still exist are reused, new timelines get a new material and
+#               materials no cube uses anymore are removed
+############################################
+def updatePooledMaterials(table, timeline_keys, frames_list, glow_matrix, bulkKeyframes, keyTolerance):
+    material_pool = {}
+    old_materials = {}
+    for ob in table.objects:
+        material = ob.active_material
+        old_materials[material.name] = material
+        material_pool.setdefault(material.get(TIMELINE_PROPERTY), material)
+
+    num_created = 0
+    for ob, column, color, key in zip(table.objects, table.column.tolist(), table.colorNames(), timeline_keys):
+        material = material_pool.get(key)
+        if material is None:
+            material = bpy.data.materials.new(name='LedMaterial')
+            material.use_nodes = True
+            material[GENERATED_PROPERTY] = LED_KIND
+            writeLedCurve(addEmissionNode(material, color), frames_list, glow_matrix[:, column], bulkKeyframes, keyTolerance)
+            material[TIMELINE_PROPERTY] = key
+            material_pool[key] = material
+            num_created += 1
+        ob.active_material = material
+
+    removeMaterials([material for material in old_materials.values() if not material.users])
+    return num_created
+
+############################################
+# Name        : updateTextureMaterial
+# Called by   : updateAnimation
+# Parameters  : ledLayout LedTable with the existing cubes, array of frame numbers, matrix of emission strengths
+# Returns     : N/A
+# Description : Bake a new intensity image into a new shared material and remove the old ones
+############################################
+def updateTextureMaterial(table, frames_list, glow_matrix):
+    led_objects = table.objects
+    old_material = led_objects[0].active_material
+
+    material = bpy.data.materials.new(name='LedMaterial')
+    material.use_nodes = True
+    material[GENERATED_PROPERTY] = LED_KIND
+    for ob in led_objects:
+        ob.active_material = material
+    createTextureAnimation(table, material, frames_list, glow_matrix)
+
+    if not old_material.users:
+        removeMaterials([old_material])
+
+############################################
+# Name        : updateStreamed
+# Called by   : updateAnimation
+# Parameters  : ledLayout LedTable with the existing cubes, file path, sheet name, row to start reading from,
+#               column to start reading from, list of LED sections, write keyframes in bulk or one at a time,
+#               keyframe compression tolerance, BuildProfile, TimeBase, rows per chunk
+# Returns     : number of rewritten materials
+# Description : updateKeyframeMaterials for a sheet streamed in row chunks. The first pass only hashes
+#               the chunks, the second pass is only read when a LED changed and appends the chunks
+#               to the changed LEDs, so only one chunk is in memory at a time
+############################################
+def updateStreamed(table, filePathName, sheetName, ledRowStart, ledColStart, ledSections, bulkKeyframes, keyTolerance, profile, timeBase, chunkRows):
+    #THE FIRST CHUNK NEEDS 3 ROWS TO TELL SECONDS FROM FRAMES
+    chunkRows = max(chunkRows, 3)
+    with profile.stage("timelineKeys"):
+        timeline = TimelineHash(ledSections)
+        num_rows = 0
+        for frames_list, glow_matrix in glowChunks(iterSheetChunks(filePathName, sheetName, ledRowStart, ledColStart, chunkRows),
+                                                   ledSections, ledColStart, timeBase):
+            timeline.update(frames_list, glow_matrix)
+            num_rows += len(frames_list)
+        if not num_rows:
+            raise ExitError("There are no rows after the start row in the EXCEL sheet")
+
+    changed = []
+    for ob, column, key in zip(table.objects, table.column.tolist(), timeline.keys('KEYFRAMES')):
+        material = ob.active_material
+        socket = emissionSocket(material)
+        if material.get(TIMELINE_PROPERTY) != key and socket is not None:
+            changed.append((material, socket, column, key))
+    if not changed:
+        return 0
+
+    with profile.stage("update"):
+        chunks = iterSheetChunks(filePathName, sheetName, ledRowStart, ledColStart, chunkRows)
+        for index, (frames_list, glow_matrix) in enumerate(glowChunks(chunks, ledSections, ledColStart, timeBase)):
+            for material, socket, column, key in changed:
+                writeLedCurve(socket, frames_list, glow_matrix[:, column], bulkKeyframes, keyTolerance, index > 0)
+        for material, socket, column, key in changed:
+            material[TIMELINE_PROPERTY] = key
+    return len(changed)
+
+############################################
+# Name        : updateAnimation
+# Called by   : ledBatch buildJob, checkWorkbook
+# Parameters  : file path, sheet name, row to start reading from, column to start reading from,
+#               list of LED sections, write keyframes in bulk or one at a time, animation mode,
+#               keyframe compression tolerance, BuildProfile recording every stage,
+#               TimeBase of the time column (None reads it in frames or seconds at the scene frame rate),
+#               then the rows per chunk, key processes and geometry cache folder of main for a rebuild
+# Returns     : N/A
+# Description : Update the LEDs of the last import after the sheet changed. The cubes are only
+#               rebuilt when the LED sections or animation mode changed, otherwise only the
+#               animation of the LEDs whose timeline changed is written again. With rows per chunk
+#               the sheet is streamed like the build instead of read at once
+############################################
+def updateAnimation(filePathName, sheetName, ledRowStart, ledColStart, ledSections, bulkKeyframes=True, animationMode='KEYFRAMES', keyTolerance=None, profile=None, timeBase=None,
+                    chunkRows=0, keyWorkers=0, geometryCache=""):
+    if profile is None:
+        profile = BuildProfile(sceneCounts)
+    scene = bpy.context.scene
+    timeBase = sceneTimeBase(timeBase)
+    table = ledTable(ledSections)
+    led_objects = findLedCubes(scene)
+    if (scene.get(LAYOUT_PROPERTY) != layoutHash(ledSections, animationMode) or len(led_objects) != len(table)
+            or any(ob.active_material is None for ob in led_objects)):
+        log.info("LED layout changed, rebuilding every LED")
+        with profile.stage("removeCubes"):
+            remove_object(LED_KIND)
+        #THE REBUILD USES THE SETTINGS OF THE BUILD IT REPLACES
+        main(filePathName, sheetName, ledRowStart, ledColStart, ledSections, bulkKeyframes, animationMode, chunkRows,
+             keyTolerance, profile, timeBase, keyWorkers, geometryCache)
+        return
+    table.objects = led_objects
+
+    if chunkRows:
+        if animationMode != 'KEYFRAMES':
+            raise ExitError("Streaming the sheet in chunks only works with keyframe animation")
+        num_rewritten = updateStreamed(table, filePathName, sheetName, ledRowStart, ledColStart, ledSections, bulkKeyframes, keyTolerance,
+                                       profile, timeBase, chunkRows)
+        log.info("Update: rewrote the animation of %i of %i LEDs", num_rewritten, len(led_objects))
+        return
+
+    with profile.stage("readSheet"):
+        sheet = loadSheetArrays(filePathName, sheetName, ledRowStart, ledColStart)
+        frames_list, intensity = applyTimeBase(readTimes(sheet, ledRowStart),
+                                               readIntensityBlock(sheet, ledRowStart, ledColStart, ledSections), timeBase)
+        glow_matrix = glowCurve(intensity)
+    with profile.stage("timelineKeys"):
+        timeline_keys = ledTimelineKeys(frames_list, glow_matrix, ledSections, animationMode)
+
+    with profile.stage("update"):
+        if animationMode == 'POOLED':
+            num_created = updatePooledMaterials(table, timeline_keys, frames_list, glow_matrix, bulkKeyframes, keyTolerance)
+            log.info("Update: created %i materials for changed timelines", num_created)
+        elif animationMode == 'TEXTURE':
+            if led_objects[0].active_material.get(TIMELINE_PROPERTY) != timeline_keys[0]:
+                updateTextureMaterial(table, frames_list, glow_matrix)
+                tagLedMaterials(led_objects, timeline_keys)
+                log.info("Update: baked a new intensity image")
+            else:
+                log.info("Update: nothing changed")
+        else:
+            num_rewritten = updateKeyframeMaterials(table, timeline_keys, frames_list, glow_matrix, bulkKeyframes, keyTolerance)
+            log.info("Update: rewrote the animation of %i of %i LEDs", num_rewritten, len(led_objects))
+
+############################################
+# Name        : fileStamp
+# Called by   : watchWorkbook, checkWorkbook
+# Parameters  : file path
+# Returns     : modified time and size of the file
+# Description : Changes whenever the workbook is saved
+############################################
+def fileStamp(filePathName):
+    stat = os.stat(os.path.abspath(os.path.expanduser(filePathName)))
+    return (stat.st_mtime_ns, stat.st_size)
+
+############################################
+# Name        : checkWorkbook
+# Called by   : blender timer registered by watchWorkbook
+# Parameters  : N/A
+# Returns     : seconds until the next check, None to stop the timer
+# Description : Update the LEDs when the watched workbook was saved since the last check
+############################################
+def checkWorkbook():
+    if "job" not in _watch:
+        return None
+    job = _watch["job"]
+    try:
+        stamp = fileStamp(job.filePathName)
+    except OSError:
+        return WATCH_INTERVAL
+    if stamp != _watch["stamp"]:
+        _watch["stamp"] = stamp
+        #A SAVE WITHIN THE RESOLUTION OF THE FILE TIME MAY KEEP THE KEYS OF THE CACHED ROWS
+        invalidateWorkbook(job.filePathName)
+        try:
+            updateAnimation(job.filePathName, job.sheetName, job.ledRowStart, job.ledColStart, job.ledSections,
+                            job.bulkKeyframes, job.animationMode, job.keyTolerance, None, job.timeBase,
+                            job.chunkRows, job.keyWorkers, job.geometryCache)
+        except (ExitError, OSError, ValueError) as error:
+            log.warning("Could not update the LEDs: %s", error)
+        except Exception as error:
+            #AN ERROR LEAVING THE TIMER WOULD STOP THE WATCH WITHOUT A WORD, A HALF SAVED FILE IS READ AGAIN NEXT TIME
+            log.error("Could not update the LEDs: %s", error, exc_info=error)
+    return WATCH_INTERVAL
+
+############################################
+# Name        : watchWorkbook
+# Called by   : buildOperator reportBuild
+# Parameters  : ledBatch LedJob of the build
+# Returns     : N/A
+# Description : Update the LEDs with the settings of the build every time the workbook is saved
+############################################
+def watchWorkbook(job):
+    _watch["job"] = job
+    _watch["stamp"] = fileStamp(job.filePathName)
+    if not bpy.app.timers.is_registered(checkWorkbook):
+        bpy.app.timers.register(checkWorkbook, first_interval=WATCH_INTERVAL)
+
+############################################
+# Name        : stopWatching
+# Called by   : Panel Creation watch property update, unregister
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Stop updating the LEDs when the workbook is saved
+############################################
+def stopWatching():
+    _watch.clear()
+    if bpy.app.timers.is_registered(checkWorkbook):
+        bpy.app.timers.unregister(checkWorkbook)
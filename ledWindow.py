@@ -0,0 +1,209 @@
+import os
+from dataclasses import dataclass
+import numpy as np
+import pandas as pds
+from ledData import ExitError, SheetArrays, sheetArrays, toNumeric, findInvalidCells, usedColumns, readTimes, readIntensityBlock
+from ledSidecar import findSidecar, isTableFile
+from ledTime import frameScale, slotFrames, mergeFrames
+from workbookCache import LruCache, workbookKey
+from workbookWindow import sheetColumns, readParquetRows
+from ledProfile import log
+
+#Time columns and row slices kept, the least recently used is dropped first
+MAX_CACHED_SLICES = 8
+MAX_CACHED_SLICE_BYTES = 256 * 1024 * 1024
+
+_slices = LruCache(MAX_CACHED_SLICES, MAX_CACHED_SLICE_BYTES, lambda sheet: sheet.times.nbytes + sheet.block.nbytes,
+                   lambda key: key[0])
+
+@dataclass
+class ImportWindow():
+    timeStart: float = None     #first time of the window in the units of the time column, None from the first row
+    timeEnd: float = None       #last time of the window, None to the last row
+    sections: list = None       #indices of the LED sections to build, None builds every section
+
+############################################
+# Name        : windowSections
+# Called by   : animation prepareSheet
+# Parameters  : list of LED sections, ImportWindow (None for the whole sheet)
+# Returns     : sorted list of the indices of the sections to build
+# Description : Check the sections of the window exist
+############################################
+def windowSections(ledSections, window):
+    if window is None or window.sections is None:
+        return list(range(len(ledSections)))
+    sections = sorted({int(index) for index in window.sections})
+    if not sections:
+        raise ExitError("The import window has no LED sections")
+    if sections[0] < 0 or sections[-1] >= len(ledSections):
+        raise ExitError(f"The import window uses LED sections {', '.join(str(index + 1) for index in sections)} "
+                        f"but there are only {len(ledSections)} sections")
+    return sections
+
+############################################
+# Name        : sheetTimes
+# Called by   : loadWindow
+# Parameters  : file path, sheet name
+# Returns     : SheetArrays of the time column from the first row, without LED columns
+# Description : Read only the time column, the rows of the window are found on it
+############################################
+def sheetTimes(filePathName, sheetName):
+    key = workbookKey(filePathName, sheetName)
+    path = key[0]
+
+    def read():
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            frame = pds.read_csv(path, usecols=[0])
+        elif extension in ('.parquet', '.pq'):
+            frame = pds.read_parquet(path, columns=sheetColumns(filePathName, sheetName)[:1])
+        else:
+            frame = pds.read_excel(path, sheet_name=sheetName, usecols=[0])
+        time_block = frame.iloc[:, [0]]
+        times, invalid = toNumeric(time_block)
+        return SheetArrays(times[:, 0], np.zeros((len(times), 0), dtype=np.float32),
+                           findInvalidCells(time_block, invalid, 0, 0), 0, 1)
+    return _slices.get((key, 'times'), read)
+
+############################################
+# Name        : cachedRows
+# Called by   : readRows, cachedSheet
+# Parameters  : workbookKey of the sheet, first row, row after the last one, led column start, number of led columns
+# Returns     : SheetArrays of a cached slice holding those rows and columns, None when no slice does
+# Description : Find rows already read for an earlier window
+############################################
+def cachedRows(key, firstRow, endRow, ledColStart, numColumns):
+    def covers(sliceKey, sheet):
+        if sliceKey[:2] != (key, 'rows') or sheet.startCol != ledColStart or sheet.block.shape[1] < numColumns:
+            return False
+        #A SLICE READ PAST THE END OF THE SHEET HAS FEWER ROWS THAN IT ASKED FOR AND HOLDS THE LAST ONE
+        return sheet.startRow <= firstRow and (endRow <= sheet.startRow + len(sheet.times) or len(sheet.times) < sliceKey[3])
+    found = _slices.find(covers)
+    return None if found is None else found[1]
+
+############################################
+# Name        : readRows
+# Called by   : loadWindow
+# Parameters  : file path, sheet name, first row, number of rows, led column start, number of led columns
+# Returns     : SheetArrays of the rows, invalid cells keep their row and column in the sheet
+# Description : Read the rows of the window and the columns of its sections without the rest of the
+#               sheet, csv and excel through skiprows, nrows and usecols, parquet through its row groups.
+#               A window inside the rows and columns of a cached one is sliced out of it
+############################################
+def readRows(filePathName, sheetName, firstRow, numRows, ledColStart, numColumns):
+    key = workbookKey(filePathName, sheetName)
+    sheet = cachedRows(key, firstRow, firstRow + numRows, ledColStart, numColumns)
+    if sheet is not None:
+        return sliceRows(sheet, firstRow, numRows)
+    path = key[0]
+    names = sheetColumns(filePathName, sheetName)
+    columns = [0] + list(range(ledColStart, min(ledColStart + numColumns, len(names))))
+
+    def read():
+        extension = os.path.splitext(path)[1].lower()
+        #ROW 0 OF THE FILE IS THE HEADER, DATA FRAME ROW 0 IS THE ROW AFTER IT
+        if extension == '.csv':
+            frame = pds.read_csv(path, skiprows=range(1, firstRow + 1), nrows=numRows, usecols=columns)
+        elif extension in ('.parquet', '.pq'):
+            frame = readParquetRows(path, firstRow, numRows, [names[column] for column in columns])
+        else:
+            frame = pds.read_excel(path, sheet_name=sheetName, skiprows=range(1, firstRow + 1), nrows=numRows, usecols=columns)
+        sheet = sheetArrays(frame, firstRow, 1, firstRow)
+        #THE LED COLUMNS OF THE SLICE START RIGHT AFTER THE TIME COLUMN
+        invalid_cells = [[row, column if column == 0 else column + ledColStart - 1, value] for row, column, value in sheet.invalid_cells]
+        return SheetArrays(sheet.times, sheet.block, invalid_cells, firstRow, ledColStart)
+    return _slices.get((key, 'rows', firstRow, numRows, ledColStart, len(columns)), read)
+
+############################################
+# Name        : sliceRows
+# Called by   : loadWindow, readRows
+# Parameters  : SheetArrays of a sidecar or of a cached slice, first row, number of rows
+# Returns     : SheetArrays of the rows, sharing the memory of the rows they are sliced from
+# Description : Slice the rows of the window out of rows already read without reading the others
+############################################
+def sliceRows(sheet, firstRow, numRows):
+    start = firstRow - sheet.startRow
+    invalid_cells = [cell for cell in sheet.invalid_cells if firstRow <= cell[0] < firstRow + numRows]
+    return SheetArrays(sheet.times[start:start + numRows], sheet.block[start:start + numRows],
+                       invalid_cells, firstRow, sheet.startCol)
+
+############################################
+# Name        : windowRows
+# Called by   : loadWindow
+# Parameters  : time column from the start row, scale of the column to frames, ImportWindow, TimeBase
+# Returns     : array of the rows (from the start row) in the window
+# Description : Rows whose time is inside the window. When rows are merged per frame the rows sharing
+#               a frame with the window come with it, so its first and last frames match a whole import
+############################################
+def windowRows(times, scale, window, timeBase):
+    inside = np.ones(len(times), dtype=bool)
+    if window.timeStart is not None:
+        inside &= times >= window.timeStart
+    if window.timeEnd is not None:
+        inside &= times <= window.timeEnd
+    if timeBase.policy != 'KEEP' and inside.any():
+        slots = slotFrames(times * scale, timeBase)
+        inside = np.isin(slots, slots[inside])
+    return np.flatnonzero(inside)
+
+############################################
+# Name        : loadWindow
+# Called by   : animation prepareSheet
+# Parameters  : file path, sheet name, led start row, led column start, list of LED sections in the window,
+#               ImportWindow, TimeBase
+# Returns     : array of frame numbers of the scene, matrix of intensities on those frames
+# Description : applyTimeBase on the rows of the window only. The unit of the time column is found on the
+#               whole column so the frames of the window are the frames it has in a whole import. The rows
+#               come from the sidecar when it is up to date, otherwise only they are read from the workbook
+############################################
+def loadWindow(filePathName, sheetName, ledRowStart, ledColStart, ledSections, window, timeBase):
+    if isTableFile(filePathName):
+        sheetName = ""
+    sidecar = findSidecar(filePathName, sheetName)
+    if sidecar is not None and (sidecar.startRow > ledRowStart or sidecar.startCol > ledColStart):
+        sidecar = None
+    times = readTimes(sidecar if sidecar is not None else sheetTimes(filePathName, sheetName), ledRowStart)
+    scale = frameScale(times, timeBase)
+    rows = windowRows(times, scale, window, timeBase)
+    if not len(rows):
+        raise ExitError(f"There are no rows between {window.timeStart} and {window.timeEnd} in the time column")
+
+    first_row = int(rows[0])
+    num_rows = int(rows[-1]) + 1 - first_row
+    if sidecar is not None:
+        sheet = sliceRows(sidecar, ledRowStart + first_row, num_rows)
+    else:
+        columns = usedColumns(ledSections)
+        sheet = readRows(filePathName, sheetName, ledRowStart + first_row, num_rows, ledColStart,
+                         int(columns[-1]) + 1 if len(columns) else 0)
+    intensity = readIntensityBlock(sheet, sheet.startRow, ledColStart, ledSections)
+
+    keep = rows - first_row
+    frames = times[first_row:first_row + num_rows] * scale
+    log.debug("Read rows %i to %i of %i for the import window", first_row, first_row + num_rows, len(times))
+    return mergeFrames(frames[keep], intensity[keep], timeBase)
+
+############################################
+# Name        : cachedSheet
+# Called by   : animation prepareSheet
+# Parameters  : file path, sheet name, led start row, led column start, list of LED sections
+# Returns     : SheetArrays from the led start row to the last row, None when no window read all of them
+# Description : A whole import after a window that covered every row of the sheet and the columns of
+#               every section reuses the rows the window read instead of parsing the workbook again
+############################################
+def cachedSheet(filePathName, sheetName, ledRowStart, ledColStart, ledSections):
+    if isTableFile(filePathName):
+        sheetName = ""
+    try:
+        key = workbookKey(filePathName, sheetName)
+    except OSError:
+        return None
+    #THE TIME COLUMN A WINDOW READ TELLS HOW MANY ROWS THE SHEET HAS
+    times = _slices.find(lambda sliceKey, sheet: sliceKey == (key, 'times'))
+    if times is None:
+        return None
+    columns = usedColumns(ledSections)
+    sheet = cachedRows(key, ledRowStart, len(times[1].times), ledColStart, int(columns[-1]) + 1 if len(columns) else 0)
+    if sheet is not None:
+        log.debug("Reusing the rows of an import window for %s", filePathName)
+    return sheet
@@ -0,0 +1,169 @@
+import bpy
+import os
+import threading
+from bpy.props import StringProperty, IntProperty, BoolProperty, EnumProperty, FloatProperty
+from bpy.types import Scene
+from ledRender import renderFrames, countRenderedFrames, DEFAULT_CHUNK_FRAMES, DEFAULT_RETRIES
+
+#Seconds between two refreshes of the render progress
+PROGRESS_INTERVAL = 1.0
+
+#Progress of the running render, written by the render thread and read by the timer
+_render = {}
+
+############################################
+# Name        : runRender
+# Called by   : startRender in a background thread
+# Parameters  : keyword arguments of ledRender renderFrames
+# Returns     : N/A
+# Description : Run the orchestrator off the main thread so blender stays responsive
+############################################
+def runRender(**kwargs):
+    try:
+        _render["report"] = renderFrames(progress=_render, **kwargs)
+    except Exception as error:
+        _render["status"] = f"Render failed: {error}"
+        _render["done"] = True
+
+############################################
+# Name        : updateRenderProgress
+# Called by   : blender timer registered by startRender
+# Parameters  : N/A
+# Returns     : seconds until the next refresh, None once the render finished
+# Description : Copy the progress of the render thread into the scene and redraw the panel
+############################################
+def updateRenderProgress():
+    scene = bpy.context.scene
+    total = _render["frameEnd"] - _render["frameStart"] + 1
+    #IMAGES OF AN EARLIER RENDER ARE NOT COUNTED BEFORE renderFrames REMOVED THEM
+    rendered = countRenderedFrames(_render["outputDir"], _render["frameStart"], _render["frameEnd"]) if "status" in _render else 0
+    scene.renderProgress = 100.0 * rendered / total
+    scene.renderStatus = f"{_render.get('status', 'Starting')}: {rendered} of {total} frames"
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+    if _render.get("done"):
+        scene.renderStatus = f"{_render['status']}: {rendered} of {total} frames"
+        return None
+    return PROGRESS_INTERVAL
+
+############################################
+# Name        : startRender
+# Called by   : RenderAnimationOperator execute
+# Parameters  : context
+# Returns     : N/A
+# Description : Save a copy of the current file for the workers and start rendering it
+############################################
+def startRender(context):
+    scene = context.scene
+    outputDir = bpy.path.abspath(scene.renderOutput)
+    os.makedirs(outputDir, exist_ok=True)
+    blendPath = os.path.join(outputDir, "ledRender.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=blendPath, copy=True)
+
+    moviePath = os.path.join(outputDir, "ledAnimation.mp4") if scene.renderMovie else None
+    fps = round(scene.render.fps / scene.render.fps_base)
+    _render.clear()
+    _render.update({"outputDir": outputDir, "frameStart": scene.frame_start, "frameEnd": scene.frame_end, "done": False})
+    thread = threading.Thread(target=runRender, daemon=True, kwargs={
+        "blendPath": blendPath, "outputDir": outputDir, "frameStart": scene.frame_start, "frameEnd": scene.frame_end,
+        "workers": scene.renderWorkers, "chunkFrames": scene.renderChunkFrames, "retries": scene.renderRetries,
+        "device": scene.renderDevice, "blenderPath": bpy.app.binary_path, "moviePath": moviePath, "fps": fps})
+    thread.start()
+    bpy.app.timers.register(updateRenderProgress, first_interval=PROGRESS_INTERVAL)
+
+class RenderAnimationOperator(bpy.types.Operator):
+    bl_idname = "render.led_render_operator"
+    bl_label = "Render Animation"
+    ############################################
+    # Name        : execute
+    # Called by   : Panel UI 'Render Animation' button
+    # Parameters  : self, context
+    # Returns     : 'FINISHED' or 'CANCELLED' when a render is already running
+    # Description : Start rendering the scene over several background blenders
+    ############################################
+    def execute(self, context):
+        if _render and not _render.get("done"):
+            self.report({'WARNING'}, "A render is already running")
+            return {'CANCELLED'}
+        startRender(context)
+        return {'FINISHED'}
+
+class RenderPanel(bpy.types.Panel):
+    bl_idname = "OBJECT_PT_led_render_panel"
+    bl_label = "Render"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'LED Animation'
+    ############################################
+    # Name        : draw
+    # Called by   : register()
+    # Parameters  : self, context
+    # Returns     : N/A
+    # Description : Creates UI for the render settings and progress
+    ############################################
+    def draw(self, context):
+        scene = context.scene
+        layout = self.layout
+        layout.prop(scene, "renderOutput")
+        layout.prop(scene, "renderWorkers")
+        layout.prop(scene, "renderChunkFrames")
+        layout.prop(scene, "renderRetries")
+        layout.prop(scene, "renderDevice")
+        layout.prop(scene, "renderMovie")
+        layout.operator("render.led_render_operator")
+        if scene.renderStatus:
+            layout.prop(scene, "renderProgress", slider=True)
+            layout.label(text=scene.renderStatus)
+
+############################################
+# Name        : register
+# Called by   : Panel Creation main
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Register the render panel, operator and scene variables
+############################################
+def register():
+    bpy.utils.register_class(RenderAnimationOperator)
+    bpy.utils.register_class(RenderPanel)
+
+    Scene.renderOutput = StringProperty(name="Output", subtype='DIR_PATH', default="//render/")
+    Scene.renderWorkers = IntProperty(name="Workers", description="Number of blender processes rendering at once",
+                                      min=1, default=max(1, (os.cpu_count() or 2) // 4))
+    Scene.renderChunkFrames = IntProperty(name="Frames per chunk", min=1, default=DEFAULT_CHUNK_FRAMES)
+    Scene.renderRetries = IntProperty(name="Retries", description="Times a failed chunk is rendered again",
+                                      min=0, default=DEFAULT_RETRIES)
+    Scene.renderDevice = EnumProperty(name="Device",
+                                      description="What renders the frames",
+                                      items= [
+                                          ('AUTO', "Auto", "EEVEE, switching to the CPU if EEVEE fails"),
+                                          ('EEVEE', "EEVEE", "EEVEE with bloom, needs a GPU"),
+                                          ('CPU', "CPU", "Cycles on the CPU with a fog glow for the bloom")
+                                      ]
+                                  )
+    Scene.renderMovie = BoolProperty(name="Assemble movie", description="Join the frames into an mp4 when done", default=True)
+    Scene.renderProgress = FloatProperty(name="Progress", subtype='PERCENTAGE', min=0.0, max=100.0, default=0.0)
+    Scene.renderStatus = StringProperty(name="", default="")
+
+############################################
+# Name        : unregister
+# Called by   : called when blender closes
+# Parameters  : N/A
+# Returns     : N/A
+# Description : Used to clean up space and delete the render panel
+############################################
+def unregister():
+    bpy.utils.unregister_class(RenderAnimationOperator)
+    bpy.utils.unregister_class(RenderPanel)
+    if bpy.app.timers.is_registered(updateRenderProgress):
+        bpy.app.timers.unregister(updateRenderProgress)
+
+    del Scene.renderOutput
+    del Scene.renderWorkers
+    del Scene.renderChunkFrames
+    del Scene.renderRetries
+    del Scene.renderDevice
+    del Scene.renderMovie
+    del Scene.renderProgress
+    del Scene.renderStatus
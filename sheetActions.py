@@ -0,0 +1,82 @@
+import math
+import bpy
+from ledGeometry import GENERATED_PROPERTY, LED_KIND
+
+#NLA track holding one strip per sheet on every LED material
+SHEET_TRACK = "LedSheets"
+#Frames left between two sheets played back to back
+SHEET_GAP = 1
+
+############################################
+# Name        : sheetTrack
+# Called by   : stashSheetActions
+# Parameters  : animation data of a LED material node tree
+# Returns     : NLA track of the sheets, made on first use
+# Description : One track per material, the strips of the sheets follow each other on it
+############################################
+def sheetTrack(animation_data):
+    track = animation_data.nla_tracks.get(SHEET_TRACK)
+    if track is None:
+        track = animation_data.nla_tracks.new()
+        track.name = SHEET_TRACK
+    return track
+
+############################################
+# Name        : stashSheetActions
+# Called by   : animation sheetSteps
+# Parameters  : ledLayout LedTable whose materials were just animated, sheet name,
+#               frame the strip of the sheet starts on, array of frame numbers of the sheet
+# Returns     : frame the strip of the next sheet starts on
+# Description : Name the action the keyframe writer made on every material after the sheet, put
+#               it in a strip of the sheet track and clear the active action so the next sheet
+#               gets actions of its own. Every material gets its strip on the same frames
+############################################
+def stashSheetActions(table, sheetName, frameStart, frames_list):
+    for material in table.materials:
+        animation_data = material.node_tree.animation_data
+        if animation_data is None or animation_data.action is None:
+            continue
+        action = animation_data.action
+        action.name = f"{material.name} {sheetName}"
+        sheetTrack(animation_data).strips.new(sheetName, frameStart, action)
+        animation_data.action = None
+    length = float(frames_list[-1] - frames_list[0]) if len(frames_list) else 0.0
+    return frameStart + math.ceil(length) + SHEET_GAP
+
+############################################
+# Name        : sheetMaterials
+# Called by   : useSheet
+# Parameters  : N/A
+# Returns     : list of (animation data, sheet track) of every LED material with sheets
+# Description : Materials of a multi sheet import are found by their tag and track
+############################################
+def sheetMaterials():
+    found = []
+    for material in bpy.data.materials:
+        if material.get(GENERATED_PROPERTY) != LED_KIND or material.node_tree is None:
+            continue
+        animation_data = material.node_tree.animation_data
+        if animation_data is None:
+            continue
+        track = animation_data.nla_tracks.get(SHEET_TRACK)
+        if track is not None:
+            found.append((animation_data, track))
+    return found
+
+############################################
+# Name        : useSheet
+# Called by   : buildOperator LedSheetOperator execute
+# Parameters  : sheet name (empty plays every sheet back to back)
+# Returns     : number of materials switched
+# Description : Switching a sheet only swaps actions. The action of the sheet becomes the active
+#               action of every LED material and the sheet track is muted, without a sheet the
+#               track plays every strip in turn
+############################################
+def useSheet(sheetName=""):
+    num_switched = 0
+    for animation_data, track in sheetMaterials():
+        strip = track.strips.get(sheetName) if sheetName else None
+        animation_data.action = strip.action if strip is not None else None
+        track.mute = strip is not None
+        num_switched += 1
+    return num_switched
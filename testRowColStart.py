@@ -1,7 +1,8 @@
 import bpy 
-import pandas as pds
-from bpy.props import StringProperty, IntProperty, BoolProperty
-from bpy.types import Scene, WindowManager
+import numpy as np
+from workbookWindow import checkSheet, readWindow
+from ledSidecar import findSidecar
+from bpy.props import IntProperty
 
 class confirmRowCol(bpy.types.PropertyGroup):
     startRow: IntProperty(name="", min=0, default=0)
@@ -24,7 +25,7 @@ class popUpTest(bpy.types.Operator):
     def execute(self, context):
         scene = context.scene
         try:
-            xls_data = pds.read_excel(scene.filePathName, sheet_name=scene.sheetName)
+            checkSheet(scene.filePathName, scene.sheetName)
             scene.showInput = True
         except:
             scene.showInput = False
@@ -57,8 +58,19 @@ class popUpTest(bpy.types.Operator):
         scene = context.scene
         confirmInfo = scene.confirmRowCol
         
+        num_test = 10 #Arbitrarily chosen
+        
+        rowDifference = abs(self.visualStartRow - confirmInfo.startRow)
+        test_row = 0
+        if confirmInfo.startRow < self.visualStartRow:
+            test_row = self.testRowNum - rowDifference
+        elif confirmInfo.startRow > self.visualStartRow:
+            test_row = self.testRowNum + rowDifference
+        else:
+            pass
+        
         try:
-            xls_data = pds.read_excel(scene.filePathName, sheet_name=scene.sheetName)
+            frames_list, test_values = readPreview(scene.filePathName, scene.sheetName, confirmInfo.startRow, confirmInfo.startCol, test_row, num_test)
         except:
             layout.label(text="There is something wrong with excel sheet name or file path.")
             return None
@@ -67,13 +79,10 @@ class popUpTest(bpy.types.Operator):
 
         layout.prop(confirmInfo, "startRow")
         
-        num_test = 10 #Arbitrarily chosen
-        
         layout.label(text="Verify this is the first 10 inputs in the time/frames column")
         box = layout.box()
         row = box.row()
         
-        frames_list = xls_data.iloc[confirmInfo.startRow:confirmInfo.startRow + num_test,0]
         for frame in frames_list:
             split = row.split()
             split.label(text=f"{frame}")
@@ -93,25 +102,60 @@ class popUpTest(bpy.types.Operator):
         box = layout.box()
         row = box.row()
         
-        rowDifference = abs(self.visualStartRow - confirmInfo.startRow)
-        test_row = 0
-        if confirmInfo.startRow < self.visualStartRow:
-            test_row = self.testRowNum - rowDifference
-        elif confirmInfo.startRow > self.visualStartRow:
-            test_row = self.testRowNum + rowDifference
-        else:
-            pass
-        
-        if (test_row < len(xls_data.index)) and test_row >= 0:
+        if test_values is not None:
             row.label(text="Verify this is the first 10 inputs in the selected row starting from the start column")
             row = box.row()
-            for i in range(confirmInfo.startCol, confirmInfo.startCol + num_test):
+            for value in test_values:
                 split = row.split()
-                split.label(text=f"{checkDataInput(xls_data.iloc[test_row][i])}")
+                split.label(text=f"{checkDataInput(value)}")
         else:
             row = box.row()
             row.label(text="No valid data for the chosen row")
 
+############################################
+# Name        : readPreview
+# Called by   : draw(self, context)
+# Parameters  : file path, sheet name, start row, start column, row to test, number of values to show
+# Returns     : list of time/frames values from the start row, list of values in the test row 
+#               from the start column (None if the row is not in the sheet)
+# Description : Read the values shown in the popup from an up to date sidecar when it covers
+#               them as numbers, otherwise from a cached window of the workbook
+############################################
+def readPreview(filePathName, sheetName, startRow, startCol, testRow, num_test):
+    sheet = findSidecar(filePathName, sheetName)
+    frames_list = None
+    test_values = None
+    if sheet is not None and sheet.startRow <= startRow:
+        frames_list = sidecarValues(sheet.times[startRow - sheet.startRow:startRow - sheet.startRow + num_test])
+    if sheet is not None and sheet.startRow <= testRow and sheet.startCol <= startCol:
+        if testRow >= len(sheet.times) + sheet.startRow:
+            test_values = []
+        else:
+            colOffset = startCol - sheet.startCol
+            test_values = sidecarValues(sheet.block[testRow - sheet.startRow, colOffset:colOffset + num_test])
+    
+    #ONLY THE SHOWN WINDOW OF THE SHEET IS READ, THE FULL SHEET IS LOADED WHEN THE ANIMATION IS BUILT
+    if frames_list is None:
+        frames_list = readWindow(filePathName, sheetName, startRow, num_test, 0, 1).ravel().tolist()
+    if test_values is None:
+        window = readWindow(filePathName, sheetName, testRow, 1, startCol, num_test)
+        test_values = window[0].tolist() if len(window) else []
+    return frames_list, test_values if test_values else None
+
+############################################
+# Name        : sidecarValues
+# Called by   : readPreview
+# Parameters  : array of values from a sidecar
+# Returns     : list of the values, None when one of them is not a number
+# Description : The sidecar keeps text and empty cells as NaN, the popup shows them as they are
+#               in the workbook so the values are read from it instead
+############################################
+def sidecarValues(values):
+    values = np.asarray(values)
+    if np.isnan(values).any():
+        return None
+    return values.tolist()
+
 ############################################
 # Name        : checkDataInput
 # Called by   : draw(self, context) line 45
@@ -0,0 +1,118 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+#Key compression does not use blender, only the LED scripts are needed
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(tests_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(tests_dir))
+
+from keyCompression import compressKeys, stepInterpolation, COLLINEAR_TOLERANCE
+
+############################################
+# Name        : curveValues
+# Called by   : KeyCompressionTest
+# Parameters  : frames of the kept keys, values of the kept keys, interpolation of every key, frames to evaluate
+# Returns     : value of the curve at every frame
+# Description : The curve blender plays back: a CONSTANT key holds its value up to the next key, a LINEAR key
+#               moves in a straight line to it, and the curve holds the first and last values outside the keys
+############################################
+def curveValues(keyFrames, keyValues, interpolation, frames):
+    segment = np.clip(np.searchsorted(keyFrames, frames, side='right') - 1, 0, len(keyFrames) - 1)
+    following = np.minimum(segment + 1, len(keyFrames) - 1)
+    span = keyFrames[following] - keyFrames[segment]
+    t = np.where(span > 0, (frames - keyFrames[segment]) / np.where(span > 0, span, 1), 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    linear = keyValues[segment] + t * (keyValues[following] - keyValues[segment])
+    return np.where(interpolation[segment] == 'CONSTANT', keyValues[segment], linear)
+
+############################################
+# Name        : sampleColumns
+# Called by   : KeyCompressionTest
+# Parameters  : N/A
+# Returns     : dictionary of column name to (frames, values)
+# Description : Columns an LED sheet gives: held values, ramps, spikes, noise and single keys
+############################################
+def sampleColumns():
+    rng = np.random.default_rng(9)
+    frames = np.arange(500, dtype=np.float64)
+    held = np.repeat(rng.integers(0, 100, 25), 20).astype(np.float64)
+    ramps = np.concatenate([np.linspace(0, 100, 100), np.full(50, 100.0), np.linspace(100, 20, 150), np.full(200, 20.0)])
+    spikes = np.zeros(500)
+    spikes[rng.choice(500, 20, replace=False)] = 100.0
+    return {
+        "held": (frames, held),
+        "ramps": (frames, ramps),
+        "spikes": (frames, spikes),
+        "noise": (frames, rng.normal(50, 10, 500)),
+        "walk": (frames * 0.5, np.cumsum(rng.choice([-1.0, 0.0, 0.0, 1.0], 500))),
+        "constant": (frames, np.full(500, 42.0)),
+        "single": (np.array([7.0]), np.array([3.0])),
+        "pair": (np.array([0.0, 10.0]), np.array([5.0, 5.0])),
+    }
+
+class KeyCompressionTest(unittest.TestCase):
+
+    ############################################
+    # Name        : assertCurveWithin
+    # Called by   : test_lossless, test_tolerance
+    # Parameters  : self, frames, values, tolerance
+    # Returns     : number of keys kept
+    # Description : Compress the keys and check the played back curve at every original frame.
+    #               Keys on a line are dropped when within COLLINEAR_TOLERANCE of it, so that is allowed on top
+    ############################################
+    def assertCurveWithin(self, frames, values, tolerance):
+        keyFrames, keyValues = compressKeys(frames, values, tolerance)
+        self.assertTrue(np.isin(keyFrames, frames).all())
+        self.assertEqual((keyFrames[0], keyFrames[-1]), (frames[0], frames[-1]))
+        curve = curveValues(keyFrames, keyValues, stepInterpolation(keyValues), frames)
+        self.assertLessEqual(np.max(np.abs(curve - values)), tolerance + COLLINEAR_TOLERANCE)
+        return len(keyFrames)
+
+    ############################################
+    # Name        : test_lossless
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Tolerance 0 plays back every original value, held values and ramps keep only their ends
+    ############################################
+    def test_lossless(self):
+        counts = {}
+        for name, (frames, values) in sampleColumns().items():
+            with self.subTest(column=name):
+                counts[name] = self.assertCurveWithin(frames, values, 0.0)
+        self.assertEqual(counts["constant"], 2)
+        self.assertEqual(counts["single"], 1)
+        self.assertEqual(counts["ramps"], 5)
+        self.assertLessEqual(counts["held"], 50)
+        self.assertEqual(counts["noise"], 500)
+
+    ############################################
+    # Name        : test_tolerance
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : With a tolerance the curve stays within it at every original frame and keeps fewer keys
+    ############################################
+    def test_tolerance(self):
+        for tolerance in (0.5, 2.0, 10.0):
+            for name, (frames, values) in sampleColumns().items():
+                with self.subTest(column=name, tolerance=tolerance):
+                    kept = self.assertCurveWithin(frames, values, tolerance)
+                    self.assertLessEqual(kept, len(compressKeys(frames, values, 0.0)[0]))
+
+    ############################################
+    # Name        : test_stepInterpolation
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Keys followed by the same value and the last key are constant, the others linear
+    ############################################
+    def test_stepInterpolation(self):
+        self.assertEqual(stepInterpolation([1.0, 1.0, 2.0, 3.0, 3.0]).tolist(),
+                         ['CONSTANT', 'LINEAR', 'LINEAR', 'CONSTANT', 'CONSTANT'])
+        self.assertEqual(stepInterpolation([]).tolist(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+#The stand-in bpy of the bench comes first so the keyframe writers import it instead of blender's
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.dirname(tests_dir), os.path.join(os.path.dirname(tests_dir), "bench", "stub")):
+    if not path in sys.path:
+        sys.path.insert(0, path)
+
+import bpy
+from keyframeWriter import writeKeyFrames, insertKeyFrames
+
+############################################
+# Name        : newSocket
+# Called by   : KeyframeWriterTest
+# Parameters  : material name
+# Returns     : strength socket of an emission node in a new material
+# Description : A socket animated the way the LED materials are
+############################################
+def newSocket(name):
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    return material.node_tree.nodes.new(type='ShaderNodeEmission').inputs[1]
+
+############################################
+# Name        : socketKeys
+# Called by   : KeyframeWriterTest
+# Parameters  : F-curve
+# Returns     : (frame, value) pairs and raw interpolation of every keyframe
+# Description : Read the keys back through foreach_get like blender gives them
+############################################
+def socketKeys(fcurve):
+    points = fcurve.keyframe_points
+    co = np.empty(len(points) * 2, dtype=np.float32)
+    interpolation = np.empty(len(points), dtype=np.int32)
+    points.foreach_get('co', co)
+    points.foreach_get('interpolation', interpolation)
+    return co.reshape(-1, 2), interpolation
+
+class KeyframeWriterTest(unittest.TestCase):
+
+    ############################################
+    # Name        : setUp
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : An empty file and keys of one LED column
+    ############################################
+    def setUp(self):
+        bpy.reset()
+        rng = np.random.default_rng(4)
+        #UNSORTED FRAMES WITH REPEATS, HELD VALUES AND RAMPS
+        self.frames = np.concatenate((rng.permutation(200), rng.integers(0, 200, 30))).astype(np.float64)
+        self.values = np.round(rng.normal(50, 20, len(self.frames)) / 5) * 5
+        self.values[:60] = 40.0
+
+    ############################################
+    # Name        : assertSameKeys
+    # Called by   : test_bulkMatchesInsert, test_appendMatchesInsert
+    # Parameters  : self, F-curve of the bulk writer, F-curve of keyframe_insert
+    # Returns     : N/A
+    # Description : Both writers leave the same keys with the same interpolation
+    ############################################
+    def assertSameKeys(self, bulk, inserted):
+        bulk_co, bulk_interpolation = socketKeys(bulk)
+        inserted_co, inserted_interpolation = socketKeys(inserted)
+        np.testing.assert_array_equal(bulk_co, inserted_co)
+        np.testing.assert_array_equal(bulk_interpolation, inserted_interpolation)
+
+    ############################################
+    # Name        : test_bulkMatchesInsert
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : foreach_set writes what keyframe_insert writes, a repeated frame keeps its last value
+    ############################################
+    def test_bulkMatchesInsert(self):
+        for tolerance in (None, 0.0, 7.5):
+            with self.subTest(tolerance=tolerance):
+                bulk = writeKeyFrames(newSocket("Bulk"), self.frames, self.values, tolerance=tolerance)
+                inserted = insertKeyFrames(newSocket("Insert"), self.frames, self.values, tolerance)
+                self.assertSameKeys(bulk, inserted)
+                if tolerance is None:
+                    self.assertEqual(len(bulk.keyframe_points), 200)
+
+    ############################################
+    # Name        : test_appendMatchesInsert
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Chunks appended to the keys already written merge like keys inserted one at a time,
+    #               new keys replace old keys on the same frame
+    ############################################
+    def test_appendMatchesInsert(self):
+        chunks = ((0, 120), (100, 230))
+        for tolerance in (None, 0.0, 7.5):
+            with self.subTest(tolerance=tolerance):
+                bulk_socket = newSocket("Bulk")
+                insert_socket = newSocket("Insert")
+                for first, last in chunks:
+                    bulk = writeKeyFrames(bulk_socket, self.frames[first:last], self.values[first:last], append=True, tolerance=tolerance)
+                    inserted = insertKeyFrames(insert_socket, self.frames[first:last], self.values[first:last], tolerance)
+                self.assertSameKeys(bulk, inserted)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import sys
+import unittest
+
+#Job files are read by the batch coordinator, which runs without blender
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(tests_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(tests_dir))
+
+from ledData import ExitError
+from ledBatch import jobFromDict
+
+#Smallest job a job file can hold
+JOB = {"name": "show", "workbook": "show.xlsx", "startRow": 0, "startCol": 1,
+       "sections": [{"row": 0, "col": 0, "start": 0, "end": 9}]}
+
+class JobFromDictTest(unittest.TestCase):
+
+    ############################################
+    # Name        : test_animationMode
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Every mode of the panel is read, a misspelled mode fails before a worker starts
+    ############################################
+    def test_animationMode(self):
+        self.assertEqual(jobFromDict(JOB, 0, "").animationMode, 'KEYFRAMES')
+        for mode in ('KEYFRAMES', 'POOLED', 'TEXTURE'):
+            self.assertEqual(jobFromDict(dict(JOB, animationMode=mode), 0, "").animationMode, mode)
+        with self.assertRaisesRegex(ExitError, "Job show has the unknown animation mode POOL"):
+            jobFromDict(dict(JOB, animationMode='POOL'), 0, "")
+
+if __name__ == "__main__":
+    unittest.main()
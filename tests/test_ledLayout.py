@@ -0,0 +1,184 @@
+import os
+import sys
+import unittest
+from dataclasses import dataclass
+import numpy as np
+
+#The layout engine does not use blender, only the LED scripts are needed
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(tests_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(tests_dir))
+
+from ledData import ExitError, LedSection, Color
+from ledLayout import ledPositions, ledTable
+
+#Cube positions the dictionary layout (findAllStart and createBars) gave for the layouts below,
+#with LEDs of size 2. Sections in a 5x5 grid, 3 LEDs each unless written otherwise
+HORIZONTAL = [
+    (0, 0), (2, 0), (4, 0), (4, 0), (6, 0), (8, 0), (8, 0), (10, 0),
+    (12, 0), (12, 0), (14, 0), (16, 0), (16, 0), (18, 0), (20, 0), (0, -2),
+    (2, -2), (4, -2), (4, -2), (6, -2), (8, -2), (8, -2), (10, -2), (12, -2),
+    (12, -2), (14, -2), (16, -2), (16, -2), (18, -2), (20, -2), (0, -4), (2, -4),
+    (4, -4), (4, -4), (6, -4), (8, -4), (8, -4), (10, -4), (12, -4), (12, -4),
+    (14, -4), (16, -4), (16, -4), (18, -4), (20, -4), (0, -6), (2, -6), (4, -6),
+    (4, -6), (6, -6), (8, -6), (8, -6), (10, -6), (12, -6), (12, -6), (14, -6),
+    (16, -6), (16, -6), (18, -6), (20, -6), (0, -8), (2, -8), (4, -8), (4, -8),
+    (6, -8), (8, -8), (8, -8), (10, -8), (12, -8), (12, -8), (14, -8), (16, -8),
+    (16, -8), (18, -8), (20, -8),
+]
+VERTICAL = [
+    (0, 0), (0, -2), (0, -4), (2, 0), (2, -2), (2, -4), (4, 0), (4, -2),
+    (4, -4), (6, 0), (6, -2), (6, -4), (8, 0), (8, -2), (8, -4), (0, -4),
+    (0, -6), (0, -8), (2, -4), (2, -6), (2, -8), (4, -4), (4, -6), (4, -8),
+    (6, -4), (6, -6), (6, -8), (8, -4), (8, -6), (8, -8), (0, -8), (0, -10),
+    (0, -12), (2, -8), (2, -10), (2, -12), (4, -8), (4, -10), (4, -12), (6, -8),
+    (6, -10), (6, -12), (8, -8), (8, -10), (8, -12), (0, -12), (0, -14), (0, -16),
+    (2, -12), (2, -14), (2, -16), (4, -12), (4, -14), (4, -16), (6, -12), (6, -14),
+    (6, -16), (8, -12), (8, -14), (8, -16), (0, -16), (0, -18), (0, -20), (2, -16),
+    (2, -18), (2, -20), (4, -16), (4, -18), (4, -20), (6, -16), (6, -18), (6, -20),
+    (8, -16), (8, -18), (8, -20),
+]
+REVERSED = [
+    (4, 0), (2, 0), (0, 0), (4, 0), (6, 0), (8, 0), (12, 0), (10, 0),
+    (8, 0), (12, 0), (14, 0), (16, 0), (20, 0), (18, 0), (16, 0), (0, -2),
+    (2, -2), (4, -2), (8, -2), (6, -2), (4, -2), (8, -2), (10, -2), (12, -2),
+    (16, -2), (14, -2), (12, -2), (16, -2), (18, -2), (20, -2), (4, -4), (2, -4),
+    (0, -4), (4, -4), (6, -4), (8, -4), (12, -4), (10, -4), (8, -4), (12, -4),
+    (14, -4), (16, -4), (20, -4), (18, -4), (16, -4), (0, -6), (2, -6), (4, -6),
+    (8, -6), (6, -6), (4, -6), (8, -6), (10, -6), (12, -6), (16, -6), (14, -6),
+    (12, -6), (16, -6), (18, -6), (20, -6), (4, -8), (2, -8), (0, -8), (4, -8),
+    (6, -8), (8, -8), (12, -8), (10, -8), (8, -8), (12, -8), (14, -8), (16, -8),
+    (20, -8), (18, -8), (16, -8),
+]
+REVERSED_VERTICAL = [
+    (0, -4), (0, -2), (0, 0), (2, 0), (2, -2), (2, -4), (4, -4), (4, -2),
+    (4, 0), (6, 0), (6, -2), (6, -4), (8, -4), (8, -2), (8, 0), (0, -4),
+    (0, -6), (0, -8), (2, -8), (2, -6), (2, -4), (4, -4), (4, -6), (4, -8),
+    (6, -8), (6, -6), (6, -4), (8, -4), (8, -6), (8, -8), (0, -12), (0, -10),
+    (0, -8), (2, -8), (2, -10), (2, -12), (4, -12), (4, -10), (4, -8), (6, -8),
+    (6, -10), (6, -12), (8, -12), (8, -10), (8, -8), (0, -12), (0, -14), (0, -16),
+    (2, -16), (2, -14), (2, -12), (4, -12), (4, -14), (4, -16), (6, -16), (6, -14),
+    (6, -12), (8, -12), (8, -14), (8, -16), (0, -20), (0, -18), (0, -16), (2, -16),
+    (2, -18), (2, -20), (4, -20), (4, -18), (4, -16), (6, -16), (6, -18), (6, -20),
+    (8, -20), (8, -18), (8, -16),
+]
+MIXED = [
+    (4, 0), (6, 0), (8, 0), (10, 0), (12, 0), (12, 0), (12, -2), (12, -4),
+    (12, -6), (12, -8), (16, 0), (18, 0), (20, 0), (20, 0), (20, -2), (20, -4),
+    (20, -6), (0, -8), (2, -8), (4, -8), (4, -10), (6, -10), (8, -10), (10, -10),
+    (12, -10), (16, -12), (14, -12), (12, -12), (16, -18), (16, -16), (16, -14), (16, -12),
+    (16, -18), (18, -18), (20, -18), (20, -18), (20, -20), (20, -22),
+]
+
+############################################
+# Name        : section
+# Called by   : the layouts below
+# Parameters  : grid row, grid column, start column, end column, vertical, reverse, optional size (0 keeps the size)
+# Returns     : LedSection
+# Description : Short form of a white LED section
+############################################
+def section(row, col, start, end, vert=False, reverse=False, optionalSize=0):
+    return LedSection(row, col, start, end, vert, reverse, Color.White, optionalSize > 0, optionalSize)
+
+#Every cell of the grid holds a section, reverse sections are on a checkerboard
+LAYOUTS = {
+    "horizontal": ([section(row, col, 0, 2) for row in range(5) for col in range(5)], HORIZONTAL),
+    "vertical": ([section(row, col, 0, 2, True) for row in range(5) for col in range(5)], VERTICAL),
+    "reversed": ([section(row, col, 0, 2, False, (row + col) % 2 == 0) for row in range(5) for col in range(5)], REVERSED),
+    "reversedVertical": ([section(row, col, 0, 2, True, (row + col) % 2 == 0) for row in range(5) for col in range(5)], REVERSED_VERTICAL),
+    "mixed": ([section(0, 1, 0, 4), section(0, 2, 0, 1, True, optionalSize=4), section(0, 3, 0, 2), section(0, 4, 0, 3, True),
+               section(1, 0, 0, 2), section(2, 1, 0, 4), section(3, 2, 0, 2, False, True), section(3, 3, 0, 3, True, True),
+               section(4, 3, 0, 1, optionalSize=2), section(4, 4, 0, 2, True)], MIXED),
+}
+
+#Section where every read of a field is counted
+@dataclass
+class CountedSection(LedSection):
+    reads = 0
+
+    def __getattribute__(self, name):
+        if not name.startswith('__'):
+            type(self).reads += 1
+        return object.__getattribute__(self, name)
+
+############################################
+# Name        : gridSections
+# Called by   : LayoutScalingTest
+# Parameters  : number of grid rows and columns
+# Returns     : list of counted LED sections filling the grid
+# Description : Horizontal and vertical sections of 6 LEDs, some of them reversed
+############################################
+def gridSections(size):
+    return [CountedSection(row, col, 0, 5, (row + col) % 2 == 1, row % 3 == 0, Color.White, False, 0)
+            for row in range(size) for col in range(size)]
+
+class LayoutPositionsTest(unittest.TestCase):
+
+    ############################################
+    # Name        : test_sameAsDictionaryLayout
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : ledPositions gives the cubes the coordinates the dictionary layout gave them
+    ############################################
+    def test_sameAsDictionaryLayout(self):
+        for name, (ledSections, expected) in LAYOUTS.items():
+            with self.subTest(layout=name):
+                positions, _ = ledPositions(ledSections, 2)
+                np.testing.assert_array_equal(positions, np.array(expected, dtype=np.float64))
+
+    ############################################
+    # Name        : test_tableKeepsPositions
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : The LED table holds the same positions in the same creation order
+    ############################################
+    def test_tableKeepsPositions(self):
+        for name, (ledSections, expected) in LAYOUTS.items():
+            with self.subTest(layout=name):
+                np.testing.assert_array_equal(ledTable(ledSections, 2).position, np.array(expected, dtype=np.float64))
+
+    ############################################
+    # Name        : test_badSection
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : A section outside the grid raises ExitError, the dictionary layout quit blender instead
+    ############################################
+    def test_badSection(self):
+        with self.assertRaises(ExitError):
+            ledPositions([section(-1, 0, 0, 2)])
+
+class LayoutScalingTest(unittest.TestCase):
+
+    ############################################
+    # Name        : sectionReads
+    # Called by   : test_linearScaling
+    # Parameters  : self, list of counted LED sections
+    # Returns     : number of section fields read by one layout of the sections
+    # Description : Counts work instead of timing it, so a busy machine cannot change the result
+    ############################################
+    def sectionReads(self, ledSections):
+        CountedSection.reads = 0
+        ledPositions(ledSections)
+        return CountedSection.reads
+
+    ############################################
+    # Name        : test_linearScaling
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : A 100x100 grid has 4 times the cubes of a 50x50 grid and its layout reads every
+    #               section the same number of times. The dictionary layout rescanned every section
+    #               before it, so it read them 16 times as often
+    ############################################
+    def test_linearScaling(self):
+        small = gridSections(50)
+        large = gridSections(100)
+        self.assertEqual(len(ledPositions(large)[0]), 4 * len(ledPositions(small)[0]))
+        self.assertEqual(self.sectionReads(large), 4 * self.sectionReads(small))
+        self.assertLessEqual(self.sectionReads(large), 20 * len(large))
+
+if __name__ == "__main__":
+    unittest.main()
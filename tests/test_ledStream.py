@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import pandas as pds
+
+#Streaming a sheet does not use blender, only the LED scripts are needed
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(tests_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(tests_dir))
+
+from ledData import LedSection, Color, sheetArrays, readTimes, readIntensityBlock, glowCurve, ledTimelineKeys, TimelineHash
+from ledStream import iterSheetChunks, glowChunks
+from ledTime import TimeBase, applyTimeBase
+from workbookCache import readWorkbook, invalidateWorkbook
+
+#Rows of the test sheet before the LED data and the first LED column
+LED_ROW_START = 2
+LED_COL_START = 1
+
+############################################
+# Name        : sampleSheet
+# Called by   : LedStreamTest setUp
+# Parameters  : N/A
+# Returns     : data frame of a sheet with two rows of notes, repeated frames and a text cell in an unused column
+# Description : A sheet the way the LED scripts read it, the first column is the time
+############################################
+def sampleSheet():
+    rng = np.random.default_rng(3)
+    rows = 53
+    sheet = {"Time": np.repeat(np.arange(30), 2)[:rows].astype(np.float64)}
+    for column in range(6):
+        sheet[f"L{column + 1}"] = np.round(rng.uniform(0, 100, rows))
+    sheet["L3"][:] = 0.0
+    frame = pds.DataFrame(sheet).astype(object)
+    frame.iloc[0] = ["notes"] * len(frame.columns)
+    frame.iloc[1] = ["more notes"] * len(frame.columns)
+    frame.iloc[20, 6] = "off"
+    return frame
+
+class LedStreamTest(unittest.TestCase):
+
+    ############################################
+    # Name        : setUp
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : The sample sheet as csv (and parquet when pyarrow is installed) in a temporary folder
+    ############################################
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        frame = sampleSheet()
+        self.paths = [os.path.join(folder.name, "sheet.csv")]
+        frame.to_csv(self.paths[0], index=False)
+        try:
+            import pyarrow
+            self.paths.append(os.path.join(folder.name, "sheet.parquet"))
+            frame.astype(str).to_parquet(self.paths[1], index=False)
+        except ImportError:
+            pass
+        self.ledSections = [LedSection(0, 0, 0, 2, False, False, Color.Red, False, 0),
+                            LedSection(1, 0, 3, 4, False, True, Color.Yellow, True, 5)]
+        invalidateWorkbook()
+        self.addCleanup(invalidateWorkbook)
+
+    ############################################
+    # Name        : test_chunksMatchSheet
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Chunks joined together give the times, block and text cells of the sheet read at once
+    ############################################
+    def test_chunksMatchSheet(self):
+        for path in self.paths:
+            for chunkRows in (7, 1000):
+                with self.subTest(path=os.path.basename(path), chunkRows=chunkRows):
+                    whole = sheetArrays(readWorkbook(path, ""), LED_ROW_START, LED_COL_START)
+                    chunks = list(iterSheetChunks(path, "", LED_ROW_START, LED_COL_START, chunkRows))
+                    self.assertTrue(all(len(chunk.times) <= chunkRows for chunk in chunks))
+                    self.assertEqual([chunk.startRow for chunk in chunks],
+                                     list(range(LED_ROW_START, LED_ROW_START + len(whole.times), chunkRows)))
+                    np.testing.assert_array_equal(np.concatenate([chunk.times for chunk in chunks]), whole.times)
+                    np.testing.assert_array_equal(np.concatenate([chunk.block for chunk in chunks]), whole.block)
+                    self.assertEqual([list(cell) for chunk in chunks for cell in chunk.invalid_cells],
+                                     [list(cell) for cell in whole.invalid_cells])
+
+    ############################################
+    # Name        : test_timelineKeys
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Timeline keys hashed chunk by chunk equal the keys of the sheet read at once,
+    #               also when rows of a frame are merged over two chunks
+    ############################################
+    def test_timelineKeys(self):
+        for path in self.paths:
+            for policy in ('KEEP', 'MEAN'):
+                with self.subTest(path=os.path.basename(path), policy=policy):
+                    sheet = sheetArrays(readWorkbook(path, ""), LED_ROW_START, LED_COL_START)
+                    frames_list, intensity = applyTimeBase(readTimes(sheet, LED_ROW_START),
+                                                           readIntensityBlock(sheet, LED_ROW_START, LED_COL_START, self.ledSections),
+                                                           TimeBase(policy=policy))
+                    timeline = TimelineHash(self.ledSections)
+                    chunks = iterSheetChunks(path, "", LED_ROW_START, LED_COL_START, 7)
+                    for chunk_frames, glow_matrix in glowChunks(chunks, self.ledSections, LED_COL_START, TimeBase(policy=policy)):
+                        timeline.update(chunk_frames, glow_matrix)
+                    for animationMode in ('KEYFRAMES', 'TEXTURE'):
+                        self.assertEqual(timeline.keys(animationMode),
+                                         ledTimelineKeys(frames_list, glowCurve(intensity), self.ledSections, animationMode))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+#The time base does not use blender, only the LED scripts are needed
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(tests_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(tests_dir))
+
+from ledTime import TimeBase, applyTimeBase
+
+class TimeBaseTest(unittest.TestCase):
+
+    ############################################
+    # Name        : test_autoKeepsEarlierTiming
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : The default time base keys a sheet on the frames earlier imports used, a column
+    #               stepping below 1 times 1000 and any other column as it is, with every row kept
+    ############################################
+    def test_autoKeepsEarlierTiming(self):
+        values = np.arange(8, dtype=np.float32).reshape(4, 2)
+        for times, frames in (([0, 0.25, 0.5, 0.5625], [0, 250, 500, 562.5]), ([0, 1.5, 3, 3], [0, 1.5, 3, 3])):
+            with self.subTest(times=times):
+                with self.assertNoLogs('ledAnimation', 'WARNING') if times[2] >= 1 else self.assertLogs('ledAnimation', 'WARNING'):
+                    frames_list, merged = applyTimeBase(np.array(times), values, TimeBase(fps=30))
+                np.testing.assert_array_equal(frames_list, frames)
+                np.testing.assert_array_equal(merged, values)
+
+    ############################################
+    # Name        : test_chosenUnit
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : A chosen unit is converted with the frame rate of the scene
+    ############################################
+    def test_chosenUnit(self):
+        values = np.zeros((3, 1), dtype=np.float32)
+        for unit, times in (('SECONDS', [0, 0.5, 1]), ('MILLISECONDS', [0, 500, 1000]), ('FRAMES', [0, 15, 30])):
+            with self.subTest(unit=unit):
+                frames_list, _ = applyTimeBase(np.array(times, dtype=np.float64), values, TimeBase(unit, 30))
+                np.testing.assert_array_equal(frames_list, [0, 15, 30])
+
+if __name__ == "__main__":
+    unittest.main()
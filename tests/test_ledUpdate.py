@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import pandas as pds
+
+#The stand-in bpy of the bench comes first so the build and update import it instead of blender's
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+for path in (os.path.dirname(tests_dir), os.path.join(os.path.dirname(tests_dir), "bench", "stub")):
+    if not path in sys.path:
+        sys.path.insert(0, path)
+
+import bpy
+from animation import main
+from ledData import ExitError, LedSection, Color
+from ledGeometry import LED_INDEX_PROPERTY
+from ledUpdate import updateAnimation
+from workbookCache import invalidateWorkbook
+
+############################################
+# Name        : ledKeys
+# Called by   : LedUpdateTest
+# Parameters  : N/A
+# Returns     : list of the (frame, value) keys of every LED cube in creation order
+# Description : Read the keys of the emission strength of every cube through foreach_get
+############################################
+def ledKeys():
+    led_objects = sorted((ob for ob in bpy.context.scene.objects if LED_INDEX_PROPERTY in ob), key=lambda ob: ob[LED_INDEX_PROPERTY])
+    keys = []
+    for ob in led_objects:
+        fcurve = list(ob.active_material.node_tree.animation_data.action.fcurves)[0]
+        co = np.empty(len(fcurve.keyframe_points) * 2, dtype=np.float32)
+        fcurve.keyframe_points.foreach_get('co', co)
+        keys.append(co.tolist())
+    return keys
+
+class LedUpdateTest(unittest.TestCase):
+
+    ############################################
+    # Name        : setUp
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : A csv sheet with held brightness steps in a temporary folder
+    ############################################
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "sheet.csv")
+        rng = np.random.default_rng(1)
+        self.intensity = np.repeat(rng.integers(0, 3, (20, 12)) * 50, 5, axis=0)
+        self.ledSections = [LedSection(0, 0, 0, 3, False, False, Color.White, False, 0),
+                            LedSection(1, 0, 6, 4, True, True, Color.Red, True, 7)]
+        self.addCleanup(invalidateWorkbook)
+
+    ############################################
+    # Name        : writeSheet
+    # Called by   : test_streamedUpdate, test_streamedModes
+    # Parameters  : self, matrix of brightness percentages (frames x LED columns)
+    # Returns     : N/A
+    # Description : Save the sheet like a user saving the workbook
+    ############################################
+    def writeSheet(self, intensity):
+        pds.DataFrame(np.c_[np.arange(len(intensity)), intensity]).to_csv(self.path, index=False)
+        invalidateWorkbook(self.path)
+
+    ############################################
+    # Name        : test_streamedUpdate
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : An update streamed in chunks leaves the keys a new build of the saved sheet writes
+    ############################################
+    def test_streamedUpdate(self):
+        changed = self.intensity.copy()
+        changed[30:60, 2] = 100
+        for bulkKeyframes in (True, False):
+            with self.subTest(bulkKeyframes=bulkKeyframes):
+                bpy.reset()
+                self.writeSheet(self.intensity)
+                main(self.path, "", 1, 1, self.ledSections, bulkKeyframes, chunkRows=7)
+                self.writeSheet(changed)
+                with self.assertLogs("ledAnimation") as logs:
+                    updateAnimation(self.path, "", 1, 1, self.ledSections, bulkKeyframes, chunkRows=7)
+                    updateAnimation(self.path, "", 1, 1, self.ledSections, bulkKeyframes, chunkRows=7)
+                self.assertIn("rewrote the animation of 1 of 12 LEDs", logs.output[-2])
+                self.assertIn("rewrote the animation of 0 of 12 LEDs", logs.output[-1])
+                updated = ledKeys()
+
+                bpy.reset()
+                main(self.path, "", 1, 1, self.ledSections, bulkKeyframes)
+                self.assertEqual(updated, ledKeys())
+
+    ############################################
+    # Name        : test_streamedModes
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Only keyframe animation can be streamed, like the build
+    ############################################
+    def test_streamedModes(self):
+        bpy.reset()
+        self.writeSheet(self.intensity)
+        main(self.path, "", 1, 1, self.ledSections, animationMode='POOLED')
+        with self.assertRaises(ExitError):
+            updateAnimation(self.path, "", 1, 1, self.ledSections, animationMode='POOLED', chunkRows=7)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import unittest
+
+#The workbook cache does not use blender, only the LED scripts are needed
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.dirname(tests_dir) in sys.path:
+    sys.path.insert(0, os.path.dirname(tests_dir))
+
+import workbookCache
+import workbookWindow
+from workbookCache import LruCache, readWorkbook, invalidateWorkbook
+from workbookWindow import readWindow
+
+class LruCacheTest(unittest.TestCase):
+
+    ############################################
+    # Name        : test_itemBound
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : The least recently used value is dropped first, a read value counts as used
+    ############################################
+    def test_itemBound(self):
+        cache = LruCache(2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        self.assertEqual(cache.get('a', lambda: 10), 1)
+        cache.get('c', lambda: 3)
+        self.assertEqual(list(cache.values), ['a', 'c'])
+
+    ############################################
+    # Name        : test_byteBound
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Values are dropped until their bytes fit, the newest value is kept even when it is too big
+    ############################################
+    def test_byteBound(self):
+        cache = LruCache(10, 10, len)
+        cache.get('a', lambda: 'aaaa')
+        cache.get('b', lambda: 'bbbb')
+        self.assertEqual((list(cache.values), cache.bytes), (['a', 'b'], 8))
+        cache.get('c', lambda: 'cccc')
+        self.assertEqual((list(cache.values), cache.bytes), (['b', 'c'], 8))
+        cache.get('d', lambda: 'd' * 50)
+        self.assertEqual((list(cache.values), cache.bytes), (['d'], 50))
+        cache.discard(lambda key: True)
+        self.assertEqual((list(cache.values), cache.bytes), ([], 0))
+
+class ReadWorkbookTest(unittest.TestCase):
+
+    ############################################
+    # Name        : setUp
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : A small csv sheet in a temporary folder and an empty cache
+    ############################################
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "sheet.csv")
+        self.writeSheet("Time,L1\n0,10\n1,20\n", 1000000000)
+        invalidateWorkbook()
+        self.addCleanup(invalidateWorkbook)
+
+    ############################################
+    # Name        : writeSheet
+    # Called by   : setUp, test_changedFile
+    # Parameters  : self, csv text, modified time in seconds
+    # Returns     : N/A
+    # Description : Write the test sheet with a fixed modified time
+    ############################################
+    def writeSheet(self, text, mtime):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.utime(self.path, (mtime, mtime))
+
+    ############################################
+    # Name        : test_sharedUntilChanged
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : The sheet is parsed once until invalidated
+    ############################################
+    def test_sharedUntilChanged(self):
+        first = readWorkbook(self.path, "")
+        self.assertIs(readWorkbook(self.path, ""), first)
+        invalidateWorkbook(self.path)
+        self.assertIsNot(readWorkbook(self.path, ""), first)
+
+    ############################################
+    # Name        : test_changedFile
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : A new modified time or size parses the sheet again and drops the older version
+    ############################################
+    def test_changedFile(self):
+        self.assertEqual(readWorkbook(self.path, "")["L1"].tolist(), [10, 20])
+        self.writeSheet("Time,L1\n0,30\n1,40\n", 1000000100)
+        self.assertEqual(readWorkbook(self.path, "")["L1"].tolist(), [30, 40])
+        self.writeSheet("Time,L1\n0,50\n1,600\n", 1000000100)
+        self.assertEqual(readWorkbook(self.path, "")["L1"].tolist(), [50, 600])
+        self.assertEqual(len(workbookCache._sheets.values), 1)
+
+    ############################################
+    # Name        : test_invalidateWindows
+    # Called by   : unittest
+    # Parameters  : self
+    # Returns     : N/A
+    # Description : Invalidating a workbook also drops the windows read from it
+    ############################################
+    def test_invalidateWindows(self):
+        self.assertEqual(readWindow(self.path, "", 0, 2, 1, 1).ravel().tolist(), [10, 20])
+        self.assertTrue(any(key[0][0] == self.path for key in workbookWindow._windows.values))
+        invalidateWorkbook(self.path)
+        self.assertFalse(any(key[0][0] == self.path for key in workbookWindow._windows.values))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import bpy
+import math
+import numpy as np
+from ledData import ExitError, emissionColor, resampleFrames
+from ledGeometry import LED_INDEX_PROPERTY
+
+#Largest texture side most GPUs can sample
+MAX_TEXTURE_SIZE = 16384
+#Preferred width of the intensity texture
+TEXTURE_WIDTH = 4096
+#Each pixel stores 4 LEDs, one in each RGBA channel
+LEDS_PER_PIXEL = 4
+#Object property the shader reads to find the pixel of a LED
+LED_INDEX_ATTRIBUTE = LED_INDEX_PROPERTY
+
+############################################
+# Name        : textureLayout
+# Called by   : createTextureAnimation
+# Parameters  : number of frames, number of LEDs
+# Returns     : pixels per frame, frames per texture row, texture width, texture height
+# Description : Lay the frames x LEDs matrix out in a texture. Each frame is a run of pixels
+#               and as many frames as fit are placed next to each other in one row
+############################################
+def textureLayout(num_frames, num_leds):
+    pixels_per_frame = max(1, math.ceil(num_leds / LEDS_PER_PIXEL))
+    if pixels_per_frame > MAX_TEXTURE_SIZE:
+        raise ExitError("Too many LEDs for texture animation: %i, the most is %i" % (num_leds, MAX_TEXTURE_SIZE * LEDS_PER_PIXEL))
+    frames_per_row = max(1, TEXTURE_WIDTH // pixels_per_frame)
+    width = frames_per_row * pixels_per_frame
+    height = max(1, math.ceil(num_frames / frames_per_row))
+    if height > MAX_TEXTURE_SIZE:
+        raise ExitError("The animation is too long for texture animation: %i frames, the most is %i. Use keyframe animation instead"
+                        % (num_frames, MAX_TEXTURE_SIZE * frames_per_row))
+    return pixels_per_frame, frames_per_row, width, height
+
+############################################
+# Name        : packIntensityPixels
+# Called by   : createTextureAnimation
+# Parameters  : matrix of emission strengths (frames x LEDs), pixels per frame, frames per row, texture height
+# Returns     : float32 pixel buffer (height x width*4)
+# Description : Pack the matrix into RGBA pixels following textureLayout
+############################################
+def packIntensityPixels(values, pixels_per_frame, frames_per_row, height):
+    num_frames, num_leds = values.shape
+    packed = np.zeros((height * frames_per_row, pixels_per_frame * LEDS_PER_PIXEL), dtype=np.float32)
+    packed[:num_frames, :num_leds] = values
+    return packed.reshape(height, frames_per_row * pixels_per_frame * LEDS_PER_PIXEL)
+
+############################################
+# Name        : bakeIntensityImage
+# Called by   : createTextureAnimation
+# Parameters  : float32 pixel buffer, texture width, texture height
+# Returns     : packed float image
+# Description : Store the pixel buffer in a float image that is saved inside the .blend
+############################################
+def bakeIntensityImage(pixels, width, height):
+    image = bpy.data.images.new(name='LedIntensity', width=width, height=height, alpha=True, float_buffer=True)
+    image.colorspace_settings.name = 'Non-Color'
+    #ALPHA HOLDS A LED, IT MUST NOT BE MULTIPLIED INTO THE COLOR
+    image.alpha_mode = 'CHANNEL_PACKED'
+    image.pixels.foreach_set(pixels.ravel())
+    image.update()
+    image.file_format = 'OPEN_EXR'
+    image.pack()
+    return image
+
+############################################
+# Name        : mathNode
+# Called by   : createTextureMaterial
+# Parameters  : node tree, math operation, first input, second input, third input (sockets or numbers)
+# Returns     : output socket of the math node
+# Description : Add a math node and connect or fill its inputs
+############################################
+def mathNode(node_tree, operation, *inputs):
+    node = node_tree.nodes.new(type='ShaderNodeMath')
+    node.operation = operation
+    for index, value in enumerate(inputs):
+        if isinstance(value, bpy.types.NodeSocket):
+            node_tree.links.new(value, node.inputs[index])
+        else:
+            node.inputs[index].default_value = value
+    return node.outputs[0]
+
+############################################
+# Name        : createTextureMaterial
+# Called by   : createTextureAnimation
+# Parameters  : material shared by every LED, intensity image, pixels per frame, frames per row,
+#               texture width, texture height, first frame of the texture, number of frames
+# Returns     : N/A
+# Description : Build the emission shader that looks up the strength of a LED from the image
+#               using the LED index of the object and the current frame
+############################################
+def createTextureMaterial(material, image, pixels_per_frame, frames_per_row, width, height, first_frame, num_frames):
+    node_tree = material.node_tree
+    nodes = node_tree.nodes
+    links = node_tree.links
+    output_node = nodes.get('Material Output')
+
+    #CURRENT FRAME FROM A DRIVER, CLAMPED TO THE BAKED FRAMES
+    frame_node = nodes.new(type='ShaderNodeValue')
+    frame_node.label = "Frame"
+    driver = frame_node.outputs[0].driver_add('default_value').driver
+    driver.type = 'SCRIPTED'
+    driver.expression = 'frame'
+    frame = mathNode(node_tree, 'SUBTRACT', frame_node.outputs[0], first_frame)
+    frame = mathNode(node_tree, 'MAXIMUM', frame, 0.0)
+    frame = mathNode(node_tree, 'MINIMUM', frame, num_frames - 1)
+    frame = mathNode(node_tree, 'FLOOR', frame)
+
+    #LED INDEX -> PIXEL IN THE FRAME AND CHANNEL IN THE PIXEL
+    index_node = nodes.new(type='ShaderNodeAttribute')
+    index_node.attribute_type = 'OBJECT'
+    index_node.attribute_name = LED_INDEX_ATTRIBUTE
+    led_index = index_node.outputs['Fac']
+    pixel = mathNode(node_tree, 'FLOOR', mathNode(node_tree, 'DIVIDE', led_index, LEDS_PER_PIXEL))
+    channel = mathNode(node_tree, 'MODULO', led_index, LEDS_PER_PIXEL)
+
+    #PIXEL COORDINATES, KEPT AS SMALL WHOLE NUMBERS SO FLOAT PRECISION IS NOT LOST
+    row = mathNode(node_tree, 'FLOOR', mathNode(node_tree, 'DIVIDE', frame, frames_per_row))
+    column = mathNode(node_tree, 'MULTIPLY', mathNode(node_tree, 'MODULO', frame, frames_per_row), pixels_per_frame)
+    column = mathNode(node_tree, 'ADD', column, pixel)
+    u = mathNode(node_tree, 'DIVIDE', mathNode(node_tree, 'ADD', column, 0.5), width)
+    v = mathNode(node_tree, 'DIVIDE', mathNode(node_tree, 'ADD', row, 0.5), height)
+    uv_node = nodes.new(type='ShaderNodeCombineXYZ')
+    links.new(u, uv_node.inputs[0])
+    links.new(v, uv_node.inputs[1])
+
+    image_node = nodes.new(type='ShaderNodeTexImage')
+    image_node.image = image
+    image_node.interpolation = 'Closest'
+    image_node.extension = 'EXTEND'
+    links.new(uv_node.outputs[0], image_node.inputs['Vector'])
+
+    try:
+        separate_node = nodes.new(type='ShaderNodeSeparateColor')
+    except RuntimeError:
+        separate_node = nodes.new(type='ShaderNodeSeparateRGB')
+    links.new(image_node.outputs['Color'], separate_node.inputs[0])
+    channel_values = [separate_node.outputs[0], separate_node.outputs[1], separate_node.outputs[2], image_node.outputs['Alpha']]
+
+    #PICK THE CHANNEL OF THE LED
+    strength = None
+    for channel_index, channel_value in enumerate(channel_values):
+        selected = mathNode(node_tree, 'MULTIPLY', mathNode(node_tree, 'COMPARE', channel, channel_index, 0.5), channel_value)
+        strength = selected if strength is None else mathNode(node_tree, 'ADD', strength, selected)
+
+    #COLOR COMES FROM THE OBJECT COLOR OF EACH LED
+    info_node = nodes.new(type='ShaderNodeObjectInfo')
+    emission_node = nodes.new(type='ShaderNodeEmission')
+    links.new(info_node.outputs['Color'], emission_node.inputs[0])
+    links.new(strength, emission_node.inputs[1])
+    links.new(emission_node.outputs[0], output_node.inputs[0])
+
+############################################
+# Name        : createTextureAnimation
+# Called by   : animation buildSteps, ledUpdate updateTextureMaterial
+# Parameters  : ledLayout LedTable with its cubes, material shared by every cube,
+#               array of frame numbers, matrix of emission strengths (frames x led columns)
+# Returns     : intensity image
+# Description : Animate every LED without keyframes. The emission strengths are baked into
+#               one image that the shared material samples with the LED index and current frame
+############################################
+def createTextureAnimation(table, material, frames_list, glow_matrix):
+    led_objects = table.objects
+    dense_frames, values = resampleFrames(frames_list, glow_matrix[:, table.column])
+    values = np.nan_to_num(values)
+    num_frames = len(dense_frames)
+
+    pixels_per_frame, frames_per_row, width, height = textureLayout(num_frames, len(led_objects))
+    pixels = packIntensityPixels(values, pixels_per_frame, frames_per_row, height)
+    image = bakeIntensityImage(pixels, width, height)
+    createTextureMaterial(material, image, pixels_per_frame, frames_per_row, width, height, dense_frames[0], num_frames)
+
+    for led_index, (ob, color) in enumerate(zip(led_objects, table.colorNames())):
+        ob[LED_INDEX_ATTRIBUTE] = led_index
+        ob.color = emissionColor(color)
+    return image
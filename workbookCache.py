@@ -0,0 +1,155 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pds
+
+#Bounds of the parsed workbook cache, the least recently used sheet is dropped first
+MAX_CACHED_SHEETS = 8
+MAX_CACHED_BYTES = 1024 * 1024 * 1024
+
+#Every LruCache, so invalidateWorkbook reaches the window caches too
+_caches = []
+
+#Thread safe cache of the workbook readers, the least recently used value is dropped first
+class LruCache():
+    ############################################
+    # Name        : __init__
+    # Called by   : workbookCache, workbookWindow, ledWindow
+    # Parameters  : most values kept, most bytes kept (None for no bound on bytes),
+    #               function giving the bytes of a value (None when the cache has no bound on bytes),
+    #               function giving the workbookKey of a cache key (None when the keys are workbookKeys)
+    # Returns     : N/A
+    # Description : Empty cache
+    ############################################
+    def __init__(self, maxItems, maxBytes=None, size=None, sheetKey=None):
+        self.maxItems = maxItems
+        self.maxBytes = maxBytes
+        self.size = size
+        self.sheetKey = sheetKey if sheetKey is not None else (lambda key: key)
+        self.values = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        _caches.append(self)
+
+    ############################################
+    # Name        : get
+    # Called by   : readWorkbook, workbookWindow cached, ledWindow sheetTimes, ledWindow readRows
+    # Parameters  : cache key, function reading the value when it is not cached
+    # Returns     : cached value
+    # Description : The value is read outside the lock so other keys stay available meanwhile
+    ############################################
+    def get(self, key, read):
+        with self.lock:
+            if key in self.values:
+                self.values.move_to_end(key)
+                return self.values[key][0]
+        value = read()
+        num_bytes = self.size(value) if self.size is not None else 0
+        with self.lock:
+            if key in self.values:
+                self.bytes -= self.values[key][1]
+            self.values[key] = (value, num_bytes)
+            self.bytes += num_bytes
+            self.evict()
+        return value
+
+    ############################################
+    # Name        : find
+    # Called by   : ledWindow cachedRows
+    # Parameters  : function telling whether a key and its value are wanted
+    # Returns     : (key, value) of the most recently used match, None when nothing matches
+    # Description : Look up a value by what it holds rather than by its exact key
+    ############################################
+    def find(self, match):
+        with self.lock:
+            for key in reversed(self.values):
+                value = self.values[key][0]
+                if match(key, value):
+                    self.values.move_to_end(key)
+                    return key, value
+        return None
+
+    ############################################
+    # Name        : discard
+    # Called by   : readWorkbook, invalidateWorkbook
+    # Parameters  : function telling whether a key is dropped
+    # Returns     : N/A
+    # Description : Remove every value whose key matches
+    ############################################
+    def discard(self, match):
+        with self.lock:
+            for key in [key for key in self.values if match(key)]:
+                self.bytes -= self.values.pop(key)[1]
+
+    ############################################
+    # Name        : evict
+    # Called by   : get (holding the lock)
+    # Parameters  : N/A
+    # Returns     : N/A
+    # Description : Drop least recently used values until the cache fits its bounds.
+    #               The newest value is always kept
+    ############################################
+    def evict(self):
+        while len(self.values) > 1 and (len(self.values) > self.maxItems or
+                                        (self.maxBytes is not None and self.bytes > self.maxBytes)):
+            self.bytes -= self.values.popitem(last=False)[1][1]
+
+_sheets = LruCache(MAX_CACHED_SHEETS, MAX_CACHED_BYTES, lambda xls_data: int(xls_data.memory_usage(index=True, deep=True).sum()))
+
+############################################
+# Name        : workbookKey
+# Called by   : readWorkbook
+# Parameters  : file path, sheet name
+# Returns     : cache key (path, sheet, modified time, file size)
+# Description : Key a sheet on the file state so a saved workbook is parsed again
+############################################
+def workbookKey(filePathName, sheetName):
+    path = os.path.abspath(os.path.expanduser(filePathName))
+    stat = os.stat(path)
+    return (path, sheetName, stat.st_mtime_ns, stat.st_size)
+
+############################################
+# Name        : parseWorkbook
+# Called by   : readWorkbook
+# Parameters  : absolute file path, sheet name
+# Returns     : data frame of the sheet
+# Description : Parse excel workbooks, csv and parquet files (csv and parquet have no sheets)
+############################################
+def parseWorkbook(path, sheetName):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return pds.read_csv(path)
+    if extension in ('.parquet', '.pq'):
+        return pds.read_parquet(path)
+    return pds.read_excel(path, sheet_name=sheetName)
+
+############################################
+# Name        : readWorkbook
+# Called by   : animation main, Panel Creation popUpMenu, testRowColStart popUpTest
+# Parameters  : file path, sheet name
+# Returns     : data frame of the sheet
+# Description : Parse a sheet once and share it between every caller until the file changes.
+#               The returned data frame is shared so callers must not modify it
+############################################
+def readWorkbook(filePathName, sheetName):
+    key = workbookKey(filePathName, sheetName)
+    #AN OLDER VERSION OF THE SAME SHEET WILL NEVER BE READ AGAIN
+    _sheets.discard(lambda old: old[:2] == key[:2] and old != key)
+    return _sheets.get(key, lambda: parseWorkbook(key[0], sheetName))
+
+############################################
+# Name        : invalidateWorkbook
+# Called by   : ledUpdate checkWorkbook, anything that needs a workbook read again
+# Parameters  : file path (None clears every workbook), sheet name (None clears every sheet of the file)
+# Returns     : N/A
+# Description : Remove parsed sheets, and the windows and slices read from them, from every cache
+############################################
+def invalidateWorkbook(filePathName=None, sheetName=None):
+    path = None
+    if filePathName is not None:
+        path = os.path.abspath(os.path.expanduser(filePathName))
+
+    def matches(key):
+        return (path is None or key[0] == path) and (sheetName is None or key[1] == sheetName)
+    for cache in list(_caches):
+        cache.discard(lambda key: matches(cache.sheetKey(key)))
@@ -0,0 +1,157 @@
+import os
+import numpy as np
+import pandas as pds
+from workbookCache import LruCache, workbookKey
+
+#Windows are read in blocks of rows and columns so moving the start row a little stays in a cached block
+WINDOW_ROWS = 256
+WINDOW_COLS = 32
+#Blocks and headers kept, the least recently used is dropped first
+MAX_CACHED_WINDOWS = 64
+MAX_CACHED_WINDOW_BYTES = 64 * 1024 * 1024
+#Bytes of a cell of an object array, its pointer and a python float
+OBJECT_CELL_BYTES = 32
+
+############################################
+# Name        : windowBytes
+# Called by   : LruCache of the windows
+# Parameters  : cached header or block
+# Returns     : estimated bytes of the value
+# Description : Blocks are object arrays, headers are short lists and are not counted
+############################################
+def windowBytes(value):
+    return value.size * OBJECT_CELL_BYTES if isinstance(value, np.ndarray) else 0
+
+_windows = LruCache(MAX_CACHED_WINDOWS, MAX_CACHED_WINDOW_BYTES, windowBytes, lambda key: key[0])
+
+############################################
+# Name        : cached
+# Called by   : sheetColumns, readBlock
+# Parameters  : cache key, function reading the value when it is not cached
+# Returns     : cached value
+# Description : Small LRU cache of headers and blocks, keyed on the file state so a saved file is read again
+############################################
+def cached(key, read):
+    return _windows.get(key, read)
+
+############################################
+# Name        : sheetColumns
+# Called by   : checkSheet, readBlock, ledWindow sheetTimes, ledWindow readRows
+# Parameters  : file path, sheet name
+# Returns     : list of column names of the sheet
+# Description : Read only the header row. Also checks the file and sheet exist
+############################################
+def sheetColumns(filePathName, sheetName):
+    key = workbookKey(filePathName, sheetName)
+    path = key[0]
+
+    def read():
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            return list(pds.read_csv(path, nrows=0).columns)
+        if extension in ('.parquet', '.pq'):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                return list(pds.read_parquet(path).columns)
+            return list(pq.ParquetFile(path).schema_arrow.names)
+        return list(pds.read_excel(path, sheet_name=sheetName, nrows=0).columns)
+    return cached((key, 'header'), read)
+
+############################################
+# Name        : checkSheet
+# Called by   : testRowColStart popUpTest execute, Panel Creation popUpMenu draw
+# Parameters  : file path, sheet name
+# Returns     : N/A
+# Description : Raise an error if the file or sheet cannot be read, without loading the sheet
+############################################
+def checkSheet(filePathName, sheetName):
+    sheetColumns(filePathName, sheetName)
+
+############################################
+# Name        : readParquetRows
+# Called by   : readBlock, ledWindow readRows
+# Parameters  : parquet file path, first row, number of rows, list of column names
+# Returns     : data frame of the rows and columns
+# Description : Only the row groups holding the rows are read, and only for the given columns
+############################################
+def readParquetRows(path, firstRow, numRows, names):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return pds.read_parquet(path, columns=names).iloc[firstRow:firstRow + numRows]
+    parquet_file = pq.ParquetFile(path)
+    groups = []
+    group_start = 0
+    first_group_row = None
+    for index in range(parquet_file.metadata.num_row_groups):
+        group_rows = parquet_file.metadata.row_group(index).num_rows
+        if group_start + group_rows > firstRow and group_start < firstRow + numRows:
+            groups.append(index)
+            if first_group_row is None:
+                first_group_row = group_start
+        group_start += group_rows
+    if not groups:
+        return pds.DataFrame(columns=names)
+    table = parquet_file.read_row_groups(groups, columns=names)
+    return table.slice(firstRow - first_group_row, numRows).to_pandas()
+
+############################################
+# Name        : readBlock
+# Called by   : readWindow
+# Parameters  : file path, sheet name, row block, column block
+# Returns     : object array of the cells of the block (fewer rows or columns at the end of the sheet)
+# Description : Read one block of rows and columns without the rest of the sheet, csv and excel
+#               through skiprows, nrows and usecols, parquet through its row groups
+############################################
+def readBlock(filePathName, sheetName, rowBlock, colBlock):
+    key = workbookKey(filePathName, sheetName)
+    path = key[0]
+
+    def read():
+        firstRow = rowBlock * WINDOW_ROWS
+        firstCol = colBlock * WINDOW_COLS
+        columns = list(range(firstCol, min(firstCol + WINDOW_COLS, len(sheetColumns(filePathName, sheetName)))))
+        if not columns:
+            return np.empty((0, 0), dtype=object)
+        extension = os.path.splitext(path)[1].lower()
+        #ROW 0 OF THE FILE IS THE HEADER, DATA FRAME ROW 0 IS THE ROW AFTER IT
+        if extension == '.csv':
+            block = pds.read_csv(path, skiprows=range(1, firstRow + 1), nrows=WINDOW_ROWS, usecols=columns)
+        elif extension in ('.parquet', '.pq'):
+            names = sheetColumns(filePathName, sheetName)
+            block = readParquetRows(path, firstRow, WINDOW_ROWS, [names[column] for column in columns])
+        else:
+            block = pds.read_excel(path, sheet_name=sheetName, skiprows=range(1, firstRow + 1), nrows=WINDOW_ROWS, usecols=columns)
+        return block.to_numpy(dtype=object)
+    return cached((key, rowBlock, colBlock), read)
+
+############################################
+# Name        : readWindow
+# Called by   : testRowColStart readPreview
+# Parameters  : file path, sheet name, first row, number of rows, first column, number of columns
+# Returns     : object array of the cells (rows x columns), cut short at the end of the sheet
+# Description : Read a window of the sheet from the cached blocks covering it. Rows are data frame
+#               rows (the header is not counted) and columns are counted from the first column
+############################################
+def readWindow(filePathName, sheetName, firstRow, numRows, firstCol, numCols):
+    if firstRow < 0 or firstCol < 0 or numRows <= 0 or numCols <= 0:
+        return np.empty((0, 0), dtype=object)
+    rows = []
+    for rowBlock in range(firstRow // WINDOW_ROWS, (firstRow + numRows - 1) // WINDOW_ROWS + 1):
+        blocks = [readBlock(filePathName, sheetName, rowBlock, colBlock)
+                  for colBlock in range(firstCol // WINDOW_COLS, (firstCol + numCols - 1) // WINDOW_COLS + 1)]
+        #BLOCKS PAST THE LAST COLUMN ARE EMPTY
+        blocks = [block for block in blocks if block.shape[1]]
+        if not blocks or not len(blocks[0]):
+            break
+        num_block_rows = min(len(block) for block in blocks)
+        rows.append(np.concatenate([block[:num_block_rows] for block in blocks], axis=1))
+        if num_block_rows < WINDOW_ROWS:
+            break
+    if not rows:
+        return np.empty((0, 0), dtype=object)
+    window = np.concatenate(rows)
+    rowOffset = firstRow - (firstRow // WINDOW_ROWS) * WINDOW_ROWS
+    colOffset = firstCol - (firstCol // WINDOW_COLS) * WINDOW_COLS
+    return window[rowOffset:rowOffset + numRows, colOffset:colOffset + numCols]